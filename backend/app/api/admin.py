@@ -1,8 +1,8 @@
-
+import asyncio
 from fastapi import APIRouter, HTTPException, Query, Depends
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db, User, SensorReading, PestForecast, PestIncident, CropDiagnosis, VoiceLog
+from app.core.database import get_db, User, SensorReading, PestForecast, PestIncident, CropDiagnosis, VoiceLog, FarmAccess
 
 router = APIRouter()
 
@@ -56,3 +56,118 @@ async def reset_database(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to cleanup test data: {str(e)}")
+
+@router.post("/weather/prewarm")
+async def prewarm_weather_cache(include_forecast: bool = True):
+    """
+    Pre-warms the geo-grid weather cache for all registered farm coordinates.
+    Farms sharing a grid cell trigger a single Open-Meteo lookup.
+    """
+    try:
+        from app.services.weather_client import prewarm_registered_farms, weather_client
+
+        result = await prewarm_registered_farms(include_forecast=include_forecast)
+        return {
+            "success": True,
+            "prewarm": result,
+            "cache": weather_client.stats()
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to pre-warm weather cache: {str(e)}")
+
+@router.post("/weather/ingest")
+async def ingest_weather(include_forecast: bool = True):
+    """
+    Runs one weather ingestion pass now (normally run by the scheduler):
+    current conditions and forecasts for every farm cell into external_weather_logs.
+    """
+    try:
+        from app.services.weather_ingest import weather_ingestor
+
+        result = await weather_ingestor.run_once(include_forecast=include_forecast)
+        return {
+            "success": True,
+            "ingest": result,
+            "scheduler": weather_ingestor.stats()
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to ingest weather: {str(e)}")
+
+@router.post("/physics/calibrate")
+async def calibrate_physics_profiles():
+    """
+    Runs the least-squares physics calibration now: every farm with new EXACT
+    feedback since its last fit is refitted and written to farm_physics_profiles.
+    """
+    try:
+        from app.services.physics_calibration import physics_calibration
+
+        result = await asyncio.to_thread(physics_calibration.run)
+        return {
+            "success": True,
+            "calibration": result
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to calibrate physics profiles: {str(e)}")
+
+@router.post("/farm-access")
+def grant_farm_access(
+    operator_id: str,
+    farm_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Lets an operator read another farm through the batch dashboard
+    (POST /api/dashboard/batch with X-Farm-ID = operator_id).
+    """
+    if db.query(User).filter(User.id == farm_id).first() is None:
+        raise HTTPException(status_code=404, detail="Farm not found")
+    exists = db.query(FarmAccess).filter(
+        FarmAccess.operator_id == operator_id,
+        FarmAccess.farm_id == farm_id
+    ).first()
+    if exists is None:
+        db.add(FarmAccess(operator_id=operator_id, farm_id=farm_id))
+        db.commit()
+    return {"success": True, "operator_id": operator_id, "farm_id": farm_id}
+
+@router.delete("/farm-access")
+def revoke_farm_access(
+    operator_id: str,
+    farm_id: str,
+    db: Session = Depends(get_db)
+):
+    """Removes an operator's access to a farm."""
+    deleted = db.query(FarmAccess).filter(
+        FarmAccess.operator_id == operator_id,
+        FarmAccess.farm_id == farm_id
+    ).delete()
+    db.commit()
+    return {"success": True, "revoked": deleted}
+
+@router.get("/ai/stats")
+def ai_provider_stats():
+    """Warm Gemini model handles (per-model calls / latency), provider routing, quota scheduler, structured JSON outcomes, LLM replay fixtures, prescription cache and coalescing stats."""
+    from app.services.gemini_pool import gemini_pool
+    from app.services.llm_router import llm_router
+    from app.services.llm_scheduler import llm_scheduler
+    from app.services.structured_output import structured_output
+    from app.services.llm_replay import replay_store
+    from app.services.prescription_cache import prescription_cache
+
+    from app.services.ai_engine import pest_flight, market_flight
+
+    stats = gemini_pool.stats()
+    stats["router"] = llm_router.stats()
+    stats["scheduler"] = llm_scheduler.stats()
+    stats["structured_output"] = structured_output.stats()
+    stats["replay"] = replay_store.stats()
+    stats["prescription_cache"] = prescription_cache.stats()
+    stats["single_flight"] = {
+        "pest_risk": pest_flight.stats(),
+        "market_prices": market_flight.stats()
+    }
+    return stats
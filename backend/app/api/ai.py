@@ -1,7 +1,7 @@
 from fastapi import APIRouter, File, UploadFile, Request, Header, HTTPException
 from PIL import Image
 import io
-from app.services.ai_engine import analyze_crop_image
+from app.services.job_queue import job_queue, encode_image_payload, QueueFullError, JOB_INLINE_WAIT_SECONDS
 from app.services.diagnosis_history import (
     get_user_diagnosis_history,
     get_diagnosis_stats
@@ -17,6 +17,7 @@ limiter = Limiter(key_func=get_remote_address)
 async def diagnose_crop(
     request: Request, 
     file: UploadFile = File(...),
+    defer: bool = False,
     x_farm_id: str = Header(..., alias="X-Farm-ID")
 ):
     """
@@ -25,6 +26,10 @@ async def diagnose_crop(
     
     CRITICAL: Tracks user_id for diagnosis history and audit trail.
     Uses past diagnosis history for context-aware recommendations.
+
+    The Gemini call runs on the background job pool. With defer=true the job id
+    is returned immediately (poll /api/jobs/{job_id}); otherwise the handler
+    awaits the job for up to JOB_INLINE_WAIT_SECONDS.
     """
     if not file.content_type.startswith("image/"):
         return {"error": "Invalid file type. Please upload an image (JPEG, PNG)."}
@@ -32,18 +37,36 @@ async def diagnose_crop(
     try:
         user_id = x_farm_id
         
-        # Read image to memory
+        # Read image to memory and validate it before queueing
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        Image.open(io.BytesIO(contents)).verify()
         
-        # Call Gemini Vision with user context
-        diagnosis = analyze_crop_image(image, user_id=user_id)
+        # Queue Gemini Vision call with user context
+        job_id = await job_queue.asubmit(
+            "crop_diagnosis",
+            {"image_b64": encode_image_payload(contents)},
+            user_id
+        )
+        if defer:
+            return {"job_id": job_id, "status": "queued", "user_id": user_id}
+
+        job = await job_queue.wait(job_id, timeout=JOB_INLINE_WAIT_SECONDS)
+        if job is None or job["status"] != "done":
+            return {
+                "job_id": job_id,
+                "status": job["status"] if job else "unknown",
+                "error": job.get("error") if job else None,
+                "user_id": user_id
+            }
         
         return {
-            "diagnosis": diagnosis,
+            "diagnosis": job["result"]["diagnosis"],
             "user_id": user_id,
+            "job_id": job_id,
             "message": "Diagnosis saved to your history"
         }
+    except QueueFullError:
+        return {"error": "Analysis service is busy. Please try again shortly."}
     except Exception as e:
         return {"error": f"Analysis failed: {str(e)}"}
 
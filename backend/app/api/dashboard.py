@@ -1,12 +1,241 @@
+import asyncio
+import json
+import os
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from sqlalchemy import func, and_
 from sqlalchemy.orm import Session
-from app.services.data_handler import fetch_weather_data, get_coordinates_from_city, calculate_vpd
-from app.services.ai_engine import analyze_situation
-from app.core.database import get_db, SensorReading
-from app.services.physics_engine import physics_engine
+from app.services.data_handler import fetch_weather_data, fetch_weather_data_async, get_coordinates_from_city, calculate_vpd
+from app.services.ai_engine import analyze_situation, stream_situation
+from app.services.analysis_cache import analysis_cache
+from app.services.job_queue import job_queue, QueueFullError, InvalidPayloadError, JOB_INLINE_WAIT_SECONDS
+from app.services.weather_client import weather_client
+from app.core.database import get_db, SessionLocal, SensorReading, User, FarmAccess
+from app.services.physics_engine import physics_engine, day_flag
+from app.services.physics_profiles import physics_profiles
+from app.services.stage_graph import StageGraph
 
 router = APIRouter()
 
+# Per-stage timeouts (seconds) for the dashboard stage graph
+DASHBOARD_STAGE_TIMEOUTS = {
+    "location": float(os.getenv("DASHBOARD_LOCATION_TIMEOUT", "6")),
+    "indoor": float(os.getenv("DASHBOARD_DB_TIMEOUT", "5")),
+    "weather": float(os.getenv("DASHBOARD_WEATHER_TIMEOUT", "6")),
+    "virtual_sensor": float(os.getenv("DASHBOARD_PHYSICS_TIMEOUT", "2")),
+    "ai": float(os.getenv("DASHBOARD_AI_TIMEOUT", "20"))
+}
+
+def empty_weather():
+    return {
+        "temperature": None,
+        "humidity": None,
+        "rain": None,
+        "wind_speed": None
+    }
+
+def empty_indoor():
+    return {
+        "temperature": None,
+        "humidity": None,
+        "vpd": None,
+        "vpd_status": "No Data - Please Record",
+        "soil_moisture": None,
+        "timestamp": None
+    }
+
+def indoor_from_reading(indoor_row):
+    """Indoor card from the farm's latest recorded SensorReading."""
+    # Calculate VPD from temperature and humidity
+    vpd = calculate_vpd(indoor_row.temperature, indoor_row.humidity) if indoor_row.temperature and indoor_row.humidity else None
+    return {
+        "temperature": indoor_row.temperature,
+        "humidity": indoor_row.humidity,
+        "vpd": vpd,
+        "vpd_status": get_vpd_status(vpd),
+        "soil_moisture": indoor_row.soil_moisture,
+        "timestamp": indoor_row.timestamp.isoformat() if indoor_row.timestamp else None
+    }
+
+def weather_to_metric(weather):
+    """Imperial dashboard weather -> metric inputs of the physics engine."""
+    return {
+        "temperature": (float(weather['temperature']) - 32) * 5/9,
+        "humidity": float(weather['humidity'] or 50),
+        "wind_speed": float(weather['wind_speed'] or 0) * 0.44704,
+        "rain": float(weather['rain'] or 0) * 25.4,
+        "is_day": day_flag(weather.get('is_day')) # Open-Meteo day/night flag
+    }
+
+def indoor_from_estimate(micro):
+    """Indoor card from a physics-engine estimate (converted back to imperial)."""
+    # Convert back to Imperial for US Dashboard
+    est_temp_f = (micro['temperature'] * 9/5) + 32
+
+    return {
+        "temperature": round(est_temp_f, 1),
+        "humidity": micro['humidity'],
+        "vpd": micro['vpd'],
+        "vpd_status": get_vpd_status(micro['vpd']) + " (Virtual)",
+        "soil_moisture": None, # Cannot estimate soil without more inputs
+        "timestamp": "Estimated Now"
+    }
+
+def virtual_indoor(weather, physics=None):
+    """
+    NO SENSOR DATA -> ACTIVATE VIRTUAL SENSOR (PHYSICS ENGINE)
+    Indoor card estimated from outside weather (imperial units), using the
+    farm's own model when given (physics_profiles.model_for).
+    """
+    if weather is None or weather.get('temperature') is None:
+        return empty_indoor()
+
+    # Convert F to C for physics engine (metric-based)
+    micro = (physics or physics_engine).estimate_microclimate(weather_to_metric(weather))
+    return indoor_from_estimate(micro)
+
+def virtual_indoor_many(weathers, profiles=None):
+    """
+    virtual_indoor for many weather dicts in one vectorized physics pass.
+    `profiles` (optional, aligned with `weathers`) are per-farm physics
+    profiles. Returns a list of indoor cards in the same order.
+    """
+    rows = [i for i, weather in enumerate(weathers) if weather is not None and weather.get('temperature') is not None]
+    cards = [empty_indoor() for _ in weathers]
+    if not rows:
+        return cards
+
+    metric = [weather_to_metric(weathers[i]) for i in rows]
+    facility = {
+        field: [profiles[i][field] for i in rows]
+        for field in ("insulation_score", "ventilation_score", "solar_gain")
+    } if profiles else None
+    micro = physics_engine.estimate_microclimate_batch(
+        [m["temperature"] for m in metric],
+        [m["humidity"] for m in metric],
+        [m["wind_speed"] for m in metric],
+        [m["rain"] for m in metric],
+        [m["is_day"] for m in metric],
+        facility=facility
+    )
+    for j, i in enumerate(rows):
+        # Same rounding as estimate_microclimate
+        cards[i] = indoor_from_estimate({
+            "temperature": round(float(micro["temperature"][j]), 1),
+            "humidity": round(float(micro["humidity"][j]), 1),
+            "vpd": round(float(micro["vpd"][j]), 2)
+        })
+    return cards
+
+def build_dashboard_graph(city, lat, lon, country, crop_type, user_id, include_ai=True):
+    """
+    Builds the dashboard stage graph:
+
+        location ──> weather ──┬──> virtual_sensor
+        indoor ────────────────┘
+                     weather ──> ai
+
+    The DB lookup runs alongside geocoding/weather, and a slow AI analysis
+    only affects the AI card. The streaming endpoint leaves out the `ai`
+    stage and streams the analysis itself.
+    """
+    graph = StageGraph(name="dashboard")
+
+    # 1. Determine Location (Coordinates vs City Name)
+    def resolve_location(_):
+        if lat is not None and lon is not None:
+            # Direct coordinates provided (e.g. from "Use My Location")
+            return {
+                "name": city or f"{lat:.2f}, {lon:.2f}",
+                "lat": lat,
+                "lon": lon,
+                "country": None
+            }
+
+        # Fallback to city search
+        search_city = city or "San Francisco"
+        found_lat, found_lon, found_name, found_country_code = get_coordinates_from_city(search_city, country)
+        return {
+            "name": found_name or search_city,
+            "lat": found_lat,
+            "lon": found_lon,
+            "country": found_country_code
+        }
+
+    # 2. Fetch User's Real Indoor Data (DB)
+    # NO MORE SIMULATION. Only DB data.
+    # Own session: the stage runs in a worker thread that may outlive the
+    # request (stage timeouts), and Sessions are not thread-safe
+    def load_indoor_row(_):
+        db = SessionLocal()
+        try:
+            return db.query(SensorReading).filter(
+                SensorReading.user_id == user_id
+            ).order_by(SensorReading.timestamp.desc()).first()
+        finally:
+            db.close()
+
+    # 3. Fetch Weather Data using coordinates (non-blocking, cached)
+    async def load_weather(deps):
+        location = deps["location"]
+        if not location or not location["lat"] or not location["lon"]:
+            return None
+        return await fetch_weather_data_async(location["lat"], location["lon"])
+
+    # 4. Indoor card: real reading, else virtual sensor (physics engine)
+    def estimate_indoor(deps):
+        if deps["indoor"]:
+            return indoor_from_reading(deps["indoor"])
+        return virtual_indoor(deps["weather"], physics_profiles.model_for(user_id))
+
+    # 5. AI Analysis, served stale-while-revalidate: the LLM only runs on a
+    # cold miss or in the background once the cached analysis is stale.
+    async def run_ai(deps):
+        weather = deps["weather"] or empty_weather()
+        ai_crop = crop_type or "tomato"
+        ai_key = analysis_cache.make_key(user_id, ai_crop, weather)
+        return await analysis_cache.aget(
+            ai_key,
+            lambda: analyze_situation(weather, ai_crop, user_id=user_id)
+        )
+
+    t = DASHBOARD_STAGE_TIMEOUTS
+    graph.add("location", resolve_location, timeout=t["location"])
+    graph.add("indoor", load_indoor_row, timeout=t["indoor"])
+    graph.add("weather", load_weather, deps=("location",), timeout=t["weather"])
+    graph.add("virtual_sensor", estimate_indoor, deps=("indoor", "weather"),
+              timeout=t["virtual_sensor"], default=empty_indoor())
+    if include_ai:
+        graph.add("ai", run_ai, deps=("weather",), timeout=t["ai"])
+    return graph
+
+def location_not_found(city):
+    return {
+        "name": city,
+        "lat": None,
+        "lon": None,
+        "error": "City not found. Please try a major city name."
+    }
+
+def format_ai_result(ai_result, ai_cache_meta):
+    """Splits an analyze_situation result into (ai_analysis text, ai_meta)."""
+    # Check if result is dict (New Format) or str (Old/Error)
+    ai_meta = {"confidence_score": 0.0, "user_question": None, "source": None}
+    if isinstance(ai_result, dict):
+        ai_analysis = ai_result.get("analysis_text", "AI Service Unavailable")
+        ai_meta["confidence_score"] = ai_result.get("confidence_score", 0.0)
+        ai_meta["user_question"] = ai_result.get("validation_question", None)
+        # "rules" (local rule engine) or "llm"
+        ai_meta["source"] = ai_result.get("source")
+    else:
+        ai_analysis = str(ai_result)
+    ai_meta.update(ai_cache_meta)
+    return ai_analysis, ai_meta
+
 @router.get("")
 async def get_dashboard_data(
     city: str = None,
@@ -14,151 +243,49 @@ async def get_dashboard_data(
     lon: float = None,
     country: str = None,  # ISO country code (e.g., 'US', 'GB', 'KR')
     crop_type: str = "Strawberries",
-    x_farm_id: str = Header(..., alias="X-Farm-ID"),
-    db: Session = Depends(get_db)
+    x_farm_id: str = Header(..., alias="X-Farm-ID")
 ):
     try:
         user_id = x_farm_id # Map header to internal user_id logic
-        location_name = city or "Unknown Location"
-        
-        found_country_code = None
 
-        # 1. Determine Location (Coordinates vs City Name)
-        if lat is not None and lon is not None:
-             # Direct coordinates provided (e.g. from "Use My Location")
-             if not city:
-                 location_name = f"{lat:.2f}, {lon:.2f}"
-        else:
-            # Fallback to city search
-            if not city:
-                city = "San Francisco"
-                
-            lat, lon, found_name, found_country_code = get_coordinates_from_city(city, country)
-            if found_name:
-                location_name = found_name
-            
-            if not lat or not lon:
-                return {
-                    "location": {
-                        "name": city,
-                        "lat": None,
-                        "lon": None,
-                        "error": "City not found. Please try a major city name."
-                    },
-                    "weather": {
-                        "temperature": None,
-                        "humidity": None,
-                        "rain": None,
-                        "wind_speed": None
-                    },
-                    "indoor": {
-                        "temperature": None,
-                        "humidity": None,
-                        "vpd": None,
-                        "vpd_status": "No Data - Please Record",
-                        "soil_moisture": None,
-                        "timestamp": None
-                    },
-                    "crop": crop_type
-                }
-
-        # 2. Fetch Weather Data using coordinates
-        weather = fetch_weather_data(lat, lon)
+        graph = build_dashboard_graph(city, lat, lon, country, crop_type, user_id)
+        results, stages = await graph.run()
 
-        if weather is None:
-            weather = {
-                "temperature": None,
-                "humidity": None,
-                "rain": None,
-                "wind_speed": None
+        location = results["location"]
+        if not location or not location["lat"] or not location["lon"]:
+            return {
+                "location": location_not_found(city),
+                "weather": empty_weather(),
+                "indoor": empty_indoor(),
+                "crop": crop_type,
+                "stages": stages
             }
-        
-        # 2. Fetch User's Real Indoor Data (DB)
-        # NO MORE SIMULATION. Only DB data.
-        indoor_row = db.query(SensorReading).filter(
-            SensorReading.user_id == user_id
-        ).order_by(SensorReading.timestamp.desc()).first()
-
-        # Default state if no data
-        indoor_data = {
-            "temperature": None,
-            "humidity": None,
-            "vpd": None,
-            "vpd_status": "No Data - Please Record",
-            "soil_moisture": None,
-            "timestamp": None
-        }
 
-        if indoor_row:
-            # Calculate VPD from temperature and humidity
-            vpd = calculate_vpd(indoor_row.temperature, indoor_row.humidity) if indoor_row.temperature and indoor_row.humidity else None
-            
-            indoor_data = {
-                "temperature": indoor_row.temperature,
-                "humidity": indoor_row.humidity,
-                "vpd": vpd,
-                "vpd_status": get_vpd_status(vpd),
-                "soil_moisture": indoor_row.soil_moisture,
-                "timestamp": indoor_row.timestamp.isoformat() if indoor_row.timestamp else None
+        weather = results["weather"] or empty_weather()
+        indoor_data = results["virtual_sensor"]
+
+        if results["ai"] is None:
+            # Timed out or failed: the weather/indoor cards are still returned
+            ai_analysis = "AI analysis is still being prepared. Please refresh shortly."
+            ai_meta = {
+                "confidence_score": 0.0,
+                "user_question": None,
+                "source": None,
+                "cache": "pending",
+                "cache_age_seconds": 0,
+                "refreshing": stages["ai"]["status"] == "timeout"
             }
         else:
-            # NO SENSOR DATA -> ACTIVATE VIRTUAL SENSOR (PHYSICS ENGINE)
-            if weather is not None and weather.get('temperature') is not None:
-                # Convert F to C for physics engine (metric-based)
-                w_metric = {
-                    "temperature": (float(weather['temperature']) - 32) * 5/9,
-                    "humidity": float(weather['humidity'] or 50),
-                    "wind_speed": float(weather['wind_speed'] or 0) * 0.44704,
-                    "rain": float(weather['rain'] or 0) * 25.4,
-                    "is_day": True # In real app, check sunrise/sunset
-                }
-                
-                micro = physics_engine.estimate_microclimate(w_metric)
-                
-                # Convert back to Imperial for US Dashboard
-                est_temp_f = (micro['temperature'] * 9/5) + 32
-                
-                indoor_data = {
-                    "temperature": round(est_temp_f, 1),
-                    "humidity": micro['humidity'],
-                    "vpd": micro['vpd'],
-                    "vpd_status": get_vpd_status(micro['vpd']) + " (Virtual)",
-                    "soil_moisture": None, # Cannot estimate soil without more inputs
-                    "timestamp": "Estimated Now"
-                }
+            ai_analysis, ai_meta = format_ai_result(*results["ai"])
 
-        
-        # 3. AI Analysis (Now integrated into Dashboard)
-        # Check for optional feedback handling (not in main GET, but structure ready)
-        # Default AI run usually has no feedback unless explicitly requested via separate call.
-        
-        ai_result = analyze_situation(weather, crop_type or "tomato", user_id=user_id)
-        
-        # Check if result is dict (New Format) or str (Old/Error)
-        if isinstance(ai_result, dict):
-            ai_analysis = ai_result.get("analysis_text", "AI Service Unavailable")
-            confidence = ai_result.get("confidence_score", 0.0)
-            question = ai_result.get("validation_question", None)
-        else:
-            ai_analysis = str(ai_result)
-            confidence = 0.0
-            question = None
-            
         return {
-            "location": {
-                "name": location_name,
-                "lat": lat,
-                "lon": lon,
-                "country": found_country_code
-            },
+            "location": location,
             "weather": weather, # Outside weather is always real
             "indoor": indoor_data,
             "ai_analysis": ai_analysis,
-            "ai_meta": {
-                "confidence_score": confidence,
-                "user_question": question
-            },
-            "crop": crop_type
+            "ai_meta": ai_meta,
+            "crop": crop_type,
+            "stages": stages
         }
         
     except Exception as e:
@@ -171,23 +298,297 @@ async def get_dashboard_data(
                 "lon": None,
                 "error": "Service temporarily unavailable"
             },
-            "weather": {
-                "temperature": None,
-                "humidity": None,
-                "rain": None,
-                "wind_speed": None
-            },
-            "indoor": {
-                "temperature": None,
-                "humidity": None,
-                "vpd": None,
-                "vpd_status": "No Data - Please Record",
-                "soil_moisture": None,
-                "timestamp": None
-            },
+            "weather": empty_weather(),
+            "indoor": empty_indoor(),
             "crop": crop_type
         }
 
+def sse_event(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+# Stage name -> SSE event name for the cards sent as soon as they are ready
+STREAM_STAGE_EVENTS = {
+    "location": "location",
+    "weather": "weather",
+    "virtual_sensor": "indoor"
+}
+
+@router.get("/stream")
+async def stream_dashboard_data(
+    city: str = None,
+    lat: float = None,
+    lon: float = None,
+    country: str = None,
+    crop_type: str = "Strawberries",
+    x_farm_id: str = Header(..., alias="X-Farm-ID")
+):
+    """
+    Server-Sent Events variant of the dashboard.
+
+    Events, in order of readiness:
+      location, weather, indoor  - same payloads as the JSON dashboard
+      ai_chunk                   - {"text": ...} raw prescription text as Gemini streams it
+      ai                         - {"ai_analysis", "ai_meta"}: final, safety-filtered text
+                                   (replaces the chunks; may differ after a safety override)
+      done                       - {"stages": ...} per-stage timing report
+    """
+    user_id = x_farm_id
+    ai_crop = crop_type or "tomato"
+
+    async def events():
+        try:
+            graph = build_dashboard_graph(city, lat, lon, country, crop_type, user_id, include_ai=False)
+            ready = asyncio.Queue()
+            runner = asyncio.create_task(
+                graph.run(on_stage=lambda name, value, entry: ready.put_nowait((name, value)))
+            )
+            runner.add_done_callback(lambda _: ready.put_nowait(None))
+
+            while True:
+                item = await ready.get()
+                if item is None:
+                    break
+                name, value = item
+                if name == "location" and (not value or not value["lat"] or not value["lon"]):
+                    yield sse_event("location", location_not_found(city))
+                elif name == "weather":
+                    yield sse_event("weather", value or empty_weather())
+                elif name in STREAM_STAGE_EVENTS:
+                    yield sse_event(STREAM_STAGE_EVENTS[name], value)
+
+            results, stages = runner.result()
+            weather = results["weather"]
+            if weather is None or weather.get("temperature") is None:
+                yield sse_event("done", {"stages": stages})
+                return
+
+            # Cached analysis (fresh or stale-while-revalidate): send it whole
+            ai_key = analysis_cache.make_key(user_id, ai_crop, weather)
+            cached = analysis_cache.lookup(
+                ai_key,
+                lambda: analyze_situation(weather, ai_crop, user_id=user_id)
+            ) if ai_key else None
+            if cached is not None:
+                ai_analysis, ai_meta = format_ai_result(*cached)
+                yield sse_event("ai", {"ai_analysis": ai_analysis, "ai_meta": ai_meta})
+                yield sse_event("done", {"stages": stages})
+                return
+
+            # Cold miss: stream the prescription, then send the filtered final text
+            async for kind, payload in iterate_in_threadpool(stream_situation(weather, ai_crop, user_id=user_id)):
+                if kind == "chunk":
+                    yield sse_event("ai_chunk", {"text": payload})
+                else:
+                    analysis_cache.store(ai_key, payload)
+                    ai_analysis, ai_meta = format_ai_result(
+                        payload,
+                        {"cache": "miss", "cache_age_seconds": 0, "refreshing": False}
+                    )
+                    yield sse_event("ai", {"ai_analysis": ai_analysis, "ai_meta": ai_meta})
+            yield sse_event("done", {"stages": stages})
+        except Exception as e:
+            print(f"Dashboard Stream Error: {e}")
+            yield sse_event("error", {"error": "Service temporarily unavailable"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Upper bound on farms per batch request
+DASHBOARD_BATCH_MAX_FARMS = int(os.getenv("DASHBOARD_BATCH_MAX_FARMS", "500"))
+
+class DashboardBatchRequest(BaseModel):
+    farm_ids: List[str] = Field(..., min_length=1)
+    crop_type: Optional[str] = None  # Overrides each farm's registered crop
+    # "none": skip AI | "cached": cached analyses only | "defer": also queue jobs for misses
+    ai: str = "none"
+
+def latest_readings(db, user_ids):
+    """
+    Latest SensorReading per farm in a single query:
+    join against (user_id, max(timestamp)) instead of one query per farm.
+    """
+    newest = db.query(
+        SensorReading.user_id.label("user_id"),
+        func.max(SensorReading.timestamp).label("timestamp")
+    ).filter(SensorReading.user_id.in_(user_ids)).group_by(SensorReading.user_id).subquery()
+
+    rows = db.query(SensorReading).join(
+        newest,
+        and_(SensorReading.user_id == newest.c.user_id, SensorReading.timestamp == newest.c.timestamp)
+    ).all()
+
+    readings = {}
+    for row in rows:
+        readings.setdefault(row.user_id, row)
+    return readings
+
+def visible_farm_ids(db, caller_id, farm_ids):
+    """Subset of farm_ids the caller may read: its own farm plus FarmAccess grants."""
+    granted = {
+        row.farm_id for row in db.query(FarmAccess.farm_id).filter(
+            FarmAccess.operator_id == caller_id,
+            FarmAccess.farm_id.in_(farm_ids)
+        ).all()
+    }
+    granted.add(caller_id)
+    return [farm_id for farm_id in farm_ids if farm_id in granted]
+
+def batch_ai(user_id, crop, weather, mode):
+    """AI card for one farm in a batch: cached analysis, or a queued job on a miss."""
+    key = analysis_cache.make_key(user_id, crop, weather)
+    if key is None:
+        return None, {"cache": "bypass"}
+
+    cached = analysis_cache.lookup(key, lambda: analyze_situation(weather, crop, user_id=user_id))
+    if cached is not None:
+        return format_ai_result(*cached)
+    if mode != "defer":
+        return None, {"cache": "miss"}
+
+    try:
+        job_id = job_queue.submit("dashboard_analysis", {"weather": weather, "crop_type": crop}, user_id)
+        return None, {"cache": "miss", "job_id": job_id}
+    except QueueFullError:
+        return None, {"cache": "miss", "error": "AI queue is busy"}
+
+@router.post("/batch")
+async def get_dashboard_batch(
+    request: DashboardBatchRequest,
+    x_farm_id: str = Header(..., alias="X-Farm-ID")
+):
+    """
+    Dashboard for many farms in one round-trip (multi-farm operators).
+
+    The caller (X-Farm-ID) may only request its own farm and farms granted
+    to it in FarmAccess; any other farm id rejects the whole request (403),
+    so readings cannot be read, nor AI jobs queued, for other users.
+
+    - Farms and their latest sensor readings are loaded with one query each
+    - Weather is fetched once per grid cell shared by the farms
+    - Virtual-sensor estimates for all sensorless farms run in one vectorized
+      pass, each with the farm's own physics profile
+    - AI analysis is opt-in: served from cache, optionally queuing jobs for misses
+    """
+    if request.ai not in ("none", "cached", "defer"):
+        raise HTTPException(status_code=400, detail="ai must be one of: none, cached, defer")
+
+    farm_ids = list(dict.fromkeys(request.farm_ids))
+    if len(farm_ids) > DASHBOARD_BATCH_MAX_FARMS:
+        raise HTTPException(status_code=400, detail=f"At most {DASHBOARD_BATCH_MAX_FARMS} farms per batch")
+
+    def load_rows():
+        # Own session: this runs in a worker thread
+        db = SessionLocal()
+        try:
+            visible = set(visible_farm_ids(db, x_farm_id, farm_ids))
+            denied = [farm_id for farm_id in farm_ids if farm_id not in visible]
+            if denied:
+                return denied, None, None, None
+            users = {user.id: user for user in db.query(User).filter(User.id.in_(farm_ids)).all()}
+            readings = latest_readings(db, farm_ids)
+        finally:
+            db.close()
+        profiles = physics_profiles.get_many([farm_id for farm_id in farm_ids if farm_id not in readings])
+        return [], users, readings, profiles
+
+    denied, users, readings, profiles = await asyncio.to_thread(load_rows)
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Not authorized for farm(s): {', '.join(denied[:10])}")
+
+    coordinates = {
+        farm_id: (users[farm_id].latitude, users[farm_id].longitude)
+        for farm_id in farm_ids
+        if farm_id in users and users[farm_id].latitude is not None and users[farm_id].longitude is not None
+    }
+    weather_by_cell = await weather_client.get_current_many(coordinates.values())
+
+    # Physics estimates for every sensorless farm (per-farm profiles) in one vectorized pass
+    virtual_farms = [farm_id for farm_id in farm_ids if farm_id in coordinates and farm_id not in readings]
+    virtual_by_farm = dict(zip(virtual_farms, virtual_indoor_many(
+        [weather_by_cell.get(weather_client.cache_key(*coordinates[farm_id])) for farm_id in virtual_farms],
+        [profiles[farm_id] for farm_id in virtual_farms]
+    )))
+
+    farms = []
+    for farm_id in farm_ids:
+        user = users.get(farm_id)
+        crop = request.crop_type or (user.crop_type if user and user.crop_type else "Strawberries")
+        if farm_id not in coordinates:
+            farms.append({
+                "farm_id": farm_id,
+                "location": {
+                    "name": user.location if user else None,
+                    "lat": None,
+                    "lon": None,
+                    "error": "Farm not found" if user is None else "Farm location not set"
+                },
+                "weather": empty_weather(),
+                "indoor": indoor_from_reading(readings[farm_id]) if farm_id in readings else empty_indoor(),
+                "crop": crop
+            })
+            continue
+
+        lat, lon = coordinates[farm_id]
+        cell = weather_client.cache_key(lat, lon)
+        weather = weather_by_cell.get(cell)
+
+        if farm_id in readings:
+            indoor = indoor_from_reading(readings[farm_id])
+        else:
+            indoor = virtual_by_farm[farm_id]
+
+        entry = {
+            "farm_id": farm_id,
+            "location": {"name": user.location or f"{lat:.2f}, {lon:.2f}", "lat": lat, "lon": lon, "country": None},
+            "weather": weather or empty_weather(),
+            "indoor": indoor,
+            "crop": crop
+        }
+        if request.ai != "none":
+            # A deferred miss inserts a job row; keep that off the event loop
+            entry["ai_analysis"], entry["ai_meta"] = await asyncio.to_thread(batch_ai, farm_id, crop, weather, request.ai)
+        farms.append(entry)
+
+    return {
+        "farms": farms,
+        "summary": {
+            "farms": len(farm_ids),
+            "located": len(coordinates),
+            "weather_cells": len(weather_by_cell),
+            "sensor_readings": len(readings)
+        }
+    }
+
+@router.get("/climate-forecast")
+async def get_climate_forecast(
+    lat: float,
+    lon: float,
+    hours: int = 48,
+    x_farm_id: str = Header(..., alias="X-Farm-ID")
+):
+    """
+    Hourly internal greenhouse forecast (temperature F, RH %, VPD kPa) for the
+    next `hours` hours, stepped through the external hourly forecast with the
+    farm's thermal_lag / moisture_retention and real day/night flags, starting
+    from the farm's newest sensor reading when it is recent.
+    """
+    from app.services.climate_forecast import farm_forecast, CLIMATE_FORECAST_MIN_HOURS, CLIMATE_FORECAST_MAX_HOURS
+
+    if not CLIMATE_FORECAST_MIN_HOURS <= hours <= CLIMATE_FORECAST_MAX_HOURS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"hours must be between {CLIMATE_FORECAST_MIN_HOURS} and {CLIMATE_FORECAST_MAX_HOURS}"
+        )
+
+    forecast = await farm_forecast(x_farm_id, lat, lon, hours)
+    if forecast is None:
+        raise HTTPException(status_code=503, detail="Hourly weather forecast unavailable")
+    return {"farm_id": x_farm_id, "lat": lat, "lon": lon, **forecast}
+
 def get_vpd_status(vpd):
     if vpd is None: return "No Data"
     if vpd < 0.4: return "Risk: Low (Humid)"
@@ -196,21 +597,40 @@ def get_vpd_status(vpd):
     return "Risk: High (Dry)"
 
 @router.get("/ai/analyze")
-def ai_analyze(
+async def ai_analyze(
     crop_type: str, 
     temp: float, 
     humidity: float, 
     rain: float, 
     wind: float,
     user_feedback: str = None,
+    defer: bool = False,
     x_farm_id: str = Header(..., alias="X-Farm-ID")
 ):
     # Reconstruct weather dict for the AI Engine
     weather = {"temperature": temp, "humidity": humidity, "rain": rain, "wind_speed": wind}
     try:
-        # Now pass feedback to the engine
-        insight = analyze_situation(weather, crop_type, user_feedback=user_feedback, user_id=x_farm_id)
-        return {"insight": insight}
+        # Now pass feedback to the engine (runs on the background job pool)
+        job_id = await job_queue.asubmit(
+            "dashboard_analysis",
+            {"weather": weather, "crop_type": crop_type, "user_feedback": user_feedback},
+            x_farm_id
+        )
+        if defer:
+            return {"job_id": job_id, "status": "queued"}
+
+        job = await job_queue.wait(job_id, timeout=JOB_INLINE_WAIT_SECONDS)
+        if job is None or job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=(job or {}).get("error") or "Analysis failed")
+        if job["status"] != "done":
+            return {"job_id": job_id, "status": job["status"]}
+        return {"insight": job["result"], "job_id": job_id}
+    except HTTPException:
+        raise
+    except InvalidPayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -225,16 +645,21 @@ def calibrate_sensors(
     """
     Endpoint for users to submit REAL ground truth to improve Physics Engine.
     Body: { "actual_temp": 25.5, "weather": {...} }
+    If "weather" is omitted, the farm's logged outside weather is used.
     
     CRITICAL: Each user's calibration data is stored separately to prevent data mixing.
-    
-    Note: Calibration data storage is not yet implemented in PostgreSQL schema.
-    This endpoint will return success but not persist calibration data until schema is updated.
+    The result is saved to the farm's FarmPhysicsProfile (write-behind) and
+    only affects that farm's estimates.
     """
     try:
         user_id = x_farm_id
         actual_temp = data.get("actual_temp")
         weather = data.get("weather") # Must match external weather format
+        if weather is None:
+            # Ingested weather for the farm's cell (live API only if the log is stale)
+            user = db.query(User).filter(User.id == user_id).first()
+            if user and user.latitude is not None and user.longitude is not None:
+                weather = fetch_weather_data(user.latitude, user.longitude)
         
         if actual_temp is None or weather is None:
             raise HTTPException(status_code=400, detail="Missing actual_temp or weather data")
@@ -245,16 +670,15 @@ def calibrate_sensors(
             "humidity": float(weather.get('humidity') or 50),
             "wind_speed": float(weather.get('wind_speed') or 0) * 0.44704,
             "rain": float(weather.get('rain') or 0) * 25.4,
-            "is_day": True 
+            "is_day": day_flag(weather.get('is_day'))
         }
         
-        # TODO: Store calibration data in PostgreSQL when schema is updated
-        # For now, just use physics engine calibration
-        result = physics_engine.calibrate_model((float(actual_temp) - 32) * 5/9, w_metric)
+        # Calibrate this farm's own profile (never the shared model)
+        result = physics_profiles.calibrate(user_id, (float(actual_temp) - 32) * 5/9, w_metric)
         
         return {
             "success": True,
-            "message": "Calibration processed (storage pending schema update)",
+            "message": "Calibration saved to farm physics profile",
             "user_id": user_id,
             "calibration_result": result
         }
@@ -302,17 +726,36 @@ def control_farm(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/reports/weekly")
-def get_weekly_report(
+async def get_weekly_report(
     crop_type: str = "tomato",
+    defer: bool = False,
     x_farm_id: str = Header(..., alias="X-Farm-ID")
 ):
     """
     Generates a PDF-like Weekly AI Report.
+    With defer=true, returns the last completed report (if any) plus the id
+    of a freshly queued job instead of waiting for Gemini.
     """
     try:
-        # Import here to avoid circular dependencies if simple
-        from app.services.ai_engine import generate_weekly_report
-        report_text = generate_weekly_report(crop_type, user_id=x_farm_id)
-        return {"report_text": report_text}
+        job_id = await job_queue.asubmit("weekly_report", {"crop_type": crop_type}, x_farm_id)
+        if defer:
+            last = await asyncio.to_thread(job_queue.latest_result, "weekly_report", x_farm_id)
+            return {
+                "report_text": last["result"]["report_text"] if last else None,
+                "generated_at": last["finished_at"] if last else None,
+                "job_id": job_id,
+                "status": "queued"
+            }
+
+        job = await job_queue.wait(job_id, timeout=JOB_INLINE_WAIT_SECONDS)
+        if job is None or job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=(job or {}).get("error") or "Report failed")
+        if job["status"] != "done":
+            return {"report_text": None, "job_id": job_id, "status": job["status"]}
+        return {"report_text": job["result"]["report_text"], "job_id": job_id}
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,15 +1,29 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header
 from app.services.data_handler import calculate_weekly_pest_risk, fetch_market_prices
 
 router = APIRouter()
 
 @router.get("/forecast")
-def get_pest_forecast(
+async def get_pest_forecast(
     crop_type: str = "Strawberries",
     lat: float = 37.7749,
-    lon: float = -122.4194
+    lon: float = -122.4194,
+    x_farm_id: Optional[str] = Header(None, alias="X-Farm-ID")
 ):
-    df = calculate_weekly_pest_risk(lat, lon, crop_type)
+    # With a farm id, score the farm's forecast internal climate (one cached run)
+    internal_daily = None
+    if x_farm_id:
+        from app.services.climate_forecast import farm_forecast, daily_outlook
+        try:
+            forecast = await farm_forecast(x_farm_id, lat, lon)
+            internal_daily = daily_outlook(forecast) if forecast else None
+        except Exception as e:
+            print(f"⚠️ Internal climate forecast unavailable: {e}")
+
+    df = await asyncio.to_thread(calculate_weekly_pest_risk, lat, lon, crop_type, internal_daily)
     if df.empty:
         return {"error": "Failed to calculate forecast", "data": []}
     
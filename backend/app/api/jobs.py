@@ -0,0 +1,87 @@
+"""
+Background Job API
+Submit / poll / result endpoints for LLM-backed analyses
+"""
+
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Optional
+
+from app.services.job_queue import job_queue, QueueFullError, InvalidPayloadError
+
+router = APIRouter()
+
+# Job kinds that can be submitted directly with a JSON payload.
+# (crop_diagnosis is submitted via /api/ai/diagnose?defer=true with an upload)
+SUBMITTABLE_KINDS = {"dashboard_analysis", "weekly_report", "environment_feedback"}
+
+# Authentication via X-Farm-ID header
+def get_current_user_id(x_farm_id: str = Header(..., alias="X-Farm-ID")):
+    """
+    Get current user ID from X-Farm-ID header.
+    This ensures jobs are isolated per user.
+    """
+    if not x_farm_id:
+        raise HTTPException(status_code=400, detail="Missing X-Farm-ID header")
+    return x_farm_id
+
+class JobSubmit(BaseModel):
+    kind: str
+    payload: dict = {}
+    wait_seconds: Optional[float] = 0
+
+@router.post("")
+async def submit_job(
+    job: JobSubmit,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Enqueue an LLM job. Returns the job id immediately, or the finished
+    job if it completes within `wait_seconds`.
+    """
+    if job.kind not in SUBMITTABLE_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unsupported job kind '{job.kind}'")
+
+    try:
+        job_id = await job_queue.asubmit(job.kind, job.payload, user_id)
+    except InvalidPayloadError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid payload for '{job.kind}': {e}")
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if job.wait_seconds:
+        return await job_queue.wait(job_id, timeout=min(job.wait_seconds, 30))
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+@router.get("/stats")
+async def get_job_stats():
+    """Queue depth, worker utilisation and wait/run latency percentiles."""
+    return job_queue.stats()
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Poll a job's status (and result once done)."""
+    job = await job_queue.aget(job_id, user_id=user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/result")
+async def get_job_result(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Returns the job result, 202 while pending, or 500 if it failed."""
+    job = await job_queue.aget(job_id, user_id=user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": job["status"]})
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"] or "Job failed")
+    return job["result"]
@@ -5,10 +5,12 @@ Generates weekly reports based on real user data
 
 from fastapi import APIRouter, HTTPException, Depends, Header
 from datetime import datetime, timedelta
+import numpy as np
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 
 from app.core.database import get_db, User, SensorReading, PestForecast
+from app.services import psychrometrics
 
 router = APIRouter()
 
@@ -94,20 +96,19 @@ async def get_weekly_report(
         
         # 4. Calculate summary statistics
         # Convert SQLAlchemy results to dict-like objects for easier processing
+        # VPD for every day in one vectorized pass (missing temperature / humidity -> 0)
+        daily_vpd = np.nan_to_num(psychrometrics.vpd_array(
+            [row.avg_temp for row in current_week_data],
+            [row.avg_humidity if row.avg_humidity else None for row in current_week_data],
+            unit="F"
+        ))
         current_week = []
-        for row in current_week_data:
-            # Calculate VPD from temperature and humidity
-            # VPD (kPa) = (1 - RH/100) * SVP
-            # SVP = 0.6108 * exp(17.27 * T / (T + 237.3))
-            temp_c = (row.avg_temp - 32) * 5/9 if row.avg_temp else 0
-            svp = 0.6108 * (2.71828 ** (17.27 * temp_c / (temp_c + 237.3))) if temp_c else 0
-            vpd = (1 - (row.avg_humidity / 100)) * svp if row.avg_humidity else 0
-            
+        for row, vpd in zip(current_week_data, daily_vpd):
             current_week.append({
                 'date': str(row.date),
                 'avg_temp': float(row.avg_temp) if row.avg_temp else None,
                 'avg_humidity': float(row.avg_humidity) if row.avg_humidity else None,
-                'avg_vpd': vpd,
+                'avg_vpd': float(vpd),
                 'readings_count': row.readings_count
             })
         
@@ -127,9 +128,9 @@ async def get_weekly_report(
         
         if prev_week_data and prev_week_data.prev_avg_temp:
             # Calculate previous week VPD
-            prev_temp_c = (prev_week_data.prev_avg_temp - 32) * 5/9
-            prev_svp = 0.6108 * (2.71828 ** (17.27 * prev_temp_c / (prev_temp_c + 237.3)))
-            prev_avg_vpd = (1 - (prev_week_data.prev_avg_humidity / 100)) * prev_svp if prev_week_data.prev_avg_humidity else 0
+            prev_avg_vpd = psychrometrics.vpd(
+                prev_week_data.prev_avg_temp, prev_week_data.prev_avg_humidity, unit="F"
+            ) if prev_week_data.prev_avg_humidity else 0
             
             temp_change = ((avg_temp - prev_week_data.prev_avg_temp) / prev_week_data.prev_avg_temp) * 100
             humidity_change = ((avg_humidity - prev_week_data.prev_avg_humidity) / prev_week_data.prev_avg_humidity) * 100 if prev_week_data.prev_avg_humidity else 0
@@ -175,6 +176,11 @@ async def get_weekly_report(
         
         # 8. Generate AI insights
         insights = generate_insights(avg_vpd, avg_temp, avg_humidity, pest_risk)
+
+        # 8b. Next 7 days from the farm's cached internal climate forecast
+        outlook = None
+        if user and user.latitude is not None and user.longitude is not None:
+            outlook = await weekly_outlook(user_id, user.latitude, user.longitude, crop_type)
         
         # 9. Identify best and worst days
         # Helper to safely get vpd
@@ -216,6 +222,7 @@ async def get_weekly_report(
                     "reason": "VPD outside optimal range"
                 }
             },
+            "outlook": outlook,
             "dataQuality": {
                 "totalDays": count,
                 "totalReadings": sum(row['readings_count'] for row in current_week),
@@ -233,6 +240,41 @@ async def get_weekly_report(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate weekly report: {str(e)}")
 
+async def weekly_outlook(user_id: str, lat: float, lon: float, crop_type: str):
+    """
+    Daily forecast greenhouse conditions and pest risk for the coming week,
+    from the same cached climate forecast run the pest forecast uses.
+    Returns None when no hourly forecast is available.
+    """
+    from app.services.climate_forecast import farm_forecast, daily_outlook
+    from app.services.pest_forecast import forecast_pest_risk
+
+    try:
+        forecast = await farm_forecast(user_id, lat, lon)
+    except Exception as e:
+        print(f"⚠️ Internal climate forecast unavailable: {e}")
+        return None
+    if not forecast:
+        return None
+
+    days = daily_outlook(forecast)
+    risks = forecast_pest_risk(crop_type, days)
+    return {
+        "days": [
+            {
+                "date": day["date"],
+                "maxTemp": day["max_temp"],
+                "humidity": day["humidity"],
+                "vpd": day["vpd"],
+                "vpdStatus": get_vpd_status(day["vpd"]),
+                "pestRisk": risk["Risk Score"],
+                "pestCondition": risk["Condition"]
+            }
+            for day, risk in zip(days, risks)
+        ],
+        "seededFromSensor": forecast["initial"] is not None
+    }
+
 def get_vpd_status(vpd: float) -> str:
     """Determine VPD status"""
     if vpd < 0.4:
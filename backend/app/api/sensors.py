@@ -11,6 +11,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 
 from app.core.database import get_db, SensorReading as SensorReadingModel
+from app.services import psychrometrics
 
 router = APIRouter()
 
@@ -168,11 +169,14 @@ async def get_sensor_history(
                 "data": []
             }
         
-        # Calculate VPD for each day
-        from app.services.data_handler import calculate_vpd
+        # VPD for every day in one vectorized pass (missing / zero averages -> None)
+        avg_vpd = psychrometrics.to_json_list(psychrometrics.vpd_array(
+            [row.avg_temp if row.avg_temp and row.avg_humidity else None for row in results],
+            [row.avg_humidity for row in results],
+            unit="F"
+        ), 2)
         data = []
-        for row in results:
-            vpd = calculate_vpd(row.avg_temp, row.avg_humidity) if row.avg_temp and row.avg_humidity else None
+        for row, vpd in zip(results, avg_vpd):
             data.append({
                 "date": str(row.date),
                 "avg_temp": round(float(row.avg_temp), 1) if row.avg_temp else None,
@@ -233,11 +237,20 @@ async def get_sensor_stats(
                 "message": "No data available for the specified period"
             }
         
-        # Calculate VPD stats
-        from app.services.data_handler import calculate_vpd
-        avg_vpd = calculate_vpd(result.avg_temp, result.avg_humidity) if result.avg_temp and result.avg_humidity else 0
-        min_vpd = calculate_vpd(result.min_temp, result.max_humidity) if result.min_temp and result.max_humidity else 0
-        max_vpd = calculate_vpd(result.max_temp, result.min_humidity) if result.max_temp and result.min_humidity else 0
+        # Calculate VPD stats (avg, min, max) in one vectorized pass
+        pairs = [
+            (result.avg_temp, result.avg_humidity),
+            (result.min_temp, result.max_humidity),
+            (result.max_temp, result.min_humidity)
+        ]
+        avg_vpd, min_vpd, max_vpd = (
+            value if value is not None else 0
+            for value in psychrometrics.to_json_list(psychrometrics.vpd_array(
+                [temp if temp and humidity else None for temp, humidity in pairs],
+                [humidity for _, humidity in pairs],
+                unit="F"
+            ), 2)
+        )
         
         return {
             "has_data": True,
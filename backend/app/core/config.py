@@ -13,3 +13,12 @@ else:
 
 # Auth Configuration
 DEFAULT_TEST_USER_ID = "test_user_001"
+
+# Local gazetteer (city -> coordinates index used by geocoding)
+GAZETTEER_PATH_ENV = os.getenv("GAZETTEER_PATH")
+if GAZETTEER_PATH_ENV:
+    GAZETTEER_DB_NAME = GAZETTEER_PATH_ENV
+elif DB_PATH_ENV:
+    GAZETTEER_DB_NAME = os.path.join(DB_PATH_ENV, "gazetteer.db")
+else:
+    GAZETTEER_DB_NAME = os.path.join(BASE_DIR, "gazetteer.db")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -121,16 +121,35 @@ class DataReminder(Base):
 # --- New Models for Sensorless AI Learning Loop ---
 
 class ExternalWeatherLog(Base):
-    """Stores external weather conditions from OpenWeatherMap API"""
+    """
+    Stores external weather conditions (Open-Meteo), written in bulk by the
+    weather ingestion scheduler (one series per weather grid cell).
+    Units are imperial, matching the dashboard: F, %, mph, inches.
+    Kinds:
+    - current: observed conditions; timestamp = observation time
+    - hourly: forecast; timestamp = valid hour
+    - daily: forecast; temp_out = max, temp_min = min, humi_out = mean, rain = total
+    """
     __tablename__ = "external_weather_logs"
+    __table_args__ = (
+        Index("ix_external_weather_logs_cell_kind_ts", "cell", "kind", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    location = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    location = Column(String, nullable=False) # Query point "lat,lon"
+    timestamp = Column(DateTime, default=datetime.utcnow) # UTC
     temp_out = Column(Float)  # External Temperature
     humi_out = Column(Float)  # External Humidity
     condition = Column(String) # Weather condition (e.g., "Clear", "Rain")
     wind_speed = Column(Float)
+    cell = Column(String) # Weather grid cell id, e.g. "754:-2449"
+    latitude = Column(Float)
+    longitude = Column(Float)
+    kind = Column(String, default="current") # current, hourly, daily
+    rain = Column(Float)
+    temp_min = Column(Float) # daily only
+    is_day = Column(Boolean)
+    fetched_at = Column(DateTime, default=datetime.utcnow) # When the row was ingested
 
 class VirtualEnvironmentLog(Base):
     """Stores AI-predicted internal environmental data"""
@@ -173,8 +192,47 @@ class FarmPhysicsProfile(Base):
     insulation_score = Column(Float, default=0.5) # 0.0 (Tent) ~ 1.0 (Bunker)
     moisture_retention = Column(Float, default=0.5) # How long humidity stays
     thermal_lag = Column(Float, default=1.0) # Hours delay for temp changes
+    ventilation_score = Column(Float, default=0.7) # 0.0 (Closed) ~ 1.0 (Fully Open)
+    solar_gain = Column(Float, default=5.0) # Daytime heat gain (C) before ventilation
+    calibration_samples = Column(Integer) # EXACT readings used by the last fit
+    calibration_rmse = Column(Float) # Fit error (C) on those readings
+    calibrated_at = Column(DateTime) # Last least-squares calibration run
     last_updated = Column(DateTime, default=datetime.utcnow)
 
+class AnalysisJob(Base):
+    """
+    Durable record of a background LLM job (analysis, diagnosis, report, feedback).
+    Status: queued -> running -> done | failed
+    """
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    user_id = Column(String, nullable=False, index=True)
+    kind = Column(String, nullable=False)  # dashboard_analysis, crop_diagnosis, weekly_report, environment_feedback
+    status = Column(String, nullable=False, default="queued")
+    payload = Column(Text)  # JSON input
+    result = Column(Text)   # JSON output
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class FarmAccess(Base):
+    """
+    Grants an operator read access to another farm (multi-farm batch dashboard).
+    A farm always sees itself; other farms need a row here.
+    """
+    __tablename__ = "farm_access"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    operator_id = Column(String, nullable=False)  # X-Farm-ID of the caller
+    farm_id = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_farm_access_operator_farm", "operator_id", "farm_id", unique=True),
+    )
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -1,10 +1,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api import dashboard, ai, forecast, market, sensors, reports, users, location
-from app.core.database import init_db
+from app.core.database import init_db, engine
+from app.services.metrics import metrics, instrument_engine
 
 app = FastAPI(title="Smart Farm AI API", version="2.0.0")
 
+# Per-query latency for every SQLAlchemy statement (exposed on /metrics)
+instrument_engine(engine)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize PostgreSQL database on startup"""
@@ -14,6 +19,42 @@ async def startup_event():
     except Exception as e:
         print(f"⚠️  Database initialization warning: {e}")
 
+    try:
+        from app.services.job_queue import job_queue
+        recovered = job_queue.recover()
+        if recovered:
+            print(f"🔁 Re-enqueued {recovered} pending background job(s)")
+    except Exception as e:
+        print(f"⚠️  Job recovery warning: {e}")
+
+    try:
+        from app.services.weather_ingest import weather_ingestor, WEATHER_INGEST_ENABLED
+        if WEATHER_INGEST_ENABLED:
+            # Only the process holding the leader lock polls Open-Meteo
+            weather_ingestor.start()
+            print("🌦️ Weather ingestion scheduler started")
+        else:
+            # Another instance ingests; still serve reads from its stored rows
+            weather_ingestor.client.local_store = weather_ingestor
+    except Exception as e:
+        print(f"⚠️  Weather ingestion warning: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the weather scheduler, release pooled outbound HTTP connections and job workers, flush physics profiles"""
+    from app.services.weather_ingest import weather_ingestor
+    await weather_ingestor.stop()
+
+    from app.services.weather_client import weather_client
+    await weather_client.aclose()
+
+    from app.services.job_queue import job_queue
+    job_queue.shutdown()
+
+    # Write pending calibration updates
+    from app.services.physics_profiles import physics_profiles
+    physics_profiles.flush()
+
 
 # CORS configuration - Include all necessary origins
 origins = [
@@ -72,6 +113,8 @@ from app.api import voice_logs
 app.include_router(voice_logs.router, prefix="/api/voice-logs", tags=["Voice Logs"])
 from app.api import admin
 app.include_router(admin.router, prefix="/api/admin", tags=["Admin"])
+from app.api import jobs
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 
 @app.get("/")
 def read_root():
@@ -84,3 +127,9 @@ def health_check():
 @app.get("/api/health")
 def api_health_check():
     return {"status": "healthy", "version": "2.0.0"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Per-stage latency quantiles and error counters in Prometheus text format"""
+    from app.services.llm_scheduler import llm_scheduler
+    return PlainTextResponse(metrics.render_prometheus() + llm_scheduler.render_prometheus(), media_type="text/plain; version=0.0.4")
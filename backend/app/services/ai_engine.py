@@ -1,12 +1,20 @@
 import os
 import json
-import google.generativeai as genai
+import time
 from dotenv import load_dotenv
 from functools import lru_cache
 from .db_handler import log_safety_event, get_weekly_stats
 from .physics_engine import physics_engine
+from .physics_profiles import physics_profiles
 from .safety_filter import safety_filter
-# from .claude_service import get_claude_response (Reverted to Gemini)
+from .metrics import metrics, timer
+from .gemini_pool import gemini_pool, DEFAULT_MODEL
+from .prescription_cache import prescription_cache
+from .single_flight import SingleFlight, SingleFlightTimeout
+from .llm_router import llm_router
+from .feedback_parser import parse_feedback
+from .structured_output import structured_output, PEST_RISK_SCHEMA, MARKET_PRICE_SCHEMA, past_days
+from .rule_prescription import rule_prescription
 
 load_dotenv()
 
@@ -25,17 +33,15 @@ def get_active_model_name():
     except:
         return "gemini-pro"
 
-def get_gemini_response(context_text, crop_type, role="Smart Farming Expert"):
-    api_key = get_api_key()
-    if not api_key:
-        return "Error: API Key not found. Please set GEMINI_API_KEY in .env"
+# Coalesce identical in-flight JSON analyses (morning bursts on a cold cache)
+pest_flight = SingleFlight("pest_risk")
+market_flight = SingleFlight("market_prices")
 
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(get_active_model_name())
-        
-        # SAFETY: Strict System Prompt for Legal Compliance
-        system_safety_prompt = """
+MANDATORY_DISCLAIMER = "\n\n[MANDATORY DISCLAIMER]: This analysis is generated by AI for informational purposes only. It is NOT a professional diagnosis. Always consult a certified agricultural professional."
+
+def build_prescription_prompt(context_text, crop_type, role="Smart Farming Expert"):
+    # SAFETY: Strict System Prompt for Legal Compliance
+    system_safety_prompt = """
         IMPORTANT SAFETY & LEGAL RULES:
         1. YOU ARE AN ASSISTANT, NOT A LICENSED AGRONOMIST.
         2. DO NOT RECOMMEND SPECIFIC CHEMICAL PESTICIDE BRAND NAMES.
@@ -43,8 +49,8 @@ def get_gemini_response(context_text, crop_type, role="Smart Farming Expert"):
         4. ALWAYS advise user to consult local extension services.
         5. Use soft language: "Consider", "Might help", "Monitor".
         """
-        
-        prompt = f"""
+    
+    return f"""
         {system_safety_prompt}
         
         You are {role}, also known as ForHuman AI.
@@ -64,24 +70,73 @@ def get_gemini_response(context_text, crop_type, role="Smart Farming Expert"):
         
         [DISCLAIMER]: This is an AI-generated suggestion for informational purposes only. Consult a professional before taking action.
         """
-        
-        response = model.generate_content(prompt)
-        final_text = response.text
-        disclaimer = "\n\n[MANDATORY DISCLAIMER]: This analysis is generated by AI for informational purposes only. It is NOT a professional diagnosis. Always consult a certified agricultural professional."
-        if "[DISCLAIMER]" not in final_text:
-            final_text += disclaimer
-        return final_text
-    except Exception as e:
-        # Fallback simulation
-        return f"""
+
+def simulated_prescription(crop_type, error):
+    # Fallback simulation
+    return f"""
         **Status**: Normal (Simulation Mode)
         **Prescription**: Maintain current irrigation schedule.
         **Reasoning**: Conditions are within expected ranges for {crop_type}. 
-        *(Error: {str(e)})*
+        *(Error: {str(error)})*
         
         [DISCLAIMER]: This is a simulated response.
         """
 
+def get_gemini_response(context_text, crop_type, role="Smart Farming Expert"):
+    # Routed through llm_router: Gemini first, failover / hedge to Claude if configured
+    if not llm_router.available():
+        return "Error: API Key not found. Please set GEMINI_API_KEY in .env"
+
+    try:
+        result = llm_router.generate(
+            build_prescription_prompt(context_text, crop_type, role),
+            stage="prescription",
+            priority="prescription"
+        )
+        final_text = result["text"]
+        if "[DISCLAIMER]" not in final_text:
+            final_text += MANDATORY_DISCLAIMER
+        return final_text
+    except Exception as e:
+        return simulated_prescription(crop_type, e)
+
+def stream_gemini_response(context_text, crop_type, role="Smart Farming Expert"):
+    """
+    Streaming variant of get_gemini_response: yields text chunks as Gemini
+    produces them. The chunks joined together are the raw response; the
+    caller is responsible for the disclaimer and safety post-processing.
+    Blocking generator - iterate it from a worker thread in async code.
+    """
+    api_key = get_api_key()
+    if not api_key:
+        yield "Error: API Key not found. Please set GEMINI_API_KEY in .env"
+        return
+
+    emitted = False
+    try:
+        with timer("gemini.prescription_stream"):
+            started = time.perf_counter()
+            response = gemini_pool.generate(
+                build_prescription_prompt(context_text, crop_type, role),
+                model_name=get_active_model_name(),
+                stage="gemini.prescription",
+                priority="prescription",
+                stream=True
+            )
+            for chunk in response:
+                text = getattr(chunk, "text", "")
+                if text:
+                    if not emitted:
+                        metrics.observe("gemini.prescription_stream_first_chunk", time.perf_counter() - started)
+                    emitted = True
+                    yield text
+    except Exception as e:
+        # Only fall back if nothing reached the client yet; otherwise keep the partial text
+        if not emitted:
+            yield simulated_prescription(crop_type, e)
+        else:
+            print(f"⚠️ Gemini stream interrupted: {e}")
+
 def load_knowledge_base():
     try:
         base_path = os.path.dirname(__file__)
@@ -92,19 +147,9 @@ def load_knowledge_base():
         print(f"Error loading KB: {e}")
         return {}
 
-def analyze_situation(weather, crop_type, user_feedback=None, user_id=None):
-    """
-    Analyzes current conditions using the 10-Step Hybrid Safety Filter.
-    Supports User Feedback Loop and User Isolation.
-    """
-    
-    # Define the core AI generation logic as a callback function
-    def ai_generator(microclimate):
-        # 1. Fetch Safety Limits
-        safety_limits = physics_engine.get_safety_limits(crop_type)
-        
-        # 2. Construct Context based on VALIDATED physics data
-        context = f"""
+def build_situation_context(weather, microclimate, user_feedback=None):
+    """Prompt context for the dashboard prescription, built from VALIDATED physics data."""
+    context = f"""
         [Hybrid Sensor Data - Physics Engine v1]
         The following data is ESTIMATED based on physical models (Sensorless Technology):
         
@@ -115,32 +160,18 @@ def analyze_situation(weather, crop_type, user_feedback=None, user_id=None):
         [External Weather Conditions]
         Temp: {weather['temperature']}F, Humidity: {weather['humidity']}%, Rain: {weather['rain']}in, Wind: {weather['wind_speed']}mph
         """
-        
-        # FEEDBACK INJECTION
-        if user_feedback:
-            context += f"\n\n[USER FEEDBACK - PRIORITY]: The user explicitly reports: '{user_feedback}'. Re-evaluate the diagnosis assuming this visual observation is TRUE, even if sensor data suggests otherwise."
-
-        # 3. Call AI
-        system_prompt = f"""
-        You are {get_active_model_name()} (ForHumanAI), an AI assistant for agriculture.
-        
-        [LEGAL & SAFETY PROTOCOLS]
-        1. NEVER provide a diagnosis as 'Final'. Always use terms like "Potential risk".
-        2. NEVER recommend specific chemical brand names.
-        
-        Output Format:
-        - **Status**: [Normal / Warning / Critical]
-        - **Prescription**: [Actionable advice]
-        - **Reasoning**: [Explain using the data provided]
-        """
-        
-        return get_gemini_response(context, crop_type, role="Smart Farm Hybrid Engine")
-
-    # EXECUTE 10-STEP SAFETY PIPELINE
-    # Note: run_pipeline calls ai_generator(microclimate) internally
-    response_text = safety_filter.run_pipeline(weather, crop_type, ai_generator)
     
-    # Post-Process: Calculate Confidence & Trigger Questions
+    # FEEDBACK INJECTION
+    if user_feedback:
+        context += f"\n\n[USER FEEDBACK - PRIORITY]: The user explicitly reports: '{user_feedback}'. Re-evaluate the diagnosis assuming this visual observation is TRUE, even if sensor data suggests otherwise."
+    return context
+
+def summarize_analysis(response_text, crop_type, user_feedback=None, user_id=None, source="llm"):
+    """
+    Post-Process a filtered response: Calculate Confidence & Trigger Questions.
+    Shared by analyze_situation and the streaming dashboard.
+    `source` records which path wrote the prescription ("rules" or "llm").
+    """
     classification = "Normal"
     if "Warning" in response_text: classification = "Warning"
     if "Critical" in response_text: 
@@ -159,10 +190,7 @@ def analyze_situation(weather, crop_type, user_feedback=None, user_id=None):
     
     # Only calculate confidence drop if NO user feedback has been given yet
     if not user_feedback:
-        # Get physics limits for heuristic check
-        # We need microclimate again or need to trust safety_filter passed it. 
-        # For simplicity, we re-estimate or define heuristic here.
-        # Actually safety_filter is robust. Let's rely on text analysis mostly.
+        # Safety filter has already cross-checked the physics, so rely on text analysis.
         if "Warning" in response_text and confidence_score > 0.9:
              # Basic check: If warning but no extreme feedback, maybe ask user
              question = {
@@ -175,9 +203,82 @@ def analyze_situation(weather, crop_type, user_feedback=None, user_id=None):
     return {
         "analysis_text": response_text,
         "confidence_score": confidence_score,
-        "validation_question": question
+        "validation_question": question,
+        "source": source
     }
 
+def analyze_situation(weather, crop_type, user_feedback=None, user_id=None):
+    """
+    Analyzes current conditions using the 10-Step Hybrid Safety Filter.
+    Supports User Feedback Loop and User Isolation (the microclimate uses
+    the farm's own physics profile).
+    """
+    
+    source = "llm"
+
+    # Define the core AI generation logic as a callback function
+    def ai_generator(microclimate):
+        nonlocal source
+        # Clearly-normal states get the standard block from the rule engine (no LLM call)
+        if not user_feedback:
+            rule_text = rule_prescription(crop_type, microclimate)
+            if rule_text:
+                source = "rules"
+                return rule_text
+
+        context = build_situation_context(weather, microclimate, user_feedback)
+        # Near-identical microclimates share one prescription; feedback prompts are never shared
+        return prescription_cache.get_or_generate(
+            prescription_cache.make_key(crop_type, microclimate),
+            lambda: get_gemini_response(context, crop_type, role="Smart Farm Hybrid Engine"),
+            bypass=bool(user_feedback)
+        )
+
+    # EXECUTE 10-STEP SAFETY PIPELINE
+    # Note: run_pipeline calls ai_generator(microclimate) internally
+    response_text = safety_filter.run_pipeline(weather, crop_type, ai_generator, physics=physics_profiles.model_for(user_id))
+    
+    return summarize_analysis(response_text, crop_type, user_feedback, user_id, source=source)
+
+def stream_situation(weather, crop_type, user_feedback=None, user_id=None):
+    """
+    Streaming variant of analyze_situation for the SSE dashboard.
+    Yields ("chunk", text) while Gemini generates, then ("result", analysis)
+    with the same dict analyze_situation returns. The final analysis_text has
+    the safety override and disclaimer applied and supersedes the chunks.
+    Blocking generator - iterate it from a worker thread in async code.
+    """
+    source = "llm"
+    try:
+        # Same 10-step pipeline as run_pipeline, with the AI step streamed
+        microclimate = safety_filter.prepare(weather, physics_profiles.model_for(user_id))
+        context = build_situation_context(weather, microclimate, user_feedback)
+
+        cache_key = None if user_feedback else prescription_cache.make_key(crop_type, microclimate)
+        rule_text = None if user_feedback else rule_prescription(crop_type, microclimate)
+        response_text = rule_text or prescription_cache.get(cache_key)
+        if rule_text:
+            source = "rules"
+            yield "chunk", rule_text
+        elif response_text is not None:
+            yield "chunk", response_text
+        else:
+            chunks = []
+            for chunk in stream_gemini_response(context, crop_type, role="Smart Farm Hybrid Engine"):
+                chunks.append(chunk)
+                yield "chunk", chunk
+
+            response_text = "".join(chunks)
+            if "[DISCLAIMER]" not in response_text:
+                response_text += MANDATORY_DISCLAIMER
+            prescription_cache.set(cache_key, response_text)
+        response_text = safety_filter.finalize(response_text, microclimate, crop_type)
+    except Exception as e:
+        print(f"Safety Filter Pipeline Crash (stream): {e}")
+        response_text = safety_filter.fail_safe_fallback(e)
+
+    yield "result", summarize_analysis(response_text, crop_type, user_feedback, user_id, source=source)
+
 def generate_weekly_report(crop_type, user_id):
     if not user_id:
         return "Error: User Identification Required for Report."
@@ -205,9 +306,6 @@ def generate_weekly_report(crop_type, user_id):
         return f"Weekly Report (Simulated): Stats indicate stable growth. Avg Temp {stats.get('avg_temp')}."
         
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(get_active_model_name()) # Use generic getter
-        
         system_safety_prompt = """
         IMPORTANT LEGAL DISCLAIMER:
         You are an AI assistant. Do NOT provide binding professional advice.
@@ -228,7 +326,7 @@ def generate_weekly_report(crop_type, user_id):
         
         [DISCLAIMER]: This report is AI-generated based on user data. Verify all conditions manually.
         """
-        response = model.generate_content(prompt)
+        response = gemini_pool.generate(prompt, model_name=get_active_model_name(), stage="gemini.weekly_report", priority="report")
         return response.text
     except Exception as e:
         return f"Error creating report: {e}"
@@ -245,8 +343,7 @@ def analyze_crop_image(image_data, user_id=None, crop_type=None):
     Returns:
         Diagnosis text with recommendations
     """
-    api_key = get_api_key()
-    if not api_key:
+    if not llm_router.available(vision=True):
         return "Error: API Key not found."
     
     try:
@@ -256,10 +353,6 @@ def analyze_crop_image(image_data, user_id=None, crop_type=None):
             save_diagnosis
         )
         
-        genai.configure(api_key=api_key)
-        model_name = "gemini-2.5-pro"  # Updated to latest model
-        model = genai.GenerativeModel(model_name)
-        
         # Build context-aware prompt
         base_prompt = """
         IMPORTANT LEGAL & SAFETY CHECK:
@@ -288,9 +381,9 @@ def analyze_crop_image(image_data, user_id=None, crop_type=None):
                 base_prompt += f"\n\n{history_context}"
                 base_prompt += "\nIMPORTANT: Check if current symptoms match or worsen previous issues."
         
-        # Call Gemini Vision API
-        response = model.generate_content([base_prompt, image_data])
-        diagnosis_text = response.text
+        # Vision call (Gemini vision model first, failover to Claude if configured)
+        result = llm_router.generate(base_prompt, image=image_data, stage="crop_diagnosis", priority="diagnosis", hedge=False)
+        diagnosis_text = result["text"]
         
         # Extract structured information from diagnosis
         severity = "Normal"
@@ -346,14 +439,21 @@ def analyze_crop_image(image_data, user_id=None, crop_type=None):
         return f"Global API Error: {str(e)}"
 
 def analyze_pest_risk_with_ai(weather_forecast, crop_type):
+    """Pest risk for a 7-day forecast; identical concurrent requests share one Gemini call."""
+    key = ((crop_type or "").lower(), json.dumps(weather_forecast, sort_keys=True, default=str))
+    try:
+        return pest_flight.do(key, lambda: _analyze_pest_risk_with_ai(weather_forecast, crop_type))
+    except SingleFlightTimeout as e:
+        print(f"AI Pest General Error: {e}")
+        return []
+
+def _analyze_pest_risk_with_ai(weather_forecast, crop_type):
     # REVERTED TO GEMINI
     api_key = get_api_key()
     if not api_key: return []
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.5-flash")  # Flash is fine for simple JSON tasks
-        
+        # Flash is fine for simple JSON tasks
         prompt = f"""
         You are an expert plant pathologist. 
         Analyze the pest/disease risk for {crop_type} based on this 7-day weather forecast.
@@ -375,38 +475,38 @@ def analyze_pest_risk_with_ai(weather_forecast, crop_type):
         ]
         """
         
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Robust Clean & Parse
-        try:
-            text = text.replace("```json", "").replace("```", "").strip()
-            import re
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-            if match:
-                return json.loads(match.group())
-            return json.loads(text)
-        except Exception as e:
-            print(f"AI Pest Parse Error: {e} | Raw: {text[:50]}...")
-            return []
+        # JSON mode + schema; a partial array is salvaged / repaired instead of discarded
+        dates = [day.get("date") for day in weather_forecast if isinstance(day, dict) and day.get("date")]
+        return structured_output.generate(
+            PEST_RISK_SCHEMA,
+            prompt,
+            expected_keys=dates or None,
+            stage="gemini.pest_risk",
+            priority="json"
+        )
     except Exception as e:
         print(f"AI Pest General Error: {e}")
         return []
 
 def analyze_market_prices_with_ai(crop_type):
+    """Estimated 7-day prices; identical concurrent requests share one Gemini call."""
+    try:
+        return market_flight.do((crop_type or "").lower(), lambda: _analyze_market_prices_with_ai(crop_type))
+    except SingleFlightTimeout as e:
+        print(f"AI Market General Error: {e}")
+        return []
+
+def _analyze_market_prices_with_ai(crop_type):
     # REVERTED TO GEMINI
     api_key = get_api_key()
     if not api_key: return []
 
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        
         prompt = f"""
         You are an agricultural market expert.
         Estimate the wholesale prices ($/lb) for {crop_type} in the US market for the PAST 7 DAYS (ending today).
         
-        Return a JSON ARRAY of 7 objects.
+        Return a JSON ARRAY of 7 objects, one per date: {json.dumps(past_days(7))}
         Do NOT use markdown code blocks. Just return the raw JSON.
         
         JSON Structure:
@@ -418,19 +518,13 @@ def analyze_market_prices_with_ai(crop_type):
         ]
         """
         
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        try:
-            text = text.replace("```json", "").replace("```", "").strip()
-            import re
-            match = re.search(r'\[.*\]', text, re.DOTALL)
-            if match:
-                return json.loads(match.group())
-            return json.loads(text)
-        except Exception as e:
-            print(f"AI Market Parse Error: {e} | Raw: {text[:50]}...")
-            return []
+        return structured_output.generate(
+            MARKET_PRICE_SCHEMA,
+            prompt,
+            expected_keys=past_days(7),
+            stage="gemini.market_prices",
+            priority="json"
+        )
     except Exception as e:
         print(f"AI Market General Error: {e}")
         return []
@@ -458,62 +552,121 @@ def analyze_environment_feedback(user_text: str) -> dict:
             "confidence": float  # How confident the AI is (0.0-1.0)
         }
     """
+    return analyze_environment_feedback_batch([user_text])[0]
+
+NO_FEEDBACK = {"is_feedback": False, "feedback_type": None, "feedback_value": None, "confidence": 0.0}
+FEEDBACK_TYPES = ("EXACT", "SENSORY", "OBSERVATION")
+
+def _normalize_feedback(item):
+    """
+    Coerces one LLM item to the feedback result shape: confidence becomes a
+    float (0.0 if unparseable); unknown feedback types or missing values
+    count as not-feedback.
+    """
+    try:
+        confidence = float(item.get("confidence") or 0.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    feedback_type = item.get("feedback_type")
+    feedback_type = feedback_type.strip().upper() if isinstance(feedback_type, str) else None
+    value = item.get("feedback_value")
+    if not item.get("is_feedback") or feedback_type not in FEEDBACK_TYPES or value in (None, ""):
+        return dict(NO_FEEDBACK, source="llm")
+    return {
+        "is_feedback": True,
+        "feedback_type": feedback_type,
+        "feedback_value": str(value),
+        "confidence": confidence,
+        "source": "llm"
+    }
+
+def analyze_environment_feedback_batch(texts):
+    """
+    Batched analyze_environment_feedback: one Gemini call for many voice
+    logs (field walks arrive in bursts). Returns one result dict per input
+    text, in order; items the model skipped come back as not-feedback.
+
+    Plain readings / sensory phrases are decided locally by feedback_parser;
+    only ambiguous texts are sent to Gemini.
+    """
+    if not texts:
+        return []
+
+    with timer("feedback.rules"):
+        results = [parse_feedback(text) for text in texts]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
     api_key = get_api_key()
     if not api_key:
-        return {"is_feedback": False, "confidence": 0.0}
-    
+        return [result or dict(NO_FEEDBACK) for result in results]
+
+    llm_results = _extract_feedback_with_ai([texts[i] for i in pending])
+    for i, result in zip(pending, llm_results):
+        results[i] = result
+    return results
+
+def _extract_feedback_with_ai(texts):
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        
+        numbered = json.dumps([{"index": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
         prompt = f"""
         You are an expert at extracting environmental feedback from farmer's casual speech.
         
-        Analyze this text: "{user_text}"
+        Analyze EACH of these texts independently:
+        {numbered}
         
-        Determine if it contains feedback about the farm environment (temperature, humidity, plant condition).
+        For each, determine if it contains feedback about the farm environment (temperature, humidity, plant condition).
         
         FEEDBACK TYPES:
         - EXACT: User provides a measured value (e.g., "It's 24 degrees", "Humidity is 60%")
         - SENSORY: User describes how it feels (e.g., "It's hot", "Feels dry", "Stuffy")
         - OBSERVATION: User describes plant/soil condition (e.g., "Leaves wilting", "Soil is dry")
         
-        Return ONLY a valid JSON object (no markdown):
-        {{
-            "is_feedback": true/false,
-            "feedback_type": "EXACT" | "SENSORY" | "OBSERVATION" | null,
-            "feedback_value": "extracted value" | null,
-            "confidence": 0.0-1.0
-        }}
+        Return ONLY a valid JSON array (no markdown) with one object per input, same order:
+        [
+            {{
+                "index": 0,
+                "is_feedback": true/false,
+                "feedback_type": "EXACT" | "SENSORY" | "OBSERVATION" | null,
+                "feedback_value": "extracted value" | null,
+                "confidence": 0.0-1.0
+            }}
+        ]
         
         Examples:
         Input: "It's 24 degrees right now"
-        Output: {{"is_feedback": true, "feedback_type": "EXACT", "feedback_value": "24C", "confidence": 0.95}}
+        Output: {{"index": 0, "is_feedback": true, "feedback_type": "EXACT", "feedback_value": "24C", "confidence": 0.95}}
         
         Input: "Feels really hot and humid today"
-        Output: {{"is_feedback": true, "feedback_type": "SENSORY", "feedback_value": "HOT_HUMID", "confidence": 0.85}}
+        Output: {{"index": 1, "is_feedback": true, "feedback_type": "SENSORY", "feedback_value": "HOT_HUMID", "confidence": 0.85}}
         
         Input: "The leaves are turning yellow and drooping"
-        Output: {{"is_feedback": true, "feedback_type": "OBSERVATION", "feedback_value": "YELLOWING_WILTING", "confidence": 0.90}}
+        Output: {{"index": 2, "is_feedback": true, "feedback_type": "OBSERVATION", "feedback_value": "YELLOWING_WILTING", "confidence": 0.90}}
         
         Input: "How's the weather tomorrow?"
-        Output: {{"is_feedback": false, "feedback_type": null, "feedback_value": null, "confidence": 0.0}}
+        Output: {{"index": 3, "is_feedback": false, "feedback_type": null, "feedback_value": null, "confidence": 0.0}}
         """
         
-        response = model.generate_content(prompt)
+        response = gemini_pool.generate(prompt, model_name=DEFAULT_MODEL, stage="gemini.environment_feedback", priority="feedback")
         text = response.text.strip()
         
         # Clean and parse JSON
         text = text.replace("```json", "").replace("```", "").strip()
         import re
-        match = re.search(r'\{.*\}', text, re.DOTALL)
-        if match:
-            result = json.loads(match.group())
-            return result
-        
-        return {"is_feedback": False, "confidence": 0.0}
+        match = re.search(r'\[.*\]', text, re.DOTALL)
+        items = json.loads(match.group()) if match else []
+
+        results = [dict(NO_FEEDBACK) for _ in texts]
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            index = item.get("index", position)
+            if isinstance(index, int) and 0 <= index < len(texts):
+                results[index] = _normalize_feedback(item)
+        return results
         
     except Exception as e:
         print(f"Feedback analysis error: {e}")
-        return {"is_feedback": False, "confidence": 0.0}
+        return [dict(NO_FEEDBACK) for _ in texts]
 
@@ -0,0 +1,180 @@
+"""
+Stale-While-Revalidate Cache for Dashboard AI Analysis
+Serves the last analysis immediately and refreshes it in the background
+once it is older than ANALYSIS_MAX_AGE_SECONDS.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import TTLCache
+from .prescription_cache import is_cacheable_response
+
+# Age after which a cached analysis is refreshed in the background
+ANALYSIS_MAX_AGE = int(os.getenv("ANALYSIS_MAX_AGE_SECONDS", "900"))
+# Age after which a cached analysis is discarded entirely
+ANALYSIS_HARD_TTL = int(os.getenv("ANALYSIS_HARD_TTL_SECONDS", "21600"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "4096"))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+# Weather quantization steps (imperial units, matching the dashboard)
+WEATHER_BUCKETS = {
+    "temperature": 2.0,   # F
+    "humidity": 5.0,      # %
+    "rain": 0.05,         # in
+    "wind_speed": 2.0     # mph
+}
+
+
+def quantize_weather(weather, buckets=WEATHER_BUCKETS):
+    """
+    Buckets weather values so that small fluctuations map to the same key.
+    Returns None if the weather is missing.
+    """
+    if not weather or weather.get('temperature') is None:
+        return None
+
+    quantized = []
+    for field, step in buckets.items():
+        value = weather.get(field)
+        quantized.append(None if value is None else round(float(value) / step))
+    return tuple(quantized)
+
+
+class AnalysisCache:
+    """
+    Per-(farm, crop, quantized weather) cache of `analyze_situation` results.
+
+    - Fresh hit: returned as-is.
+    - Stale hit (older than max_age): returned as-is, refresh scheduled.
+    - Miss: computed on the refresh pool and stored.
+
+    Fallback / error analyses (Gemini unavailable) are returned but never
+    stored, so an outage does not pin them for the farm.
+    """
+
+    def __init__(self, max_age=ANALYSIS_MAX_AGE, hard_ttl=ANALYSIS_HARD_TTL,
+                 maxsize=ANALYSIS_CACHE_SIZE, max_workers=ANALYSIS_WORKERS):
+        self.max_age = max_age
+        self._cache = TTLCache(maxsize=maxsize, ttl=hard_ttl)
+        self._refreshing = set()
+        self._inflight = {}  # key -> Future for cold misses
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-refresh")
+        self.skipped = 0
+
+    def _set(self, key, result):
+        text = result.get("analysis_text") if isinstance(result, dict) else None
+        if not is_cacheable_response(text):
+            with self._lock:
+                self.skipped += 1
+            return
+        self._cache.set(key, result)
+
+    def make_key(self, farm_id, crop_type, weather):
+        bucket = quantize_weather(weather)
+        if bucket is None:
+            return None
+        return (farm_id, (crop_type or "").lower(), bucket)
+
+    def is_refreshing(self, key):
+        with self._lock:
+            return key in self._refreshing
+
+    def _schedule_refresh(self, key, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, compute)
+
+    def _refresh(self, key, compute):
+        try:
+            self._set(key, compute())
+        except Exception as e:
+            # Keep serving the stale value; the next request will retry
+            print(f"⚠️ Background analysis refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def lookup(self, key, compute):
+        """
+        Returns a cached entry as (result, meta), scheduling a refresh if stale.
+        Returns None on a miss.
+        """
+        entry = self._cache.get_entry(key)
+        if entry is None:
+            return None
+
+        result, age = entry
+        stale = age > self.max_age
+        if stale:
+            self._schedule_refresh(key, compute)
+        return result, {
+            "cache": "stale" if stale else "hit",
+            "cache_age_seconds": int(age),
+            "refreshing": self.is_refreshing(key)
+        }
+
+    def get(self, key, compute):
+        """Blocking lookup; computes inline on a miss."""
+        if key is None:
+            return compute(), {"cache": "bypass", "cache_age_seconds": 0, "refreshing": False}
+
+        cached = self.lookup(key, compute)
+        if cached is not None:
+            return cached
+
+        result = compute()
+        self._set(key, result)
+        return result, {"cache": "miss", "cache_age_seconds": 0, "refreshing": False}
+
+    async def aget(self, key, compute):
+        """Async lookup; a miss is computed in a worker thread."""
+        if key is None:
+            result = await asyncio.to_thread(compute)
+            return result, {"cache": "bypass", "cache_age_seconds": 0, "refreshing": False}
+
+        cached = self.lookup(key, compute)
+        if cached is not None:
+            return cached
+
+        # Compute on the refresh pool and shield it: if the caller times out,
+        # the analysis still completes and lands in the cache for the next request.
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                self._refreshing.add(key)
+                future = self._executor.submit(self._compute_miss, key, compute)
+                self._inflight[key] = future
+        result = await asyncio.shield(asyncio.wrap_future(future))
+        return result, {"cache": "miss", "cache_age_seconds": 0, "refreshing": False}
+
+    def store(self, key, result):
+        """Stores a result computed outside the cache (e.g. a streamed analysis)."""
+        if key is not None:
+            self._set(key, result)
+
+    def _compute_miss(self, key, compute):
+        try:
+            result = compute()
+            self._set(key, result)
+            return result
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["max_age_seconds"] = self.max_age
+        with self._lock:
+            stats["refreshing"] = len(self._refreshing)
+            stats["skipped_uncacheable"] = self.skipped
+        return stats
+
+
+# Singleton instance for the dashboard
+analysis_cache = AnalysisCache()
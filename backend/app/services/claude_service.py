@@ -4,14 +4,65 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20240620")
+
+_client = None
+_client_key = None
+
 def get_anthropic_client():
+    """Shared Anthropic client (rebuilt only if the API key changes)."""
+    global _client, _client_key
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         print("⚠️ Warning: ANTHROPIC_API_KEY not found in environment variables.")
         return None
-    return anthropic.Anthropic(api_key=api_key)
+    if _client is None or api_key != _client_key:
+        _client = anthropic.Anthropic(api_key=api_key)
+        _client_key = api_key
+    return _client
+
+def create_claude_message(system_prompt, user_prompt, image_data=None, model=CLAUDE_MODEL, max_tokens=1000):
+    """
+    Calls the Messages API and returns the response text.
+    Raises on a missing key or API error (used by llm_router for failover).
+    """
+    client = get_anthropic_client()
+    if not client:
+        raise RuntimeError("ANTHROPIC_API_KEY is missing")
+
+    if image_data:
+        import base64
+        encoded_image = base64.b64encode(image_data).decode("utf-8")
+        content = [
+            {
+                "type": "image",
+                "source": {
+                    "type": "base64",
+                    "media_type": "image/jpeg", # Assuming JPEG for now, or detect
+                    "data": encoded_image
+                }
+            },
+            {
+                "type": "text",
+                "text": user_prompt
+            }
+        ]
+    else:
+        content = user_prompt
+
+    kwargs = {}
+    if system_prompt:
+        kwargs["system"] = system_prompt
+    message = client.messages.create(
+        model=model,
+        max_tokens=max_tokens,
+        temperature=0.2,
+        messages=[{"role": "user", "content": content}],
+        **kwargs
+    )
+    return message.content[0].text
 
-def get_claude_response(system_prompt, user_prompt, image_data=None, model="claude-3-5-sonnet-20240620", max_tokens=1000):
+def get_claude_response(system_prompt, user_prompt, image_data=None, model=CLAUDE_MODEL, max_tokens=1000):
     """
     Generates a response from Claude 3.5 Sonnet.
     
@@ -22,47 +73,11 @@ def get_claude_response(system_prompt, user_prompt, image_data=None, model="clau
         model (str): Model version.
         max_tokens (int): Max response length.
     """
-    client = get_anthropic_client()
-    if not client:
+    if not os.getenv("ANTHROPIC_API_KEY"):
         return "Error: ANTHROPIC_API_KEY is missing."
 
     try:
-        messages = []
-        
-        if image_data:
-            import base64
-            encoded_image = base64.b64encode(image_data).decode("utf-8")
-            messages.append({
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/jpeg", # Assuming JPEG for now, or detect
-                            "data": encoded_image
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": user_prompt
-                    }
-                ]
-            })
-        else:
-            messages.append({
-                "role": "user",
-                "content": user_prompt
-            })
-
-        message = client.messages.create(
-            model=model,
-            max_tokens=max_tokens,
-            temperature=0.2,
-            system=system_prompt,
-            messages=messages
-        )
-        return message.content[0].text
+        return create_claude_message(system_prompt, user_prompt, image_data, model, max_tokens)
     except Exception as e:
         print(f"Claude API Error: {str(e)}")
         return f"AI Service Unavailable: {str(e)}"
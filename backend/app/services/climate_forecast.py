@@ -0,0 +1,279 @@
+"""
+Hourly Internal-Climate Forecaster
+Steps a lagged greenhouse state through an hourly external forecast
+(48-168 h) instead of answering only "what is it inside right now".
+
+Each hour the physics model gives the equilibrium internal temperature and
+humidity for that hour's weather (with the real day/night flag). The
+internal state relaxes towards it with first-order lags:
+
+    state[t] = state[t-1] + alpha * (equilibrium[t] - state[t-1])
+    alpha    = 1 - exp(-dt / tau)
+
+tau is the farm's `thermal_lag` (hours) for temperature and
+`moisture_retention` * HUMIDITY_LAG_MAX_HOURS for humidity, both from
+FarmPhysicsProfile. The recurrence is evaluated in closed form as one
+matrix product (vectorized, no per-hour Python loop). The state starts from
+the farm's newest sensor reading when there is a recent one.
+
+One cached 168 h run per farm feeds the dashboard forecast, the pest risk
+forecast and the weekly report outlook (daily_outlook).
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .cache import TTLCache
+from .physics_profiles import physics_profiles
+from .weather_client import weather_client
+from .weather_ingest import weather_ingestor, build_rows
+
+CLIMATE_FORECAST_MIN_HOURS = 1
+CLIMATE_FORECAST_MAX_HOURS = 168
+# Humidity time constant (hours) of a farm with moisture_retention = 1.0
+HUMIDITY_LAG_MAX_HOURS = float(os.getenv("HUMIDITY_LAG_MAX_HOURS", "4.0"))
+CLIMATE_FORECAST_TTL = int(os.getenv("CLIMATE_FORECAST_TTL_SECONDS", "1800"))
+CLIMATE_FORECAST_CACHE_SIZE = int(os.getenv("CLIMATE_FORECAST_CACHE_SIZE", "1024"))
+# Sensor readings older than this do not seed the forecast state
+CLIMATE_SEED_MAX_AGE_HOURS = float(os.getenv("CLIMATE_SEED_MAX_AGE_HOURS", "6"))
+# Horizon shared by the pest risk forecast and the weekly report outlook
+CLIMATE_OUTLOOK_HOURS = 168
+
+
+def lag_weights(steps, tau_hours, dt_hours=1.0):
+    """
+    Lower-triangular (steps x steps) matrix W and initial-state decay d such
+    that the first-order lag of x starting from y0 is  y = d * y0 + W @ x.
+    tau <= 0 means no lag (y = x).
+    """
+    if tau_hours <= 0:
+        return np.eye(steps), np.zeros(steps)
+    decay = np.exp(-dt_hours / tau_hours)
+    alpha = 1.0 - decay
+    t = np.arange(steps)
+    # decay ** (t - k) for k <= t; exponents are non-negative so this never overflows
+    exponent = t[:, None] - t[None, :]
+    weights = np.where(exponent >= 0, alpha * decay ** np.maximum(exponent, 0), 0.0)
+    return weights, decay ** (t + 1)
+
+
+def lagged_series(target, tau_hours, initial=None, dt_hours=1.0):
+    """
+    First-order lag of `target` (1-D, or 2-D with one row per series sharing
+    tau). `initial` defaults to the first target value (a settled start).
+    """
+    target = np.asarray(target, dtype=float)
+    weights, decay = lag_weights(target.shape[-1], tau_hours, dt_hours)
+    initial = target[..., :1] if initial is None else np.asarray(initial, dtype=float)[..., None]
+    return initial * decay + target @ weights.T
+
+
+def forecast_internal_climate(hourly, physics, profile, initial=None):
+    """
+    Lagged internal climate for an hourly external forecast.
+
+    Args:
+        hourly (dict of arrays, metric): temperature (C), humidity (%),
+            wind_speed (m/s), rain (mm), is_day (bool)
+        physics: GreenhousePhysicsModel of the farm
+        profile (dict): thermal_lag, moisture_retention
+        initial (dict, optional): current internal {"temperature", "humidity"};
+            defaults to the equilibrium of the first hour
+
+    Returns:
+        dict of arrays: temperature (C), humidity (%), vpd (kPa) and the
+        unlagged equilibrium_temperature (C)
+    """
+    equilibrium = physics.estimate_microclimate_batch(
+        hourly["temperature"], hourly["humidity"], hourly["wind_speed"], hourly["rain"], hourly["is_day"]
+    )
+    initial = initial or {}
+    temperature = lagged_series(equilibrium["temperature"], profile["thermal_lag"], initial.get("temperature"))
+    humidity = lagged_series(
+        equilibrium["humidity"], profile["moisture_retention"] * HUMIDITY_LAG_MAX_HOURS, initial.get("humidity")
+    )
+    humidity = np.clip(humidity, 0, 100)
+    return {
+        "temperature": temperature,
+        "humidity": humidity,
+        "vpd": physics.calculate_vpd_batch(temperature, humidity),
+        "equilibrium_temperature": equilibrium["temperature"]
+    }
+
+
+def hourly_to_metric(rows):
+    """Stored hourly weather rows (imperial, as read_hourly returns) -> metric columns."""
+    def column(field, default):
+        return np.array([default if row.get(field) is None else row[field] for row in rows], dtype=float)
+
+    return {
+        "temperature": (column("temperature", np.nan) - 32) * 5 / 9,
+        "humidity": column("humidity", 50.0),
+        "wind_speed": column("wind_speed", 0.0) * 0.44704,
+        "rain": column("rain", 0.0) * 25.4,
+        "is_day": np.array([row.get("is_day") is not False for row in rows], dtype=bool)
+    }
+
+
+def latest_indoor(user_id, max_age_hours=CLIMATE_SEED_MAX_AGE_HOURS):
+    """
+    Newest SensorReading of a farm as a forecast seed in metric units
+    ({"temperature": C, "humidity": %}), or None without a recent reading.
+    """
+    from app.core.database import SessionLocal, SensorReading
+
+    if not user_id:
+        return None
+    db = SessionLocal()
+    try:
+        reading = db.query(SensorReading).filter(
+            SensorReading.user_id == user_id,
+            SensorReading.temperature.isnot(None),
+            SensorReading.timestamp >= datetime.utcnow() - timedelta(hours=max_age_hours)
+        ).order_by(SensorReading.timestamp.desc()).first()
+    finally:
+        db.close()
+
+    if reading is None:
+        return None
+    return {"temperature": (reading.temperature - 32) * 5 / 9, "humidity": reading.humidity}
+
+
+def _seed_key(initial):
+    if not initial:
+        return None
+    return tuple(
+        None if initial.get(field) is None else round(float(initial[field]), 1)
+        for field in ("temperature", "humidity")
+    )
+
+
+class ClimateForecaster:
+    """Per-farm hourly forecasts, computed once per (farm, cell, horizon, seed) and cached."""
+
+    def __init__(self, ttl=CLIMATE_FORECAST_TTL, maxsize=CLIMATE_FORECAST_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def forecast(self, user_id, cell, hourly_rows, initial=None):
+        """
+        Returns the JSON-ready hourly series for a farm (imperial temperature
+        to match the dashboard), or None if there are no usable hours.
+        `initial` is the current internal state in metric (see latest_indoor).
+        """
+        rows = [row for row in hourly_rows if row.get("temperature") is not None]
+        if not rows:
+            return None
+        key = (user_id, cell, len(rows), rows[0]["timestamp"], _seed_key(initial))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        profile = physics_profiles.get(user_id)
+        physics = physics_profiles.model_for(user_id, profile)
+        series = forecast_internal_climate(hourly_to_metric(rows), physics, profile, initial)
+
+        result = {
+            "hours": [_iso(row["timestamp"]) for row in rows],
+            "is_day": [row.get("is_day") is not False for row in rows],
+            "temperature": [round(float(value), 1) for value in series["temperature"] * 9 / 5 + 32],
+            "humidity": [round(float(value), 1) for value in series["humidity"]],
+            "vpd": [round(float(value), 2) for value in series["vpd"]],
+            "external_temperature": [row["temperature"] for row in rows],
+            "rain": [row.get("rain") or 0.0 for row in rows],
+            "initial": None if not initial else {
+                "temperature": round(initial["temperature"] * 9 / 5 + 32, 1),
+                "humidity": initial.get("humidity")
+            },
+            "profile": {
+                "thermal_lag": profile["thermal_lag"],
+                "moisture_retention": profile["moisture_retention"],
+                "insulation_score": profile["insulation_score"]
+            },
+            "units": {"temperature": "F", "humidity": "%", "vpd": "kPa", "rain": "in"}
+        }
+        self._cache.set(key, result)
+        return result
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def daily_outlook(forecast):
+    """
+    Per-day summary of a forecast() result: internal max temperature (F),
+    mean humidity and VPD, and external rain (in). Rows have the shape
+    pest_forecast.forecast_pest_risk takes.
+    """
+    days = {}
+    for hour, temp, humidity, vpd, rain in zip(
+        forecast["hours"], forecast["temperature"], forecast["humidity"], forecast["vpd"], forecast["rain"]
+    ):
+        day = days.setdefault(hour[:10], {"temperature": [], "humidity": [], "vpd": [], "rain": 0.0})
+        day["temperature"].append(temp)
+        day["humidity"].append(humidity)
+        day["vpd"].append(vpd)
+        day["rain"] += rain
+
+    return [
+        {
+            "date": date,
+            "max_temp": max(day["temperature"]),
+            "humidity": round(sum(day["humidity"]) / len(day["humidity"]), 1),
+            "vpd": round(sum(day["vpd"]) / len(day["vpd"]), 2),
+            "rain": round(day["rain"], 2)
+        }
+        for date, day in days.items()
+    ]
+
+
+async def load_hourly_weather(key, hours):
+    """
+    Hourly external forecast rows for a weather cell: stored rows from the
+    ingestion scheduler, else one live fetch (stored for the next request).
+    """
+    rows = await asyncio.to_thread(weather_ingestor.read_hourly, key, None, hours)
+    if len(rows) >= hours:
+        return rows
+
+    days = min(16, hours // 24 + 2)
+    data = await weather_client.fetch_cell(key, include_forecast=True, forecast_days=days)
+    if data is None:
+        return rows
+    fetched = build_rows(key, data, datetime.utcnow())
+    try:
+        await asyncio.to_thread(weather_ingestor.store, fetched)
+    except Exception as e:
+        print(f"⚠️ Failed to store hourly forecast: {e}")
+
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    hourly = sorted((row for row in fetched if row["kind"] == "hourly" and row["timestamp"] >= start), key=lambda row: row["timestamp"])
+    return [
+        {
+            "timestamp": row["timestamp"],
+            "temperature": row["temp_out"],
+            "humidity": row["humi_out"],
+            "rain": row["rain"],
+            "wind_speed": row["wind_speed"],
+            "is_day": row["is_day"],
+            "condition": row["condition"]
+        }
+        for row in hourly[:hours]
+    ]
+
+
+async def farm_forecast(user_id, lat, lon, hours=CLIMATE_OUTLOOK_HOURS):
+    """Forecast for a farm location, seeded from the farm's newest sensor reading."""
+    key = weather_client.cache_key(lat, lon)
+    rows = await load_hourly_weather(key, hours)
+    initial = await asyncio.to_thread(latest_indoor, user_id)
+    return await asyncio.to_thread(climate_forecaster.forecast, user_id, key, rows, initial)
+
+
+def _iso(timestamp):
+    return timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp)
+
+
+# Singleton instance
+climate_forecaster = ClimateForecaster()
@@ -1,34 +1,78 @@
 import requests
 import pandas as pd
 import random
-import math
 import os
 from datetime import datetime, timedelta
 from functools import lru_cache
+from .weather_client import weather_client
+from .gazetteer import gazetteer
+from .metrics import timed, timer
+from . import psychrometrics
 
-@lru_cache(maxsize=128)
+@timed("weather.fetch_current")
 def fetch_weather_data(lat=37.7749, lon=-122.4194):
     """
     Fetches current weather data from Open-Meteo API.
+    Served from the shared weather client (pooled connections + TTL cache).
+    """
+    return weather_client.get_current_sync(lat, lon)
+
+async def fetch_weather_data_async(lat=37.7749, lon=-122.4194):
+    """
+    Non-blocking variant of fetch_weather_data for async request handlers.
+    """
+    with timer("weather.fetch_current"):
+        return await weather_client.get_current(lat, lon)
+
+@timed("geocoding.remote")
+def search_city_remote(city_name):
+    """
+    Queries the Open-Meteo geocoding API. Returns a list of raw results.
+    """
+    url = "https://geocoding-api.open-meteo.com/v1/search"
+    params = {
+        "name": city_name,
+        "count": 100, # Increased from 10 to ensure major cities are found
+        "language": "en",
+        "format": "json"
+    }
+    response = requests.get(url, params=params, timeout=5)
+    data = response.json()
+    return data.get("results") or []
+
+def search_city(city_name, preferred_country=None):
+    """
+    Looks a city up in the local gazetteer first; falls back to the remote
+    API only on an exact-name miss (or when the preferred country is missing locally)
+    and writes the remote results back into the index.
     """
     try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,relative_humidity_2m,precipitation,rain,wind_speed_10m&temperature_unit=fahrenheit&wind_speed_unit=mph&precipitation_unit=inch"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        current = data.get('current', {})
-        return {
-            "temperature": current.get('temperature_2m'),
-            "humidity": current.get('relative_humidity_2m'),
-            "rain": current.get('rain', 0.0),
-            "wind_speed": current.get('wind_speed_10m', 0.0)
-        }
+        with timer("geocoding.gazetteer"):
+            results = gazetteer.search(city_name)
     except Exception as e:
-        print(f"Error fetching weather: {e}")
-        # STRICT REAL DATA POLICY: Return None on failure, do not fake data
-        return None
+        print(f"⚠️ Gazetteer lookup failed for '{city_name}': {e}")
+        results = []
+
+    has_country = not preferred_country or any(r.get("country_code") == preferred_country for r in results)
+    if results and has_country:
+        return results
+
+    try:
+        remote_results = search_city_remote(city_name)
+    except Exception as e:
+        print(f"Geocoding error for '{city_name}': {e}")
+        return results
+
+    if remote_results:
+        try:
+            gazetteer.add_results(remote_results)
+        except Exception as e:
+            print(f"⚠️ Gazetteer write-back failed for '{city_name}': {e}")
+        return remote_results
+    return results
 
 @lru_cache(maxsize=256)
+@timed("geocoding.resolve")
 def get_coordinates_from_city(city_name, preferred_country=None):
     """
     Enhanced geocoding with country preference support
@@ -39,20 +83,11 @@ def get_coordinates_from_city(city_name, preferred_country=None):
         preferred_country: ISO country code (e.g., 'US', 'GB', 'KR') to prioritize
     """
     try:
-        url = "https://geocoding-api.open-meteo.com/v1/search"
-        params = {
-            "name": city_name,
-            "count": 100, # Increased from 10 to ensure major cities are found
-            "language": "en",
-            "format": "json"
-        }
-        response = requests.get(url, params=params, timeout=5)
-        data = response.json()
+        results = search_city(city_name, preferred_country)
         
-        if "results" not in data or not data["results"]:
-            return None, None, None
+        if not results:
+            return None, None, None, None
         
-        results = data["results"]
         best_match = None
 
         # Helper to get population safely
@@ -113,10 +148,7 @@ def get_coordinates_from_city(city_name, preferred_country=None):
         return None, None, None, None
 
 def calculate_vpd(temp_f, humidity):
-    temp_c = (temp_f - 32) * 5.0/9.0
-    svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
-    vpd = svp * (1 - (humidity / 100))
-    return round(vpd, 2)
+    return psychrometrics.vpd(temp_f, humidity, unit="F", decimals=2)
 
 def calculate_pest_risk(weather_data, crop_type):
     temp = weather_data['temperature']
@@ -158,21 +190,22 @@ def calculate_pest_risk(weather_data, crop_type):
 
 from .ai_engine import analyze_pest_risk_with_ai, analyze_market_prices_with_ai
 
-@lru_cache(maxsize=64)
+@timed("weather.fetch_forecast")
 def fetch_7day_weather(lat, lon):
-    try:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=temperature_2m_max,temperature_2m_min,relative_humidity_2m_mean,precipitation_sum&temperature_unit=fahrenheit&precipitation_unit=inch&wind_speed_unit=mph&timezone=auto"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        return data.get('daily', {})
-    except Exception as e:
-        print(f"Error forecast: {e}")
-        return {}
+    return weather_client.get_daily_forecast_sync(lat, lon)
 
-def calculate_weekly_pest_risk(lat, lon, crop_type):
+async def fetch_7day_weather_async(lat, lon):
+    with timer("weather.fetch_forecast"):
+        return await weather_client.get_daily_forecast(lat, lon)
+
+def calculate_weekly_pest_risk(lat, lon, crop_type, internal_daily=None):
     """
     Calculate pest risk using scientific models + AI fallback
     Priority: Scientific Models > AI > Rule-based
+
+    internal_daily: optional climate_forecast.daily_outlook rows; the
+    scientific model then scores forecast greenhouse conditions instead of
+    the external weather.
     """
     daily = fetch_7day_weather(lat, lon)
     if not daily:
@@ -193,11 +226,11 @@ def calculate_weekly_pest_risk(lat, lon, crop_type):
     # Try scientific model first
     try:
         from app.services.pest_forecast import forecast_pest_risk
-        forecast_data = forecast_pest_risk(crop_type, weather_summary)
+        forecast_data = forecast_pest_risk(crop_type, internal_daily or weather_summary)
         
         if forecast_data:
             df = pd.DataFrame(forecast_data)
-            df['Source'] = "Scientific Pest Model"
+            df['Source'] = "Scientific Pest Model (internal climate forecast)" if internal_daily else "Scientific Pest Model"
             return df
     except ImportError:
         print("⚠️ pest_forecast module not available, trying AI")
@@ -208,10 +241,11 @@ def calculate_weekly_pest_risk(lat, lon, crop_type):
     ai_results = analyze_pest_risk_with_ai(weather_summary, crop_type)
     
     if ai_results:
-        # Merge AI results with rain data for chart
-        for i, item in enumerate(ai_results):
-            if i < len(daily['precipitation_sum']):
-                 item["Rain (in)"] = daily['precipitation_sum'][i]
+        # Merge AI results with rain data for chart, by date: a salvaged
+        # partial result may skip days, so list positions do not line up
+        rain_by_date = dict(zip(dates, daily.get('precipitation_sum', [])))
+        for item in ai_results:
+            item["Rain (in)"] = rain_by_date.get(str(item.get("Date")))
         
         df_ai = pd.DataFrame(ai_results)
         df_ai['Source'] = "AI Analysis (Gemini 1.5)"
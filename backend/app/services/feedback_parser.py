@@ -0,0 +1,198 @@
+"""
+Deterministic Voice Feedback Parser
+Rule / lexicon fast path for analyze_environment_feedback. Handles the
+common cases locally:
+
+- EXACT: numeric temperature ("it's 24 degrees", "75F") and humidity
+  ("humidity is 60%") readings, normalized to Celsius / percent
+- SENSORY: how it feels ("hot", "humid", "stuffy", "dry")
+
+Produces the same schema as the LLM extractor. Returns None for anything
+ambiguous (questions, negations, plant / soil observations, conflicting or
+multiple readings), which then falls through to Gemini.
+"""
+import re
+
+# Celsius range we accept as a plausible farm reading
+TEMP_RANGE_C = (-30.0, 60.0)
+# "N degrees" with no unit: above UNITLESS_FAHRENHEIT_ABOVE it's Fahrenheit,
+# below UNITLESS_CELSIUS_BELOW it's Celsius; in between (e.g. "40 degrees")
+# the unit is ambiguous
+UNITLESS_FAHRENHEIT_ABOVE = 45.0
+UNITLESS_CELSIUS_BELOW = 32.0
+
+CONFIDENCE_EXPLICIT = 0.95
+CONFIDENCE_INFERRED_UNIT = 0.8
+CONFIDENCE_SENSORY = 0.8
+CONFIDENCE_SENSORY_EMPHASIS = 0.85
+
+# word -> (axis, tag); one tag per axis, ordered temperature / humidity / air
+SENSORY_LEXICON = {
+    "hot": ("temperature", "HOT"),
+    "boiling": ("temperature", "HOT"),
+    "scorching": ("temperature", "HOT"),
+    "sweltering": ("temperature", "HOT"),
+    "roasting": ("temperature", "HOT"),
+    "baking": ("temperature", "HOT"),
+    "warm": ("temperature", "WARM"),
+    "toasty": ("temperature", "WARM"),
+    "cool": ("temperature", "COOL"),
+    "chilly": ("temperature", "COOL"),
+    "nippy": ("temperature", "COOL"),
+    "cold": ("temperature", "COLD"),
+    "freezing": ("temperature", "COLD"),
+    "frigid": ("temperature", "COLD"),
+    "icy": ("temperature", "COLD"),
+    "humid": ("humidity", "HUMID"),
+    "muggy": ("humidity", "HUMID"),
+    "sticky": ("humidity", "HUMID"),
+    "steamy": ("humidity", "HUMID"),
+    "clammy": ("humidity", "HUMID"),
+    "damp": ("humidity", "HUMID"),
+    "dry": ("humidity", "DRY"),
+    "arid": ("humidity", "DRY"),
+    "parched": ("humidity", "DRY"),
+    "stuffy": ("air", "STUFFY"),
+    "stale": ("air", "STUFFY"),
+    "airless": ("air", "STUFFY")
+}
+AXIS_ORDER = ("temperature", "humidity", "air")
+
+# Mentions of plants / soil make "dry", "cold", ... an OBSERVATION (LLM path)
+OBSERVATION_WORDS = re.compile(
+    r"\b(soil|dirt|ground|leaf|leaves|plant|plants|stem|stems|root|roots|fruit|fruits|"
+    r"flower|flowers|seedling|seedlings|bud|buds|vine|vines|crop|crops|mold|mould|wilt\w*|yellow\w*|rot\w*)\b"
+)
+NEGATION = re.compile(r"\b(not|no longer|never|isn't|isnt|wasn't|wasnt|aren't|arent|doesn't|doesnt|don't|dont|hardly|barely)\b")
+QUESTION = re.compile(r"\?|^\s*(how|what|when|will|is it going|should|can|could|do|does)\b")
+# Hypotheticals / forecasts are not a reading of the current environment
+NOT_CURRENT = re.compile(r"\b(tomorrow|yesterday|forecast|will be|going to be|gonna be|last (night|week)|next)\b")
+# A sensory word needs a cue that it describes the environment ("ok cool" is not feedback)
+CONTEXT = re.compile(
+    r"\b(it's|it is|its|feels?|felt|feeling|getting|got|in here|out here|greenhouse|house|tunnel|barn|"
+    r"air|today|outside|inside|morning|afternoon|evening|tonight|now|this)\b"
+)
+FILLER_WORDS = {"and", "so", "very", "really", "super", "extremely", "too", "way", "quite", "pretty", "kinda", "bit", "a", "little"}
+EMPHASIS = re.compile(r"\b(so|very|really|super|extremely|too|incredibly|way too)\b")
+
+NUMBER = r"(-?\d+(?:\.\d+)?)"
+TEMPERATURE_READING = re.compile(
+    NUMBER + r"\s*(?:°\s*|º\s*|degrees?\s*|deg\s*)?"
+    r"(celsius|centigrade|fahrenheit|c|f)\b"
+    r"|" + NUMBER + r"\s*(?:°|º|degrees?|deg)"
+)
+HUMIDITY_READING = re.compile(
+    r"(?:humidity|rh|relative humidity)\D{0,12}?" + NUMBER + r"\s*(?:%|percent)?"
+    r"|" + NUMBER + r"\s*(?:%|percent)\s*(?:relative\s+)?(?:humidity|rh)\b"
+)
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", (text or "").lower().replace("’", "'")).strip()
+
+
+def _result(feedback_type, value, confidence):
+    return {
+        "is_feedback": True,
+        "feedback_type": feedback_type,
+        "feedback_value": value,
+        "confidence": confidence,
+        "source": "rules"
+    }
+
+
+def _format_number(value):
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _temperature_readings(text):
+    readings = []
+    for match in TEMPERATURE_READING.finditer(text):
+        if match.group(1) is not None:
+            value, unit = float(match.group(1)), match.group(2)[0]
+            if unit == "f":
+                readings.append(((value - 32) * 5 / 9, CONFIDENCE_EXPLICIT))
+            else:
+                readings.append((value, CONFIDENCE_EXPLICIT))
+        else:
+            value = float(match.group(3))
+            if value > UNITLESS_FAHRENHEIT_ABOVE:
+                readings.append(((value - 32) * 5 / 9, CONFIDENCE_INFERRED_UNIT))
+            elif value < UNITLESS_CELSIUS_BELOW:
+                readings.append((value, CONFIDENCE_INFERRED_UNIT))
+            else:
+                readings.append((None, 0.0))
+    return readings
+
+
+def _humidity_readings(text):
+    readings = []
+    for match in HUMIDITY_READING.finditer(text):
+        raw = match.group(1) if match.group(1) is not None else match.group(2)
+        readings.append(float(raw))
+    return readings
+
+
+def parse_exact(text):
+    temperatures = _temperature_readings(text)
+    humidities = _humidity_readings(text)
+    if not temperatures and not humidities:
+        return None
+    # One reading per voice log; anything more is left to the LLM
+    if len(temperatures) + len(humidities) != 1:
+        return None
+
+    if temperatures:
+        celsius, confidence = temperatures[0]
+        if celsius is None or not TEMP_RANGE_C[0] <= celsius <= TEMP_RANGE_C[1]:
+            return None
+        return _result("EXACT", f"{_format_number(celsius)}C", confidence)
+
+    humidity = humidities[0]
+    if not 0 <= humidity <= 100:
+        return None
+    return _result("EXACT", f"{_format_number(humidity)}%", CONFIDENCE_EXPLICIT)
+
+
+def parse_sensory(text):
+    tags = {}
+    for word in re.findall(r"[a-z]+", text):
+        entry = SENSORY_LEXICON.get(word)
+        if entry is None:
+            continue
+        axis, tag = entry
+        if tags.get(axis, tag) != tag:
+            # "hot and cold", "warm ... hot": conflicting on one axis
+            return None
+        tags[axis] = tag
+    if not tags:
+        return None
+    words = re.findall(r"[a-z']+", text)
+    if not CONTEXT.search(text) and not all(w in SENSORY_LEXICON or w in FILLER_WORDS for w in words):
+        return None
+
+    value = "_".join(tags[axis] for axis in AXIS_ORDER if axis in tags)
+    confidence = CONFIDENCE_SENSORY_EMPHASIS if EMPHASIS.search(text) else CONFIDENCE_SENSORY
+    return _result("SENSORY", value, confidence)
+
+
+def parse_feedback(text):
+    """
+    Returns the feedback dict for texts the rules can decide, or None when
+    the text should go to the LLM extractor.
+    """
+    text = _normalize(text)
+    if not text:
+        return None
+    if QUESTION.search(text) or NEGATION.search(text) or NOT_CURRENT.search(text):
+        return None
+
+    exact = parse_exact(text)
+    if exact is not None:
+        return exact
+    if re.search(r"\d", text):
+        # Numbers the rules could not read (e.g. "it's 24") are ambiguous
+        return None
+    if OBSERVATION_WORDS.search(text):
+        return None
+    return parse_sensory(text)
@@ -0,0 +1,165 @@
+"""
+Local Gazetteer Index
+On-disk SQLite index of cities (lat/lon, country, admin1, population) used
+by geocoding before falling back to the remote Open-Meteo search.
+
+- Opened lazily on first lookup and memory-mapped by SQLite
+- Exact / case-insensitive lookup on a normalized name key (geocoding);
+  prefix lookup for autocomplete only
+- Shared between workers (one file) and survives restarts
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from app.core.config import GAZETTEER_DB_NAME
+
+# Bytes of the index file SQLite may memory-map (default 256 MB)
+GAZETTEER_MMAP_BYTES = int(os.getenv("GAZETTEER_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    country_code TEXT,
+    country TEXT,
+    admin1 TEXT,
+    population INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_cities_name_key ON cities (name_key, population DESC);
+"""
+
+_NON_ALNUM = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_name(name):
+    """
+    Lookup key for a place name: case-folded with spaces and punctuation
+    removed, so "New York", "new-york" and "Newyork" share one key.
+    """
+    return _NON_ALNUM.sub("", (name or "").casefold())
+
+
+class Gazetteer:
+    """
+    SQLite-backed city index. Results use the same field names as the
+    Open-Meteo geocoding API so callers can rank either source identically.
+    """
+
+    def __init__(self, path=GAZETTEER_DB_NAME):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(f"PRAGMA mmap_size={GAZETTEER_MMAP_BYTES}")
+                    conn.executescript(_SCHEMA)
+                    self._conn = conn
+        return self._conn
+
+    def _rows_to_results(self, rows):
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "latitude": row["latitude"],
+                "longitude": row["longitude"],
+                "country_code": row["country_code"],
+                "country": row["country"],
+                "admin1": row["admin1"],
+                "population": row["population"]
+            }
+            for row in rows
+        ]
+
+    def search(self, name, limit=100, prefix=False):
+        """
+        Returns matching cities, most populous first.
+
+        Only exact key matches by default: the index is filled incrementally,
+        so a prefix hit ("Spring" -> a cached "Springfield") is not evidence
+        that the real place is missing and must be treated as a miss by
+        geocoding. With prefix=True (autocomplete), falls back to a prefix
+        match when nothing matches exactly.
+        """
+        key = normalize_name(name)
+        if not key:
+            return []
+
+        conn = self._connect()
+        with self._lock:
+            rows = conn.execute(
+                "SELECT * FROM cities WHERE name_key = ? ORDER BY population DESC LIMIT ?",
+                (key, limit)
+            ).fetchall()
+            if not rows and prefix:
+                # Range scan on the index: name_key LIKE 'key%' without the LIKE cost
+                rows = conn.execute(
+                    "SELECT * FROM cities WHERE name_key >= ? AND name_key < ? ORDER BY population DESC LIMIT ?",
+                    (key, key + "\U0010ffff", limit)
+                ).fetchall()
+        return self._rows_to_results(rows)
+
+    def add_results(self, results):
+        """
+        Writes geocoding results (Open-Meteo format) into the index.
+        Returns the number of rows written.
+        """
+        rows = []
+        for item in results:
+            if item.get("latitude") is None or item.get("longitude") is None or not item.get("name"):
+                continue
+            rows.append((
+                item.get("id"),
+                item["name"],
+                normalize_name(item["name"]),
+                item["latitude"],
+                item["longitude"],
+                item.get("country_code"),
+                item.get("country"),
+                item.get("admin1"),
+                item.get("population") or 0
+            ))
+        if not rows:
+            return 0
+
+        conn = self._connect()
+        with self._lock:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO cities
+                    (id, name, name_key, latitude, longitude, country_code, country, admin1, population)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            conn.commit()
+        return len(rows)
+
+    def count(self):
+        conn = self._connect()
+        with self._lock:
+            return conn.execute("SELECT COUNT(*) FROM cities").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Singleton instance used by data_handler.get_coordinates_from_city
+gazetteer = Gazetteer()
@@ -0,0 +1,166 @@
+"""
+Gemini Client Pool
+Configures the google-generativeai SDK once per process and keeps one warm
+GenerativeModel handle per model name. Every AI call reuses the same client
+(and its underlying gRPC/REST transport) instead of re-running
+genai.configure() and building a new model on each request.
+"""
+import os
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core.exceptions import TooManyRequests
+
+from .metrics import metrics
+from .llm_scheduler import llm_scheduler, estimate_tokens, DEFAULT_PRIORITY
+from .llm_replay import replay_store
+
+# Optional SDK transport override ("grpc", "rest"); SDK default if unset
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT") or None
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+VISION_MODEL = "gemini-2.5-pro"
+
+
+def _is_quota_error(error):
+    """google.api_core ResourceExhausted (gRPC) / TooManyRequests (HTTP 429) from the Gemini API"""
+    return isinstance(error, TooManyRequests)
+
+
+class GeminiPool:
+    """
+    Process-wide Gemini model handles with per-model call statistics.
+
+    - configure() is applied once (and again only if the API key changes)
+    - model(name) returns a cached GenerativeModel for that name
+    - generate() waits for quota admission (llm_scheduler) and times each
+      call, recording it per model and per stage
+    """
+
+    def __init__(self, api_key_env="GEMINI_API_KEY", transport=GEMINI_TRANSPORT):
+        self.api_key_env = api_key_env
+        self.transport = transport
+        self._configured_key = None
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def api_key(self):
+        return os.getenv(self.api_key_env)
+
+    def configure(self):
+        """Configures the SDK if needed. Returns False when no API key is set."""
+        api_key = self.api_key()
+        if not api_key:
+            return False
+        if api_key == self._configured_key:
+            return True
+
+        with self._lock:
+            if api_key != self._configured_key:
+                kwargs = {"api_key": api_key}
+                if self.transport:
+                    kwargs["transport"] = self.transport
+                genai.configure(**kwargs)
+                # Handles built for the previous key hold its client
+                self._models.clear()
+                self._configured_key = api_key
+        return True
+
+    def model(self, name=DEFAULT_MODEL):
+        """Warm GenerativeModel handle for `name`."""
+        if not self.configure():
+            raise RuntimeError("GEMINI_API_KEY is not set")
+
+        handle = self._models.get(name)
+        if handle is None:
+            with self._lock:
+                handle = self._models.get(name)
+                if handle is None:
+                    handle = genai.GenerativeModel(name)
+                    self._models[name] = handle
+        return handle
+
+    def generate(self, contents, model_name=DEFAULT_MODEL, stage=None, priority=DEFAULT_PRIORITY, **kwargs):
+        """
+        model.generate_content() on the pooled handle.
+        `priority` is the scheduler class ("diagnosis", "prescription", "report",
+        "json", "feedback"); raises QuotaExceededError if the call is shed.
+        `stage` (e.g. "gemini.pest_risk") is also recorded in the metrics registry.
+        """
+        # Replay mode (llm_replay) serves recorded responses; no API key or network needed
+        handle = None if replay_store.replaying else self.model(model_name)
+        estimated = estimate_tokens(contents)
+        llm_scheduler.acquire(model_name, priority, estimated)
+
+        stream = kwargs.get("stream", False)
+        started = time.perf_counter()
+        try:
+            if handle is None:
+                response = replay_store.replay(model_name, contents, stage, stream=stream)
+            else:
+                response = handle.generate_content(contents, **kwargs)
+                if stream:
+                    if replay_store.recording:
+                        response = replay_store.wrap_stream(response, model_name, contents, stage, started)
+                else:
+                    usage = getattr(response, "usage_metadata", None)
+                    llm_scheduler.settle(model_name, estimated, getattr(usage, "total_token_count", None))
+                    if replay_store.recording:
+                        replay_store.record(model_name, contents, stage, response.text, time.perf_counter() - started)
+        except Exception as e:
+            if _is_quota_error(e):
+                llm_scheduler.backoff(model_name)
+            self._observe(model_name, stage, started, error=True)
+            raise
+
+        if stream:
+            # Streams are timed until the last chunk is consumed
+            return self._observe_stream(response, model_name, stage, started)
+        self._observe(model_name, stage, started, error=False)
+        return response
+
+    def _observe_stream(self, response, model_name, stage, started):
+        error = False
+        try:
+            yield from response
+        except Exception:
+            error = True
+            raise
+        finally:
+            self._observe(model_name, stage, started, error)
+
+    def _observe(self, model_name, stage, started, error):
+        elapsed = time.perf_counter() - started
+        self._record(model_name, elapsed, error)
+        metrics.observe(f"gemini.model.{model_name}", elapsed, error=error)
+        if stage:
+            metrics.observe(stage, elapsed, error=error)
+
+    def _record(self, model_name, seconds, error):
+        with self._lock:
+            stats = self._stats.setdefault(model_name, {"calls": 0, "errors": 0, "total_seconds": 0.0})
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            if error:
+                stats["errors"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "configured": self._configured_key is not None,
+                "warm_models": sorted(self._models),
+                "models": {
+                    name: {
+                        "calls": s["calls"],
+                        "errors": s["errors"],
+                        "avg_seconds": round(s["total_seconds"] / s["calls"], 3) if s["calls"] else None
+                    }
+                    for name, s in self._stats.items()
+                }
+            }
+
+
+# Singleton instance shared by ai_engine
+gemini_pool = GeminiPool()
@@ -0,0 +1,658 @@
+"""
+Background Job Queue for LLM-Backed Analyses
+Durable job table + bounded worker pool so slow Gemini calls never hold
+a request handler or the event loop.
+"""
+import asyncio
+import base64
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "500"))
+# How long a non-deferred request waits for its job before returning the job id
+JOB_INLINE_WAIT_SECONDS = float(os.getenv("JOB_INLINE_WAIT_SECONDS", "45"))
+# Micro-batching for batch job kinds (e.g. voice feedback extraction)
+FEEDBACK_BATCH_WINDOW_SECONDS = float(os.getenv("FEEDBACK_BATCH_WINDOW_SECONDS", "2.0"))
+FEEDBACK_BATCH_MAX_ITEMS = int(os.getenv("FEEDBACK_BATCH_MAX_ITEMS", "20"))
+# A job "running" for longer than this is assumed orphaned by a dead process.
+# Shorter leases would let a starting worker fail jobs a live sibling is running.
+JOB_RUNNING_LEASE_SECONDS = int(os.getenv("JOB_RUNNING_LEASE_SECONDS", "900"))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity"""
+    pass
+
+
+class UnknownJobKindError(Exception):
+    """Raised when submitting a job kind with no registered handler"""
+    pass
+
+
+class InvalidPayloadError(ValueError):
+    """Raised when a job payload is missing or has malformed fields"""
+    pass
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+class JobQueue:
+    """
+    Bounded thread pool backed by the `analysis_jobs` table.
+
+    - submit(): persists the job and hands it to a worker; returns the job id
+      (batch kinds are collected for a short window and run together)
+    - asubmit() / aget() / wait(): the same for async handlers, with the
+      job-table I/O in a worker thread so the event loop is never blocked
+    - recover(): re-enqueues jobs left behind by a previous process
+
+    Several processes (uvicorn --workers N) share the table: a worker runs a
+    job only after atomically claiming it (queued -> running), so a job
+    scheduled by more than one process still runs once.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queue=JOB_MAX_QUEUE, running_lease=JOB_RUNNING_LEASE_SECONDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.running_lease = running_lease
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-worker")
+        self._handlers = {}
+        self._validators = {}  # kind -> validate(payload), raises InvalidPayloadError
+        self._batch_kinds = {}  # kind -> {"window", "max_items", "items", "timer"}
+        self._futures = {}  # job_id -> Future (in-process only)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+        self._batch_sizes = deque(maxlen=500)
+
+    # =========================================
+    # REGISTRATION / SUBMISSION
+    # =========================================
+
+    def register(self, kind, handler, validate=None):
+        """
+        handler(payload: dict, user_id: str) -> JSON-serializable result.
+        validate(payload) runs at submit time and raises InvalidPayloadError.
+        """
+        self._handlers[kind] = handler
+        if validate is not None:
+            self._validators[kind] = validate
+
+    def register_batch(self, kind, handler, window=FEEDBACK_BATCH_WINDOW_SECONDS, max_items=FEEDBACK_BATCH_MAX_ITEMS,
+                       validate=None):
+        """
+        handler(items: list of (payload, user_id)) -> list of results, same order.
+        Jobs of this kind are collected for up to `window` seconds or
+        `max_items` jobs, then run as one batch on a single worker.
+        """
+        self._handlers[kind] = handler
+        if validate is not None:
+            self._validators[kind] = validate
+        self._batch_kinds[kind] = {"window": window, "max_items": max_items, "items": [], "timer": None}
+
+    def submit(self, kind, payload, user_id):
+        """Persists a job and schedules it. Returns the job id."""
+        if kind not in self._handlers:
+            raise UnknownJobKindError(f"No handler registered for job kind '{kind}'")
+        if not isinstance(payload, dict):
+            raise InvalidPayloadError("Job payload must be an object")
+        if kind in self._validators:
+            self._validators[kind](payload)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} pending)")
+            self._pending += 1
+            self.submitted += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self._insert_job(job_id, kind, payload, user_id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        self._schedule(job_id, kind, payload, user_id, time.monotonic())
+        return job_id
+
+    async def asubmit(self, kind, payload, user_id):
+        """submit() for async handlers (the job insert runs in a worker thread)."""
+        return await asyncio.to_thread(self.submit, kind, payload, user_id)
+
+    def _schedule(self, job_id, kind, payload, user_id, enqueued_at):
+        if kind in self._batch_kinds:
+            self._add_to_batch(job_id, kind, payload, user_id, enqueued_at)
+            return
+        future = self._executor.submit(self._run, job_id, kind, payload, user_id, enqueued_at)
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _add_to_batch(self, job_id, kind, payload, user_id, enqueued_at):
+        batch = self._batch_kinds[kind]
+        with self._lock:
+            batch["items"].append((job_id, payload, user_id, enqueued_at))
+            full = len(batch["items"]) >= batch["max_items"]
+            if not full and batch["timer"] is None:
+                batch["timer"] = threading.Timer(batch["window"], self._flush_batch, args=(kind,))
+                batch["timer"].daemon = True
+                batch["timer"].start()
+        if full:
+            self._flush_batch(kind)
+
+    def _flush_batch(self, kind):
+        """Hands the collected jobs of a batch kind to one worker."""
+        batch = self._batch_kinds[kind]
+        with self._lock:
+            items, batch["items"] = batch["items"], []
+            if batch["timer"] is not None:
+                batch["timer"].cancel()
+                batch["timer"] = None
+        if not items:
+            return
+
+        future = self._executor.submit(self._run_batch, kind, items)
+        with self._lock:
+            for job_id, _, _, _ in items:
+                self._futures[job_id] = future
+        future.add_done_callback(lambda _: [self._forget(job_id) for job_id, _, _, _ in items])
+
+    # =========================================
+    # EXECUTION
+    # =========================================
+
+    def _run(self, job_id, kind, payload, user_id, enqueued_at):
+        started = time.monotonic()
+        claimed = self._claim_jobs([job_id])
+        with self._lock:
+            self._pending -= 1
+            if claimed:
+                self._running += 1
+                self._wait_times.append(started - enqueued_at)
+        if not claimed:
+            print(f"↪️ Job {kind}/{job_id} skipped: already claimed by another worker")
+            return None
+
+        try:
+            result = self._handlers[kind](payload, user_id)
+            self._update_job(
+                job_id,
+                status="done",
+                result=json.dumps(result, default=str),
+                finished_at=datetime.utcnow()
+            )
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception as e:
+            print(f"❌ Job {kind}/{job_id} failed: {e}")
+            self._update_job(job_id, status="failed", error=str(e)[:1000], finished_at=datetime.utcnow())
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._run_times.append(time.monotonic() - started)
+
+    def _run_batch(self, kind, items):
+        started = time.monotonic()
+        claimed = set(self._claim_jobs([job_id for job_id, _, _, _ in items]))
+        scheduled = len(items)
+        items = [item for item in items if item[0] in claimed]
+        with self._lock:
+            self._pending -= scheduled
+            self._running += len(items)
+            self._wait_times.extend(started - enqueued_at for _, _, _, enqueued_at in items)
+            if items:
+                self._batch_sizes.append(len(items))
+        if len(items) < scheduled:
+            print(f"↪️ Batch {kind}: {scheduled - len(items)} job(s) skipped, already claimed by another worker")
+
+        # A bad payload fails only its own job, never the rest of the batch
+        items, invalid = self._validate_batch(kind, items)
+        if invalid:
+            finished_at = datetime.utcnow()
+            self._finish_jobs([
+                {"id": job_id, "status": "failed", "error": error[:1000], "finished_at": finished_at}
+                for job_id, error in invalid
+            ])
+            with self._lock:
+                self.failed += len(invalid)
+        job_ids = [job_id for job_id, _, _, _ in items]
+
+        try:
+            results = self._handlers[kind]([(payload, user_id) for _, payload, user_id, _ in items]) if items else []
+            if len(results) != len(items):
+                raise RuntimeError(f"Batch handler for '{kind}' returned {len(results)} results for {len(items)} jobs")
+            finished_at = datetime.utcnow()
+            self._finish_jobs([
+                {"id": job_id, "status": "done", "result": json.dumps(result, default=str), "finished_at": finished_at}
+                for job_id, result in zip(job_ids, results)
+            ])
+            with self._lock:
+                self.completed += len(items)
+            return results
+        except Exception as e:
+            print(f"❌ Batch {kind} ({len(items)} jobs) failed: {e}")
+            self._update_jobs(job_ids, status="failed", error=str(e)[:1000], finished_at=datetime.utcnow())
+            with self._lock:
+                self.failed += len(items)
+            raise
+        finally:
+            with self._lock:
+                self._running -= len(items) + len(invalid)
+                self._run_times.append(time.monotonic() - started)
+
+    def _validate_batch(self, kind, items):
+        """
+        Splits batch items into (valid items, [(job_id, error)]) with the kind's
+        validator. Covers jobs that bypassed submit() (e.g. recovered rows).
+        """
+        validate = self._validators.get(kind)
+        valid, invalid = [], []
+        for item in items:
+            job_id, payload = item[0], item[1]
+            try:
+                if not isinstance(payload, dict):
+                    raise InvalidPayloadError("Job payload must be an object")
+                if validate is not None:
+                    validate(payload)
+            except Exception as e:
+                print(f"❌ Job {kind}/{job_id} rejected: {e}")
+                invalid.append((job_id, str(e) or type(e).__name__))
+                continue
+            valid.append(item)
+        return valid, invalid
+
+    async def wait(self, job_id, timeout):
+        """
+        Awaits a job started by this process for up to `timeout` seconds.
+        Returns the job dict (status may still be queued/running on timeout).
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except Exception:
+                # Timeouts and job errors are both reported through the job row
+                pass
+        return await asyncio.to_thread(self.get, job_id)
+
+    # =========================================
+    # PERSISTENCE
+    # =========================================
+
+    def _insert_job(self, job_id, kind, payload, user_id):
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            db.add(AnalysisJob(
+                id=job_id,
+                user_id=user_id,
+                kind=kind,
+                status="queued",
+                payload=json.dumps(payload, default=str),
+                created_at=datetime.utcnow()
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim_jobs(self, job_ids):
+        """
+        Atomically moves queued jobs to running (UPDATE ... WHERE status =
+        'queued'). Returns the ids this process claimed; jobs another worker
+        already claimed or finished are left alone.
+        """
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            started_at = datetime.utcnow()
+            claimed = [
+                job_id for job_id in job_ids
+                if db.query(AnalysisJob).filter(
+                    AnalysisJob.id == job_id,
+                    AnalysisJob.status == "queued"
+                ).update({"status": "running", "started_at": started_at}, synchronize_session=False)
+            ]
+            db.commit()
+            return claimed
+        except Exception as e:
+            # Unclaimed jobs stay queued and are picked up by the next recover()
+            db.rollback()
+            print(f"⚠️ Could not claim {len(job_ids)} job(s): {e}")
+            return []
+        finally:
+            db.close()
+
+    def _update_job(self, job_id, **fields):
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update(fields)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Could not update job {job_id}: {e}")
+        finally:
+            db.close()
+
+    def _update_jobs(self, job_ids, **fields):
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            db.query(AnalysisJob).filter(AnalysisJob.id.in_(job_ids)).update(fields, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Could not update {len(job_ids)} jobs: {e}")
+        finally:
+            db.close()
+
+    def _finish_jobs(self, mappings):
+        """Per-job results for a batch in one transaction."""
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            db.bulk_update_mappings(AnalysisJob, mappings)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Could not store results for {len(mappings)} jobs: {e}")
+        finally:
+            db.close()
+
+    def _to_dict(self, job):
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+    def get(self, job_id, user_id=None):
+        """Returns a job dict, or None if not found (or owned by another user)."""
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            query = db.query(AnalysisJob).filter(AnalysisJob.id == job_id)
+            if user_id is not None:
+                query = query.filter(AnalysisJob.user_id == user_id)
+            job = query.first()
+            return self._to_dict(job) if job else None
+        finally:
+            db.close()
+
+    async def aget(self, job_id, user_id=None):
+        """get() for async handlers (the query runs in a worker thread)."""
+        return await asyncio.to_thread(self.get, job_id, user_id)
+
+    def latest_result(self, kind, user_id):
+        """Returns the most recent completed job of a kind for a user."""
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            job = db.query(AnalysisJob).filter(
+                AnalysisJob.user_id == user_id,
+                AnalysisJob.kind == kind,
+                AnalysisJob.status == "done"
+            ).order_by(AnalysisJob.finished_at.desc()).first()
+            return self._to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def recover(self):
+        """
+        Re-enqueues jobs still queued by a previous process.
+        Jobs "running" for longer than the lease are marked failed (their
+        side effects are unknown); younger ones may belong to a live sibling
+        worker and are left alone. Every worker may call this at startup:
+        re-enqueued jobs are claimed atomically, so each runs once.
+        """
+        from app.core.database import SessionLocal, AnalysisJob
+
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(AnalysisJob).filter(
+                AnalysisJob.status == "running",
+                (AnalysisJob.started_at.is_(None)) | (AnalysisJob.started_at < now - timedelta(seconds=self.running_lease))
+            ).update({
+                "status": "failed",
+                "error": "Interrupted by server restart",
+                "finished_at": now
+            }, synchronize_session=False)
+            db.commit()
+            queued = db.query(AnalysisJob).filter(AnalysisJob.status == "queued").all()
+            pending = [(job.id, job.kind, job.payload, job.user_id) for job in queued]
+        finally:
+            db.close()
+
+        recovered = 0
+        for job_id, kind, payload, user_id in pending:
+            if kind not in self._handlers:
+                self._update_job(job_id, status="failed", error=f"Unknown job kind '{kind}'")
+                continue
+            with self._lock:
+                self._pending += 1
+            self._schedule(job_id, kind, json.loads(payload or "{}"), user_id, time.monotonic())
+            recovered += 1
+        return recovered
+
+    # =========================================
+    # MONITORING
+    # =========================================
+
+    def stats(self):
+        with self._lock:
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            batch_sizes = list(self._batch_sizes)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "depth": self._pending,
+                "running": self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait_seconds": {
+                    "p50": _percentile(wait_times, 50),
+                    "p95": _percentile(wait_times, 95)
+                },
+                "run_seconds": {
+                    "p50": _percentile(run_times, 50),
+                    "p95": _percentile(run_times, 95)
+                },
+                "batches": {
+                    "count": len(batch_sizes),
+                    "avg_size": round(sum(batch_sizes) / len(batch_sizes), 1) if batch_sizes else None,
+                    "collecting": {kind: len(batch["items"]) for kind, batch in self._batch_kinds.items()}
+                }
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=False)
+
+
+# =========================================
+# PAYLOAD VALIDATION
+# =========================================
+
+def _optional_string(payload, field):
+    value = payload.get(field)
+    if value is not None and not isinstance(value, str):
+        raise InvalidPayloadError(f"'{field}' must be a string")
+
+
+def _validate_dashboard_analysis(payload):
+    weather = payload.get("weather")
+    if not isinstance(weather, dict):
+        raise InvalidPayloadError("'weather' must be an object with temperature / humidity / rain / wind_speed")
+    for field in ("temperature", "humidity", "rain", "wind_speed"):
+        value = weather.get(field)
+        if value is not None and not isinstance(value, (int, float)):
+            raise InvalidPayloadError(f"'weather.{field}' must be a number")
+    _optional_string(payload, "crop_type")
+    _optional_string(payload, "user_feedback")
+
+
+def _validate_crop_diagnosis(payload):
+    if not isinstance(payload.get("image_b64"), str) or not payload["image_b64"]:
+        raise InvalidPayloadError("'image_b64' is required")
+    _optional_string(payload, "crop_type")
+
+
+def _validate_weekly_report(payload):
+    _optional_string(payload, "crop_type")
+
+
+def _validate_environment_feedback(payload):
+    if not isinstance(payload.get("text"), str) or not payload["text"].strip():
+        raise InvalidPayloadError("'text' is required")
+    _optional_string(payload, "timestamp")
+    if payload.get("timestamp"):
+        try:
+            datetime.fromisoformat(payload["timestamp"])
+        except ValueError:
+            raise InvalidPayloadError("'timestamp' must be an ISO 8601 datetime")
+
+
+# =========================================
+# JOB HANDLERS
+# =========================================
+
+def encode_image_payload(contents):
+    """Encodes raw image bytes for storage in a JSON job payload."""
+    return base64.b64encode(contents).decode("ascii")
+
+
+def _run_dashboard_analysis(payload, user_id):
+    from .ai_engine import analyze_situation
+    from .analysis_cache import analysis_cache
+
+    crop_type = payload.get("crop_type") or "tomato"
+    result = analyze_situation(
+        payload["weather"],
+        crop_type,
+        user_feedback=payload.get("user_feedback"),
+        user_id=user_id
+    )
+    # Feedback-free analyses also warm the dashboard cache (e.g. batch dashboard jobs)
+    if not payload.get("user_feedback"):
+        analysis_cache.store(analysis_cache.make_key(user_id, crop_type, payload["weather"]), result)
+    return result
+
+
+def _run_crop_diagnosis(payload, user_id):
+    from PIL import Image
+    from .ai_engine import analyze_crop_image
+
+    image = Image.open(io.BytesIO(base64.b64decode(payload["image_b64"])))
+    diagnosis = analyze_crop_image(image, user_id=user_id, crop_type=payload.get("crop_type"))
+    return {"diagnosis": diagnosis}
+
+
+def _run_weekly_report(payload, user_id):
+    from .ai_engine import generate_weekly_report
+    return {"report_text": generate_weekly_report(payload.get("crop_type") or "tomato", user_id=user_id)}
+
+
+def _run_environment_feedback(items):
+    """
+    Extracts environmental feedback from a batch of voice logs (one LLM
+    call) and stores confident results as ground truth for the learning loop.
+    """
+    from sqlalchemy import func, and_
+    from .ai_engine import analyze_environment_feedback_batch
+    from app.core.database import SessionLocal, RealityFeedbackLog, VirtualEnvironmentLog
+
+    analyses = analyze_environment_feedback_batch([payload["text"] for payload, _ in items])
+
+    # If feedback detected with high confidence, save to RealityFeedbackLog
+    confident = [
+        (payload, user_id, analysis)
+        for (payload, user_id), analysis in zip(items, analyses)
+        if analysis.get("is_feedback") and (analysis.get("confidence") or 0) > 0.7
+    ]
+    if confident:
+        db = SessionLocal()
+        try:
+            # Most recent AI prediction per user (if exists), in one query
+            user_ids = {user_id for _, user_id, _ in confident}
+            newest = db.query(
+                VirtualEnvironmentLog.user_id.label("user_id"),
+                func.max(VirtualEnvironmentLog.timestamp).label("timestamp")
+            ).filter(VirtualEnvironmentLog.user_id.in_(user_ids)).group_by(VirtualEnvironmentLog.user_id).subquery()
+            predictions = {}
+            for row_id, row_user in db.query(VirtualEnvironmentLog.id, VirtualEnvironmentLog.user_id).join(
+                newest,
+                and_(VirtualEnvironmentLog.user_id == newest.c.user_id, VirtualEnvironmentLog.timestamp == newest.c.timestamp)
+            ).all():
+                predictions.setdefault(row_user, row_id)
+
+            rows = []
+            for payload, user_id, analysis in confident:
+                timestamp = payload.get("timestamp")
+                rows.append({
+                    "user_id": user_id,
+                    "timestamp": datetime.fromisoformat(timestamp) if timestamp else datetime.utcnow(),
+                    "feedback_type": analysis.get("feedback_type"),
+                    "feedback_value": analysis.get("feedback_value"),
+                    "ai_prediction_ref_id": predictions.get(user_id)
+                })
+            db.bulk_insert_mappings(RealityFeedbackLog, rows)
+            db.commit()
+            print(f"✅ Feedback saved: {len(rows)} of {len(items)} voice logs")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return analyses
+
+
+# Singleton instance with the default LLM job kinds
+job_queue = JobQueue()
+job_queue.register("dashboard_analysis", _run_dashboard_analysis, validate=_validate_dashboard_analysis)
+job_queue.register("crop_diagnosis", _run_crop_diagnosis, validate=_validate_crop_diagnosis)
+job_queue.register("weekly_report", _run_weekly_report, validate=_validate_weekly_report)
+job_queue.register_batch("environment_feedback", _run_environment_feedback, validate=_validate_environment_feedback)
@@ -0,0 +1,229 @@
+"""
+LLM Record / Replay
+Captures Gemini prompts, responses and real latencies to a local JSONL
+fixture store, and serves them back deterministically so the AI paths
+(analyze_situation, analyze_crop_image, pest / market fallbacks) can be
+benchmarked offline.
+
+Modes (LLM_REPLAY_MODE):
+    off     - normal live calls (default)
+    record  - live calls, each successful response appended to the store
+    replay  - no network; responses come from the store
+
+Replay latency (LLM_REPLAY_LATENCY):
+    recorded          - sleep the latency captured at record time (default)
+    none              - return immediately
+    fixed:1.5         - always 1.5 s
+    lognormal:1.2:0.4 - median 1.2 s, sigma 0.4 (seeded by LLM_REPLAY_SEED)
+
+Hooked into gemini_pool.generate, so every Gemini call site is covered.
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "off").lower()
+LLM_FIXTURES_PATH = os.getenv(
+    "LLM_FIXTURES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "fixtures", "llm_fixtures.jsonl")
+)
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "recorded")
+LLM_REPLAY_SEED = int(os.getenv("LLM_REPLAY_SEED", "42"))
+# Strict: a prompt with no exact fixture is an error. Otherwise fall back to a
+# fixture of the same stage (prompts embed live weather / dates).
+LLM_REPLAY_STRICT = os.getenv("LLM_REPLAY_STRICT", "false").lower() == "true"
+
+
+class ReplayMissError(Exception):
+    """Raised in strict replay mode when no fixture matches a prompt"""
+    pass
+
+
+def _part_digest(part):
+    if isinstance(part, str):
+        return part
+    if isinstance(part, (bytes, bytearray)):
+        return "bytes:" + hashlib.sha256(part).hexdigest()
+    if hasattr(part, "tobytes"):
+        # PIL image
+        return "image:" + hashlib.sha256(part.tobytes()).hexdigest()
+    return "object:" + repr(part)
+
+
+def fixture_key(model_name, contents):
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    payload = json.dumps([model_name] + [_part_digest(part) for part in parts])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _prompt_preview(contents):
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    text = " ".join(part for part in parts if isinstance(part, str))
+    return " ".join(text.split())[:200]
+
+
+class LatencyModel:
+    """Simulated response latency for replayed calls."""
+
+    def __init__(self, spec=LLM_REPLAY_LATENCY, seed=LLM_REPLAY_SEED):
+        self.spec = spec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self, recorded):
+        kind, _, args = self.spec.partition(":")
+        if kind == "none":
+            return 0.0
+        if kind == "fixed":
+            return float(args)
+        if kind == "lognormal":
+            median, sigma = (float(value) for value in args.split(":"))
+            with self._lock:
+                return self._rng.lognormvariate(math.log(median), sigma)
+        return recorded or 0.0
+
+
+class ReplayStore:
+    """
+    JSONL fixtures: one line per recorded call
+    {"key", "model", "stage", "prompt", "text", "chunks", "latency", "first_chunk_latency"}.
+    The last recording of a key wins.
+    """
+
+    def __init__(self, path=LLM_FIXTURES_PATH, mode=LLM_REPLAY_MODE, latency=None, strict=LLM_REPLAY_STRICT):
+        self.path = path
+        self.mode = mode
+        self.latency = latency or LatencyModel()
+        self.strict = strict
+        self._fixtures = None
+        self._by_stage = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+        self.recorded = 0
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    def _load(self):
+        if self._fixtures is not None:
+            return
+        fixtures = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        fixtures[entry["key"]] = entry
+        self._fixtures = fixtures
+        self._by_stage = {}
+        for entry in sorted(fixtures.values(), key=lambda e: e["key"]):
+            self._by_stage.setdefault((entry.get("stage"), entry.get("model")), []).append(entry)
+        print(f"🎞️ Loaded {len(fixtures)} LLM fixtures from {self.path}")
+
+    # =========================================
+    # RECORD
+    # =========================================
+
+    def record(self, model_name, contents, stage, text, latency, chunks=None, first_chunk_latency=None):
+        entry = {
+            "key": fixture_key(model_name, contents),
+            "model": model_name,
+            "stage": stage,
+            "prompt": _prompt_preview(contents),
+            "text": text,
+            "chunks": chunks,
+            "latency": round(latency, 4),
+            "first_chunk_latency": round(first_chunk_latency, 4) if first_chunk_latency is not None else None
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.recorded += 1
+            if self._fixtures is not None:
+                self._fixtures[entry["key"]] = entry
+                self._by_stage.setdefault((stage, model_name), []).append(entry)
+
+    def wrap_stream(self, response, model_name, contents, stage, started):
+        """Passes stream chunks through, recording them once the stream ends."""
+        chunks = []
+        first = None
+        for chunk in response:
+            if first is None:
+                first = time.perf_counter() - started
+            try:
+                chunks.append(chunk.text or "")
+            except (AttributeError, ValueError):
+                pass
+            yield chunk
+        self.record(model_name, contents, stage, "".join(chunks), time.perf_counter() - started, chunks, first)
+
+    # =========================================
+    # REPLAY
+    # =========================================
+
+    def lookup(self, model_name, contents, stage):
+        with self._lock:
+            self._load()
+            key = fixture_key(model_name, contents)
+            entry = self._fixtures.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            if self.strict:
+                raise ReplayMissError(f"No LLM fixture for {stage or model_name} ({_prompt_preview(contents)[:60]}...)")
+            candidates = self._by_stage.get((stage, model_name))
+            if not candidates:
+                candidates = [entry for (s, _), entries in self._by_stage.items() if s == stage for entry in entries]
+            if not candidates:
+                raise ReplayMissError(f"No LLM fixture for stage {stage} / {model_name}")
+            # Deterministic pick per prompt
+            self.fallbacks += 1
+            return candidates[int(key, 16) % len(candidates)]
+
+    def replay(self, model_name, contents, stage, stream=False):
+        entry = self.lookup(model_name, contents, stage)
+        delay = self.latency.seconds(entry.get("latency"))
+        if not stream:
+            time.sleep(delay)
+            return SimpleNamespace(text=entry["text"], usage_metadata=None)
+        return self._replay_stream(entry, delay)
+
+    def _replay_stream(self, entry, delay):
+        chunks = entry.get("chunks") or [entry["text"]]
+        recorded_first = entry.get("first_chunk_latency")
+        # Keep the recorded first-chunk / total ratio when scaling the delay
+        first = delay * (recorded_first / entry["latency"]) if recorded_first and entry.get("latency") else delay / len(chunks)
+        time.sleep(first)
+        step = (delay - first) / max(len(chunks) - 1, 1)
+        for i, text in enumerate(chunks):
+            if i:
+                time.sleep(step)
+            yield SimpleNamespace(text=text)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "fixtures": len(self._fixtures) if self._fixtures is not None else None,
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "recorded": self.recorded,
+                "latency": self.latency.spec
+            }
+
+
+# Singleton instance used by gemini_pool
+replay_store = ReplayStore()
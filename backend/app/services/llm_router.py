@@ -0,0 +1,285 @@
+"""
+LLM Provider Router
+Provider-agnostic text / vision generation with a routing policy:
+
+- providers are tried in order (LLM_PROVIDERS, e.g. "gemini,claude")
+- failover: an error or quota rejection on one provider moves to the next
+- hedging: if the primary has not answered within its recent p95 latency,
+  the secondary is fired as well and whichever answers first is used
+
+Prescription tail latency is otherwise set entirely by single-provider
+slowdowns. A "stub" provider gives deterministic offline answers for
+development and tests.
+"""
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .metrics import metrics
+
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "gemini,claude")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+# Fixed hedge delay until a provider has enough latency samples for a p95
+LLM_HEDGE_DEFAULT_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "8"))
+LLM_HEDGE_MIN_SECONDS = float(os.getenv("LLM_HEDGE_MIN_SECONDS", "0.5"))
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_HEDGE_QUANTILE = 0.95
+LLM_ROUTER_WORKERS = int(os.getenv("LLM_ROUTER_WORKERS", "16"))
+
+STUB_RESPONSE = """
+**Status**: Normal
+**Prescription**: Maintain current irrigation schedule and monitor conditions.
+**Reasoning**: Offline stub provider; no live model was called.
+
+[DISCLAIMER]: This is an AI-generated suggestion for informational purposes only. Consult a professional before taking action.
+"""
+
+
+class AllProvidersFailed(Exception):
+    """Raised when no configured provider produced a response"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        detail = "; ".join(f"{name}: {error}" for name, error in errors) or "no provider available"
+        super().__init__(f"All LLM providers failed ({detail})")
+
+
+# =========================================
+# PROVIDERS
+# =========================================
+
+class GeminiProvider:
+    name = "gemini"
+    supports_vision = True
+
+    def __init__(self, text_model=None, vision_model=None):
+        from .gemini_pool import DEFAULT_MODEL, VISION_MODEL
+        self.text_model = text_model or DEFAULT_MODEL
+        self.vision_model = vision_model or VISION_MODEL
+
+    def available(self):
+        return bool(os.getenv("GEMINI_API_KEY"))
+
+    def generate(self, prompt, image=None, stage=None, priority=None):
+        from .gemini_pool import gemini_pool
+        contents = [prompt, image] if image is not None else prompt
+        response = gemini_pool.generate(
+            contents,
+            model_name=self.vision_model if image is not None else self.text_model,
+            stage=f"gemini.{stage}" if stage else None,
+            priority=priority or "json"
+        )
+        return response.text
+
+
+class ClaudeProvider:
+    name = "claude"
+    supports_vision = True
+
+    def available(self):
+        if not os.getenv("ANTHROPIC_API_KEY"):
+            return False
+        try:
+            import anthropic  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def generate(self, prompt, image=None, stage=None, priority=None):
+        from .claude_service import create_claude_message
+        return create_claude_message(None, prompt, image_data=_image_bytes(image) if image is not None else None)
+
+
+class StubProvider:
+    """Deterministic local provider (optional latency / failure for tests)."""
+
+    def __init__(self, name="stub", text=STUB_RESPONSE, latency=0.0, error=None, supports_vision=True):
+        self.name = name
+        self.text = text
+        self.latency = latency
+        self.error = error
+        self.supports_vision = supports_vision
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def generate(self, prompt, image=None, stage=None, priority=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return self.text
+
+
+PROVIDER_TYPES = {
+    "gemini": GeminiProvider,
+    "claude": ClaudeProvider,
+    "stub": StubProvider
+}
+
+
+def _image_bytes(image):
+    """PIL image -> JPEG bytes (bytes pass through)"""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def build_providers(spec=LLM_PROVIDERS):
+    providers = []
+    for name in (part.strip().lower() for part in spec.split(",")):
+        if name in PROVIDER_TYPES:
+            providers.append(PROVIDER_TYPES[name]())
+        elif name:
+            print(f"⚠️ Unknown LLM provider '{name}' ignored")
+    return providers
+
+
+# =========================================
+# ROUTER
+# =========================================
+
+class LLMRouter:
+    """
+    Routes generate() calls across providers with failover and hedging.
+    Calls run on a small thread pool; a hedged loser is left to finish in
+    the background (its result is discarded).
+    """
+
+    def __init__(self, providers=None, hedge=LLM_HEDGE_ENABLED, max_workers=LLM_ROUTER_WORKERS):
+        self.providers = providers if providers is not None else build_providers()
+        self.hedge = hedge
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+        self._latencies = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def available(self, vision=False):
+        return [
+            provider for provider in self.providers
+            if provider.available() and (provider.supports_vision or not vision)
+        ]
+
+    def hedge_delay(self, provider_name):
+        """Recent p95 latency of a provider (fixed default until warmed up)."""
+        with self._lock:
+            window = sorted(self._latencies.get(provider_name, ()))
+        if len(window) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_SECONDS
+        index = min(len(window) - 1, int(len(window) * LLM_HEDGE_QUANTILE))
+        return max(LLM_HEDGE_MIN_SECONDS, window[index])
+
+    def generate(self, prompt, image=None, stage=None, priority=None, hedge=None):
+        """
+        Returns {"text", "provider", "hedged"} from the first provider that
+        answers. Raises AllProvidersFailed if every provider errors.
+        """
+        providers = self.available(vision=image is not None)
+        if not providers:
+            raise AllProvidersFailed([])
+
+        request = (prompt, image, stage, priority)
+        hedge = self.hedge if hedge is None else hedge
+        errors = []
+        start = 0
+        if hedge and len(providers) > 1:
+            result = self._race(providers[0], providers[1], request, errors)
+            if result:
+                return result
+            start = 2
+
+        for provider in providers[start:]:
+            if errors:
+                self._count(provider.name, "failovers")
+            try:
+                text = self._call(provider, request)
+            except Exception as e:
+                errors.append((provider.name, e))
+                continue
+            self._count(provider.name, "wins")
+            return {"text": text, "provider": provider.name, "hedged": False}
+        raise AllProvidersFailed(errors)
+
+    def _race(self, primary, secondary, request, errors):
+        """Primary first; secondary after the hedge delay or on primary failure."""
+        pending = {self._executor.submit(self._call, primary, request): primary}
+        fired = False
+        delay = self.hedge_delay(primary.name)
+
+        while pending:
+            done, _ = wait(pending, timeout=None if fired else delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than its p95: hedge
+                fired = True
+                self._count(secondary.name, "hedges")
+                pending[self._executor.submit(self._call, secondary, request)] = secondary
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    errors.append((provider.name, e))
+                    continue
+                self._count(provider.name, "wins")
+                return {"text": text, "provider": provider.name, "hedged": fired}
+
+            if not fired:
+                # Primary failed before the hedge delay: fail over
+                fired = True
+                self._count(secondary.name, "failovers")
+                pending[self._executor.submit(self._call, secondary, request)] = secondary
+        return None
+
+    def _call(self, provider, request):
+        prompt, image, stage, priority = request
+        started = time.perf_counter()
+        error = False
+        try:
+            return provider.generate(prompt, image=image, stage=stage, priority=priority)
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe(f"llm.{provider.name}", elapsed, error=error)
+            with self._lock:
+                stats = self._stats.setdefault(provider.name, _empty_stats())
+                stats["calls"] += 1
+                if error:
+                    stats["errors"] += 1
+                else:
+                    self._latencies.setdefault(provider.name, deque(maxlen=200)).append(elapsed)
+
+    def _count(self, provider_name, field):
+        with self._lock:
+            self._stats.setdefault(provider_name, _empty_stats())[field] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(s) for name, s in self._stats.items()}
+        for provider in self.providers:
+            entry = stats.setdefault(provider.name, _empty_stats())
+            entry["available"] = provider.available()
+            entry["hedge_delay_seconds"] = round(self.hedge_delay(provider.name), 3)
+        return {
+            "order": [provider.name for provider in self.providers],
+            "hedge_enabled": self.hedge,
+            "providers": stats
+        }
+
+
+def _empty_stats():
+    return {"calls": 0, "errors": 0, "wins": 0, "hedges": 0, "failovers": 0}
+
+
+# Singleton instance used by ai_engine
+llm_router = LLMRouter()
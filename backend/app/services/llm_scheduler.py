@@ -0,0 +1,257 @@
+"""
+LLM Quota Scheduler
+Central admission control for Gemini calls: per-model requests-per-minute and
+tokens-per-minute token buckets, with priority classes so interactive work is
+admitted first and background work queues (or is shed) when quota runs low.
+
+Priority (highest first):
+    diagnosis > prescription > report > json (pest / market) > feedback
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from .metrics import metrics
+
+# Per-model budgets, defaulting to the Gemini API free tier so admission
+# control (queueing / shedding by priority) is active out of the box.
+# Paid tiers raise them with LLM_BUDGETS='{"gemini-2.5-flash": {"rpm": 1000, "tpm": 1000000}}'
+DEFAULT_BUDGETS = {
+    "gemini-2.5-flash": {"rpm": 10, "tpm": 250000},
+    "gemini-2.5-pro": {"rpm": 5, "tpm": 250000}
+}
+FALLBACK_BUDGET = {"rpm": 5, "tpm": 250000}
+
+# rank (lower = served first), max seconds queued, max requests queued
+PRIORITY_CLASSES = {
+    "diagnosis": {"rank": 0, "max_wait": 30.0, "max_queue": 32},
+    "prescription": {"rank": 1, "max_wait": 20.0, "max_queue": 64},
+    "report": {"rank": 2, "max_wait": 15.0, "max_queue": 16},
+    "json": {"rank": 3, "max_wait": 10.0, "max_queue": 16},
+    "feedback": {"rank": 4, "max_wait": 5.0, "max_queue": 8}
+}
+DEFAULT_PRIORITY = "json"
+
+# Rough output allowance added to the prompt estimate before the call
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "800"))
+# Gemini bills an image part at a fixed token count
+IMAGE_TOKEN_ESTIMATE = 258
+# Pause admissions for a model after the API reports quota exhaustion (429)
+QUOTA_BACKOFF_SECONDS = float(os.getenv("LLM_QUOTA_BACKOFF_SECONDS", "30"))
+
+
+def load_budgets():
+    budgets = {name: dict(budget) for name, budget in DEFAULT_BUDGETS.items()}
+    raw = os.getenv("LLM_BUDGETS")
+    if raw:
+        try:
+            for name, budget in json.loads(raw).items():
+                budgets.setdefault(name, dict(FALLBACK_BUDGET)).update(budget)
+        except Exception as e:
+            print(f"⚠️ Ignoring invalid LLM_BUDGETS: {e}")
+    return budgets
+
+
+def estimate_tokens(contents):
+    """Prompt token estimate (~4 characters per token, fixed cost per image)."""
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    total = 0
+    for part in parts:
+        if isinstance(part, str):
+            total += len(part) // 4 + 1
+        else:
+            total += IMAGE_TOKEN_ESTIMATE
+    return total + OUTPUT_TOKEN_ESTIMATE
+
+
+class QuotaExceededError(Exception):
+    """Raised when a call is shed: its class queue is full or it waited too long"""
+    pass
+
+
+class _ModelBudget:
+    """Request and token buckets for one model, refilled continuously."""
+
+    def __init__(self, rpm, tpm):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.requests = self.rpm
+        self.tokens = self.tpm
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters = []  # heap of (rank, seq)
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60.0)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60.0)
+
+    def can_take(self, now, tokens):
+        return now >= self.blocked_until and self.requests >= 1 and self.tokens >= min(tokens, self.tpm)
+
+    def seconds_until(self, now, tokens):
+        waits = [max(0.0, self.blocked_until - now)]
+        if self.requests < 1:
+            waits.append((1 - self.requests) * 60.0 / self.rpm)
+        needed = min(tokens, self.tpm)
+        if self.tokens < needed:
+            waits.append((needed - self.tokens) * 60.0 / self.tpm)
+        return max(waits)
+
+
+class LLMScheduler:
+    """
+    Blocking admission for worker threads:
+
+        llm_scheduler.acquire(model, "prescription", tokens)
+        response = model.generate_content(...)
+
+    Waiters for a model are served strictly by (priority rank, arrival).
+    A call is shed with QuotaExceededError when its class queue is full or
+    it cannot be admitted within the class's max wait; lower classes have
+    shorter queues and waits, so they are shed first.
+    """
+
+    def __init__(self, budgets=None, classes=None):
+        self.budgets = budgets or load_budgets()
+        self.classes = classes or PRIORITY_CLASSES
+        self._models = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queued = {name: 0 for name in self.classes}
+        self._admitted = {name: 0 for name in self.classes}
+        self._shed = {name: 0 for name in self.classes}
+        self._waits = {name: deque(maxlen=500) for name in self.classes}
+
+    def _budget(self, model):
+        budget = self._models.get(model)
+        if budget is None:
+            config = self.budgets.get(model, FALLBACK_BUDGET)
+            budget = _ModelBudget(config["rpm"], config["tpm"])
+            self._models[model] = budget
+        return budget
+
+    # =========================================
+    # ADMISSION
+    # =========================================
+
+    def acquire(self, model, priority=DEFAULT_PRIORITY, tokens=0, timeout=None):
+        """Blocks until the call may proceed. Returns seconds spent waiting."""
+        cls = self.classes.get(priority) or self.classes[DEFAULT_PRIORITY]
+        priority = priority if priority in self.classes else DEFAULT_PRIORITY
+        started = time.monotonic()
+        deadline = started + (cls["max_wait"] if timeout is None else timeout)
+
+        with self._cond:
+            if self._queued[priority] >= cls["max_queue"]:
+                self._shed[priority] += 1
+                metrics.record_error(f"llm_queue.{priority}")
+                raise QuotaExceededError(f"LLM queue for '{priority}' is full")
+
+            budget = self._budget(model)
+            ticket = (cls["rank"], next(self._seq))
+            heapq.heappush(budget.waiters, ticket)
+            self._queued[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    budget.refill(now)
+                    is_head = budget.waiters[0] == ticket
+                    if is_head and budget.can_take(now, tokens):
+                        heapq.heappop(budget.waiters)
+                        budget.requests -= 1
+                        budget.tokens -= min(tokens, budget.tpm)
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        budget.waiters.remove(ticket)
+                        heapq.heapify(budget.waiters)
+                        self._shed[priority] += 1
+                        metrics.record_error(f"llm_queue.{priority}")
+                        raise QuotaExceededError(f"LLM quota for {model} exhausted ('{priority}' waited {now - started:.1f}s)")
+
+                    pause = min(remaining, budget.seconds_until(now, tokens)) if is_head else remaining
+                    self._cond.wait(max(pause, 0.005))
+            finally:
+                self._queued[priority] -= 1
+                # The head changed (admitted or left): let the next waiter re-check
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self._admitted[priority] += 1
+            self._waits[priority].append(waited)
+
+        metrics.observe(f"llm_queue.{priority}", waited)
+        return waited
+
+    def settle(self, model, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once the real usage is known."""
+        if actual_tokens is None:
+            return
+        with self._cond:
+            self._budget(model).tokens -= actual_tokens - estimated_tokens
+
+    def backoff(self, model, seconds=QUOTA_BACKOFF_SECONDS):
+        """Stops admitting calls for `model` for a while (e.g. after an HTTP 429)."""
+        with self._cond:
+            budget = self._budget(model)
+            budget.blocked_until = max(budget.blocked_until, time.monotonic() + seconds)
+
+    # =========================================
+    # MONITORING
+    # =========================================
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            models = {}
+            for name, budget in self._models.items():
+                budget.refill(now)
+                models[name] = {
+                    "rpm": budget.rpm,
+                    "tpm": budget.tpm,
+                    "requests_available": round(budget.requests, 1),
+                    "tokens_available": int(budget.tokens),
+                    "queued": len(budget.waiters),
+                    "blocked_seconds": round(max(0.0, budget.blocked_until - now), 1)
+                }
+            classes = {}
+            for name in self.classes:
+                waits = sorted(self._waits[name])
+                classes[name] = {
+                    "queued": self._queued[name],
+                    "admitted": self._admitted[name],
+                    "shed": self._shed[name],
+                    "wait_p50": round(waits[len(waits) // 2], 3) if waits else None,
+                    "wait_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None
+                }
+            return {"models": models, "classes": classes}
+
+    def render_prometheus(self):
+        """Queue depth and shed counters (wait times are in the stage summary as llm_queue.<class>)."""
+        stats = self.stats()
+        lines = [
+            "# HELP forhuman_llm_queue_depth Calls waiting for LLM quota per priority class.",
+            "# TYPE forhuman_llm_queue_depth gauge"
+        ]
+        for name, s in stats["classes"].items():
+            lines.append(f'forhuman_llm_queue_depth{{priority="{name}"}} {s["queued"]}')
+        lines.append("# HELP forhuman_llm_shed_total Calls rejected by the LLM quota scheduler.")
+        lines.append("# TYPE forhuman_llm_shed_total counter")
+        for name, s in stats["classes"].items():
+            lines.append(f'forhuman_llm_shed_total{{priority="{name}"}} {s["shed"]}')
+        lines.append("# HELP forhuman_llm_tokens_available Remaining tokens-per-minute budget per model.")
+        lines.append("# TYPE forhuman_llm_tokens_available gauge")
+        for name, m in stats["models"].items():
+            lines.append(f'forhuman_llm_tokens_available{{model="{name}"}} {m["tokens_available"]}')
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance used by gemini_pool
+llm_scheduler = LLMScheduler()
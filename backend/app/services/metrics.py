@@ -0,0 +1,217 @@
+"""
+Lightweight Latency Metrics
+In-process timers for request stages and external calls, exposed in the
+Prometheus text format by GET /metrics.
+
+- Each stage keeps a count, a running sum and a sliding window of the most
+  recent observations; p50/p95/p99 are computed from the window at scrape time.
+- Recording is a perf_counter() pair plus a locked deque append, so it is
+  cheap enough to leave on around every DB query.
+"""
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# Observations kept per stage for quantile estimation
+METRICS_WINDOW_SIZE = int(os.getenv("METRICS_WINDOW_SIZE", "1024"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StageTimer:
+    """Latency summary for one stage."""
+
+    __slots__ = ("count", "total", "errors", "window")
+
+    def __init__(self, window_size):
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.window = deque(maxlen=window_size)
+
+
+class _Timing:
+    """Context manager / decorator returned by MetricsRegistry.timer()."""
+
+    __slots__ = ("registry", "stage", "started")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # GeneratorExit / cancellation are not failures of the timed call
+        error = exc_type is not None and issubclass(exc_type, Exception)
+        self.registry.observe(self.stage, time.perf_counter() - self.started, error=error)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Named latency timers and error counters.
+
+    Stage names are dotted, e.g. "weather.fetch_current", "gemini.prescription",
+    "pipeline.safety_override", "db.select". External calls count a failure
+    whenever the timed block raises, or when record_error() is called for
+    calls that swallow their own exceptions.
+    """
+
+    def __init__(self, window_size=METRICS_WINDOW_SIZE, enabled=METRICS_ENABLED):
+        self.window_size = window_size
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages.setdefault(name, StageTimer(self.window_size))
+        return stage
+
+    # =========================================
+    # RECORDING
+    # =========================================
+
+    def observe(self, name, seconds, error=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stage(name)
+            stage.count += 1
+            stage.total += seconds
+            stage.window.append(seconds)
+            if error:
+                stage.errors += 1
+
+    def record_error(self, name):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stage(name).errors += 1
+
+    def timer(self, name):
+        """`with metrics.timer("stage"):` - times the block, counts it as an error if it raises."""
+        return _Timing(self, name)
+
+    def timed(self, name):
+        """Decorator form of timer()."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Timing(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # =========================================
+    # EXPOSITION
+    # =========================================
+
+    def snapshot(self):
+        """Returns {stage: {count, sum_seconds, errors, p50, p95, p99}}."""
+        with self._lock:
+            copies = {
+                name: (stage.count, stage.total, stage.errors, sorted(stage.window))
+                for name, stage in self._stages.items()
+            }
+
+        snapshot = {}
+        for name, (count, total, errors, ordered) in sorted(copies.items()):
+            entry = {"count": count, "sum_seconds": round(total, 6), "errors": errors}
+            for q in QUANTILES:
+                value = _quantile(ordered, q)
+                entry[f"p{int(q * 100)}"] = None if value != value else round(value, 6)
+            snapshot[name] = entry
+        return snapshot
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            copies = {
+                name: (stage.count, stage.total, stage.errors, sorted(stage.window))
+                for name, stage in self._stages.items()
+            }
+
+        lines = [
+            "# HELP forhuman_stage_latency_seconds Latency per stage (quantiles over the recent window).",
+            "# TYPE forhuman_stage_latency_seconds summary"
+        ]
+        for name, (count, total, _, ordered) in sorted(copies.items()):
+            label = _escape_label(name)
+            for q in QUANTILES:
+                lines.append(f'forhuman_stage_latency_seconds{{stage="{label}",quantile="{q}"}} {_quantile(ordered, q):.6f}')
+            lines.append(f'forhuman_stage_latency_seconds_sum{{stage="{label}"}} {total:.6f}')
+            lines.append(f'forhuman_stage_latency_seconds_count{{stage="{label}"}} {count}')
+
+        lines.append("# HELP forhuman_stage_errors_total Failed calls per stage.")
+        lines.append("# TYPE forhuman_stage_errors_total counter")
+        for name, (_, _, errors, _) in sorted(copies.items()):
+            lines.append(f'forhuman_stage_errors_total{{stage="{_escape_label(name)}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+# =========================================
+# SQLALCHEMY INSTRUMENTATION
+# =========================================
+
+def instrument_engine(engine, registry=None):
+    """
+    Times every statement executed on `engine` as "db.<verb>"
+    (db.select, db.insert, ...). Failed statements count as errors.
+    """
+    from sqlalchemy import event
+
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+    registry = registry or metrics
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        registry.observe(_statement_stage(statement), time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            started = stack.pop()
+            registry.observe(_statement_stage(context.statement), time.perf_counter() - started, error=True)
+
+
+def _statement_stage(statement):
+    verb = (statement or "").lstrip().split(None, 1)
+    return f"db.{verb[0].lower()}" if verb else "db.other"
+
+
+# Singleton registry used across the backend
+metrics = MetricsRegistry()
+timer = metrics.timer
+timed = metrics.timed
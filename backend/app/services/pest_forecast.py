@@ -2,9 +2,10 @@
 Enhanced Pest & Disease Forecasting
 Uses real weather data and scientific models for accurate predictions
 """
-import math
 from typing import Dict, List, Tuple
 
+from . import psychrometrics
+
 # Scientific pest risk models based on research
 PEST_MODELS = {
     "Strawberries": {
@@ -116,10 +117,7 @@ PEST_MODELS = {
 
 def calculate_vpd(temp_f: float, humidity: float) -> float:
     """Calculate Vapor Pressure Deficit"""
-    temp_c = (temp_f - 32) * 5.0/9.0
-    svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
-    vpd = svp * (1 - (humidity / 100))
-    return round(vpd, 2)
+    return psychrometrics.vpd(temp_f, humidity, unit="F", decimals=2)
 
 def evaluate_pest_risk(
     pest_name: str,
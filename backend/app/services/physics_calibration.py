@@ -0,0 +1,333 @@
+"""
+Least-Squares Physics Calibration
+Batch job that fits each farm's physics parameters to its reality-feedback
+history, replacing the single-sample +/-0.05 nudge of calibrate_model.
+
+For every farm with new EXACT temperature feedback since its last fit:
+
+1. EXACT readings (RealityFeedbackLog, e.g. "24C") are joined with the
+   nearest stored current weather of the farm's grid cell
+   (ExternalWeatherLog, within CALIBRATION_MATCH_SECONDS)
+2. The temperature model is linear in
+       theta = [insulation, effective solar gain, ventilation]
+   night:  T_in - T_out = 3 * insulation
+   day:    T_in - T_out = r * gain_eff - 0.5 * wind * ventilation
+   (r = 0.2 when raining), so all samples are fitted in one ridge-regularized
+   np.linalg.lstsq call, pulled towards the current profile
+3. solar_gain = gain_eff / (1 - 0.5 * ventilation); results are written to
+   FarmPhysicsProfile
+
+Fits run on a process pool across farms.
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .physics_engine import GreenhousePhysicsModel
+
+CALIBRATION_WORKERS = int(os.getenv("CALIBRATION_WORKERS", str(min(4, os.cpu_count() or 1))))
+CALIBRATION_MIN_SAMPLES = int(os.getenv("CALIBRATION_MIN_SAMPLES", "3"))
+CALIBRATION_MAX_SAMPLES = int(os.getenv("CALIBRATION_MAX_SAMPLES", "500"))
+# A reading is matched to weather observed at most this far away in time
+CALIBRATION_MATCH_SECONDS = int(os.getenv("CALIBRATION_MATCH_SECONDS", "2700"))
+# Ridge weight pulling each parameter towards the farm's current value
+CALIBRATION_PRIOR_WEIGHT = float(os.getenv("CALIBRATION_PRIOR_WEIGHT", "1.0"))
+# Below this many farms the pool start-up costs more than it saves
+CALIBRATION_POOL_MIN_FARMS = int(os.getenv("CALIBRATION_POOL_MIN_FARMS", "8"))
+
+PARAMETER_BOUNDS = {
+    "insulation_score": (0.05, 1.0),
+    "ventilation_score": (0.0, 1.0),
+    "solar_gain": (0.0, 15.0)
+}
+
+EXACT_TEMPERATURE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(?:°\s*)?([cf])?\s*$", re.IGNORECASE)
+
+
+def parse_exact_temperature(value):
+    """
+    Celsius from an EXACT feedback value ("24C", "75.2F", legacy "24.5"),
+    or None for humidity ("60%") and anything else.
+    """
+    match = EXACT_TEMPERATURE.match(value or "")
+    if not match:
+        return None
+    number = float(match.group(1))
+    if (match.group(2) or "c").lower() == "f":
+        return (number - 32) * 5 / 9
+    return number
+
+
+# =========================================
+# FIT (pure numpy; runs in worker processes)
+# =========================================
+
+def fit_farm(samples, profile, prior_weight=CALIBRATION_PRIOR_WEIGHT):
+    """
+    Fits insulation / ventilation / solar gain for one farm.
+
+    Args:
+        samples (dict of arrays, metric): actual (internal C), temperature,
+            humidity, wind_speed (m/s), rain (mm), is_day
+        profile (dict): current insulation_score, ventilation_score, solar_gain
+
+    Returns:
+        dict: fitted parameters plus samples, rmse_before, rmse_after
+    """
+    actual = np.asarray(samples["actual"], dtype=float)
+    ext_temp = np.asarray(samples["temperature"], dtype=float)
+    wind = np.asarray(samples["wind_speed"], dtype=float)
+    rain_factor = np.where(np.asarray(samples["rain"], dtype=float) > 0, 0.2, 1.0)
+    day = np.asarray(samples["is_day"], dtype=bool)
+
+    prior = np.array([
+        profile["insulation_score"],
+        profile["solar_gain"] * (1 - 0.5 * profile["ventilation_score"]),
+        profile["ventilation_score"]
+    ])
+    design = np.column_stack([
+        np.where(day, 0.0, 3.0),
+        np.where(day, rain_factor, 0.0),
+        np.where(day, -0.5 * wind, 0.0)
+    ])
+    target = actual - ext_temp
+
+    # Ridge rows keep parameters without evidence (e.g. no night readings) at their prior
+    ridge = np.sqrt(prior_weight) * np.eye(3)
+    theta, *_ = np.linalg.lstsq(np.vstack([design, ridge]), np.concatenate([target, ridge @ prior]), rcond=None)
+
+    low, high = PARAMETER_BOUNDS["insulation_score"]
+    insulation = float(np.clip(theta[0], low, high))
+    low, high = PARAMETER_BOUNDS["ventilation_score"]
+    ventilation = float(np.clip(theta[2], low, high))
+    low, high = PARAMETER_BOUNDS["solar_gain"]
+    solar_gain = float(np.clip(theta[1] / (1 - 0.5 * ventilation), low, high))
+
+    fitted = {"insulation_score": insulation, "ventilation_score": ventilation, "solar_gain": solar_gain}
+    return {
+        **{field: round(value, 4) for field, value in fitted.items()},
+        "samples": int(len(actual)),
+        "rmse_before": _rmse(samples, profile),
+        "rmse_after": _rmse(samples, fitted)
+    }
+
+
+def _rmse(samples, params):
+    model = GreenhousePhysicsModel({"type": "vinyl", "area_m2": 330, **params})
+    estimate = model.estimate_microclimate_batch(
+        samples["temperature"], samples["humidity"], samples["wind_speed"], samples["rain"], samples["is_day"]
+    )["temperature"]
+    return round(float(np.sqrt(np.mean((estimate - np.asarray(samples["actual"], dtype=float)) ** 2))), 3)
+
+
+def _fit_task(args):
+    user_id, samples, profile = args
+    return user_id, fit_farm(samples, profile)
+
+
+# =========================================
+# JOB
+# =========================================
+
+class PhysicsCalibrationJob:
+    """Incremental per-farm least-squares calibration."""
+
+    def __init__(self, workers=CALIBRATION_WORKERS, min_samples=CALIBRATION_MIN_SAMPLES):
+        self.workers = workers
+        self.min_samples = min_samples
+        self.runs = 0
+        self.last_result = None
+
+    def farms_due(self, db):
+        """Farms whose newest EXACT feedback is newer than their last calibration."""
+        from sqlalchemy import func, or_
+        from app.core.database import RealityFeedbackLog, FarmPhysicsProfile
+
+        newest = db.query(
+            RealityFeedbackLog.user_id.label("user_id"),
+            func.max(RealityFeedbackLog.timestamp).label("timestamp")
+        ).filter(RealityFeedbackLog.feedback_type == "EXACT").group_by(RealityFeedbackLog.user_id).subquery()
+
+        rows = db.query(newest.c.user_id).outerjoin(
+            FarmPhysicsProfile, FarmPhysicsProfile.user_id == newest.c.user_id
+        ).filter(or_(
+            FarmPhysicsProfile.calibrated_at.is_(None),
+            newest.c.timestamp > FarmPhysicsProfile.calibrated_at
+        )).all()
+        return [row[0] for row in rows]
+
+    def load_samples(self, db, user_ids):
+        """
+        Matched (reading, weather) samples per farm, metric:
+        {user_id: {"actual", "temperature", "humidity", "wind_speed", "rain", "is_day"}}
+        """
+        from app.core.database import RealityFeedbackLog, ExternalWeatherLog, User
+        from .weather_client import weather_client
+        from .weather_ingest import cell_id
+
+        users = db.query(User.id, User.latitude, User.longitude).filter(User.id.in_(user_ids)).all()
+        cells = {
+            user.id: cell_id(weather_client.cache_key(user.latitude, user.longitude))
+            for user in users
+            if user.latitude is not None and user.longitude is not None
+        }
+        if not cells:
+            return {}
+
+        feedback = {}
+        for row in db.query(RealityFeedbackLog.user_id, RealityFeedbackLog.timestamp, RealityFeedbackLog.feedback_value).filter(
+            RealityFeedbackLog.user_id.in_(list(cells)),
+            RealityFeedbackLog.feedback_type == "EXACT"
+        ).order_by(RealityFeedbackLog.timestamp.desc()):
+            celsius = parse_exact_temperature(row.feedback_value)
+            readings = feedback.setdefault(row.user_id, [])
+            if celsius is not None and row.timestamp is not None and len(readings) < CALIBRATION_MAX_SAMPLES:
+                readings.append((row.timestamp, celsius))
+
+        weather = {}
+        for row in db.query(ExternalWeatherLog).filter(
+            ExternalWeatherLog.cell.in_(set(cells.values())),
+            ExternalWeatherLog.kind == "current",
+            ExternalWeatherLog.temp_out.isnot(None)
+        ).order_by(ExternalWeatherLog.timestamp):
+            weather.setdefault(row.cell, []).append(row)
+
+        samples = {}
+        for user_id, readings in feedback.items():
+            history = weather.get(cells[user_id])
+            if not readings or not history:
+                continue
+            matched = _match_weather(readings, history)
+            if matched is not None:
+                samples[user_id] = matched
+        return samples
+
+    def load_profiles(self, user_ids):
+        from .physics_profiles import physics_profiles
+        return physics_profiles.get_many(user_ids)
+
+    def run(self, user_ids=None, workers=None):
+        """
+        Calibrates the given farms (default: every farm with new feedback).
+        Returns a summary dict (also kept as last_result).
+        """
+        from app.core.database import SessionLocal
+        from .physics_profiles import physics_profiles
+
+        started = time.perf_counter()
+        workers = self.workers if workers is None else workers
+        # Pending write-behind updates must not overwrite the fitted values later
+        physics_profiles.flush()
+
+        db = SessionLocal()
+        try:
+            due = list(user_ids) if user_ids is not None else self.farms_due(db)
+            samples = self.load_samples(db, due) if due else {}
+        finally:
+            db.close()
+
+        profiles = self.load_profiles(due) if due else {}
+        tasks = [
+            (user_id, samples[user_id], profiles[user_id])
+            for user_id in due
+            if user_id in samples and len(samples[user_id]["actual"]) >= self.min_samples
+        ]
+
+        if workers > 1 and len(tasks) >= CALIBRATION_POOL_MIN_FARMS:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                fits = dict(pool.map(_fit_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        else:
+            fits = dict(map(_fit_task, tasks))
+
+        self.store(due, fits)
+        physics_profiles.forget(due)
+
+        self.runs += 1
+        self.last_result = {
+            "farms_due": len(due),
+            "farms_fitted": len(fits),
+            "skipped_insufficient_data": len(due) - len(fits),
+            "samples": sum(fit["samples"] for fit in fits.values()),
+            "mean_rmse_before": _mean(fit["rmse_before"] for fit in fits.values()),
+            "mean_rmse_after": _mean(fit["rmse_after"] for fit in fits.values()),
+            "workers": workers if len(tasks) >= CALIBRATION_POOL_MIN_FARMS else 1,
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.utcnow().isoformat()
+        }
+        return self.last_result
+
+    def store(self, user_ids, fits):
+        """
+        Writes fitted parameters; every processed farm gets calibrated_at so
+        it is skipped until new feedback arrives.
+        """
+        if not user_ids:
+            return
+        from app.core.database import SessionLocal, FarmPhysicsProfile
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            existing = {
+                row.user_id: row
+                for row in db.query(FarmPhysicsProfile).filter(FarmPhysicsProfile.user_id.in_(list(user_ids))).all()
+            }
+            for user_id in user_ids:
+                row = existing.get(user_id)
+                if row is None:
+                    row = FarmPhysicsProfile(user_id=user_id)
+                    db.add(row)
+                row.calibrated_at = now
+                fit = fits.get(user_id)
+                if fit is None:
+                    continue
+                row.insulation_score = fit["insulation_score"]
+                row.ventilation_score = fit["ventilation_score"]
+                row.solar_gain = fit["solar_gain"]
+                row.calibration_samples = fit["samples"]
+                row.calibration_rmse = fit["rmse_after"]
+                row.last_updated = now
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self):
+        return {"runs": self.runs, "workers": self.workers, "last_result": self.last_result}
+
+
+def _match_weather(readings, history):
+    """Pairs each reading with the nearest weather row in time (vectorized searchsorted)."""
+    weather_ts = np.array([row.timestamp.timestamp() for row in history])
+    reading_ts = np.array([timestamp.timestamp() for timestamp, _ in readings])
+    right = np.clip(np.searchsorted(weather_ts, reading_ts), 0, len(weather_ts) - 1)
+    left = np.clip(right - 1, 0, len(weather_ts) - 1)
+    nearest = np.where(np.abs(weather_ts[left] - reading_ts) <= np.abs(weather_ts[right] - reading_ts), left, right)
+    keep = np.abs(weather_ts[nearest] - reading_ts) <= CALIBRATION_MATCH_SECONDS
+    if not keep.any():
+        return None
+
+    rows = [history[i] for i in nearest[keep]]
+    return {
+        "actual": np.array([celsius for _, celsius in readings])[keep],
+        "temperature": (np.array([row.temp_out for row in rows], dtype=float) - 32) * 5 / 9,
+        "humidity": np.array([row.humi_out if row.humi_out is not None else 50.0 for row in rows], dtype=float),
+        "wind_speed": np.array([row.wind_speed or 0.0 for row in rows], dtype=float) * 0.44704,
+        "rain": np.array([row.rain or 0.0 for row in rows], dtype=float) * 25.4,
+        "is_day": np.array([row.is_day is not False for row in rows], dtype=bool)
+    }
+
+
+def _mean(values):
+    values = list(values)
+    return round(sum(values) / len(values), 3) if values else None
+
+
+# Singleton instance
+physics_calibration = PhysicsCalibrationJob()
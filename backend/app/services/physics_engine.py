@@ -1,6 +1,13 @@
-import math
 from datetime import datetime
 
+import numpy as np
+
+from . import psychrometrics
+
+def day_flag(is_day):
+    """Weather `is_day` as a bool; unknown (None) counts as daytime."""
+    return True if is_day is None else bool(is_day)
+
 class GreenhousePhysicsModel:
     """
     A deterministic physics model to estimate internal greenhouse environment
@@ -115,7 +122,10 @@ class GreenhousePhysicsModel:
         solar_gain = 0
         if is_day:
             # Simplified solar gain model based on facility type
-            base_gain = 5.0 if self.params['type'] == 'vinyl' else 7.0
+            # (or the farm's calibrated solar_gain, if known)
+            base_gain = self.params.get('solar_gain')
+            if base_gain is None:
+                base_gain = 5.0 if self.params['type'] == 'vinyl' else 7.0
             solar_gain = base_gain * (1 - self.params['ventilation_score'] * 0.5)
             
             # Reduce gain if cloudy/rainy (simplified by assuming rain implies clouds)
@@ -152,17 +162,72 @@ class GreenhousePhysicsModel:
             "source": "physics_engine_v1"
         }
 
+    def estimate_microclimate_batch(self, temperature, humidity, wind_speed=0.0, rain=0.0, is_day=True, facility=None):
+        """
+        Vectorized estimate_microclimate: one pass over columns of weather
+        (batch dashboards, hourly forecasts, calibration fits).
+
+        Args:
+            temperature, humidity, wind_speed, rain: array-likes (or scalars,
+                broadcast) in the same units as estimate_microclimate
+            is_day: bool array-like (or scalar)
+            facility (dict, optional): per-row overrides of the facility
+                parameters, e.g. {"insulation_score": [...], "ventilation_score": [...],
+                "type": [...], "solar_gain": [...]}; missing keys use self.params
+
+        Returns:
+            dict: unrounded float arrays { "temperature", "humidity", "vpd" }.
+            Rounding each element as estimate_microclimate does gives the
+            scalar result.
+        """
+        facility = facility or {}
+        ext_temp = np.asarray(temperature, dtype=float)
+        ext_hum = np.asarray(humidity, dtype=float)
+        wind = np.asarray(wind_speed, dtype=float)
+        rain = np.asarray(rain, dtype=float)
+        is_day = np.asarray(is_day, dtype=bool)
+        ventilation = np.asarray(facility.get("ventilation_score", self.params['ventilation_score']), dtype=float)
+        insulation = np.asarray(facility.get("insulation_score", self.params['insulation_score']), dtype=float)
+        base_gain = np.where(np.asarray(facility.get("type", self.params['type'])) == 'vinyl', 5.0, 7.0)
+        solar = facility.get("solar_gain", self.params.get('solar_gain'))
+        if solar is not None:
+            base_gain = np.asarray(solar, dtype=float) * np.ones_like(base_gain)
+
+        # 1. Temperature: solar gain (cut by rain) minus wind cooling by day,
+        # insulation-retained offset at night
+        solar_gain = base_gain * (1 - ventilation * 0.5)
+        solar_gain = np.where(rain > 0, solar_gain * 0.2, solar_gain)
+        wind_cooling = wind * ventilation * 0.5
+        day_temp = ext_temp + solar_gain - wind_cooling
+        night_temp = ext_temp + 3.0 * insulation
+        int_temp = np.where(is_day, day_temp, night_temp)
+
+        # 2. Humidity: transpiration, reduced by ventilation
+        transpiration_add = np.where(is_day, 10, 5)
+        vent_effect = (ext_hum - (ext_hum + transpiration_add)) * ventilation
+        int_hum = np.clip(ext_hum + transpiration_add + vent_effect, 0, 100)
+
+        # 3. VPD
+        vpd = self.calculate_vpd_batch(int_temp, int_hum)
+
+        shape = np.broadcast(int_temp, int_hum).shape
+        return {
+            "temperature": np.broadcast_to(int_temp, shape),
+            "humidity": np.broadcast_to(int_hum, shape),
+            "vpd": np.broadcast_to(vpd, shape)
+        }
+
     def calculate_vpd(self, temp_c, humidity_percent):
         """
         Calculates Vapor Pressure Deficit (kPa)
         """
-        # Saturation Vapor Pressure (SVP)
-        svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
-        
-        # Actual Vapor Pressure (AVP)
-        avp = svp * (humidity_percent / 100.0)
-        
-        return svp - avp
+        return psychrometrics.vpd(temp_c, humidity_percent)
+
+    def calculate_vpd_batch(self, temp_c, humidity_percent):
+        """
+        Vectorized calculate_vpd over arrays of temperature / humidity (kPa)
+        """
+        return psychrometrics.vpd_array(temp_c, humidity_percent)
 
     def get_safety_limits(self, crop_type="tomato"):
         """
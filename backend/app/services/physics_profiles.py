@@ -0,0 +1,211 @@
+"""
+Per-Farm Physics Profiles
+Learned facility parameters per farm (FarmPhysicsProfile), so one farm's
+calibration never changes another farm's estimates.
+
+- Reads go through a bounded LRU (TTLCache): no DB hit per request
+- Calibration updates land in the cache immediately and are written to
+  the DB by a write-behind buffer (flushed after PROFILE_FLUSH_SECONDS,
+  when PROFILE_FLUSH_MAX_DIRTY farms are pending, and on shutdown)
+- model_for(user_id) returns a cheap per-farm GreenhousePhysicsModel view
+"""
+import os
+import threading
+from datetime import datetime
+
+from .cache import TTLCache
+from .physics_engine import GreenhousePhysicsModel, physics_engine
+
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600"))
+PROFILE_FLUSH_SECONDS = float(os.getenv("PROFILE_FLUSH_SECONDS", "5.0"))
+PROFILE_FLUSH_MAX_DIRTY = int(os.getenv("PROFILE_FLUSH_MAX_DIRTY", "100"))
+
+# Learned fields stored in FarmPhysicsProfile (column defaults)
+PROFILE_DEFAULTS = {
+    "insulation_score": 0.5,
+    "moisture_retention": 0.5,
+    "thermal_lag": 1.0,
+    "ventilation_score": 0.7,
+    "solar_gain": 5.0
+}
+
+
+class PhysicsProfileStore:
+    """LRU-cached, write-behind store of FarmPhysicsProfile rows."""
+
+    def __init__(self, maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL,
+                 flush_seconds=PROFILE_FLUSH_SECONDS, flush_max_dirty=PROFILE_FLUSH_MAX_DIRTY):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._dirty = {}  # user_id -> profile awaiting write
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self.flush_seconds = flush_seconds
+        self.flush_max_dirty = flush_max_dirty
+        self.loads = 0
+        self.writes = 0
+        self.write_errors = 0
+
+    # =========================================
+    # READ
+    # =========================================
+
+    def get(self, user_id):
+        """Profile dict for a farm (defaults for unknown farms / no user)."""
+        if not user_id:
+            return dict(PROFILE_DEFAULTS)
+        return self.get_many([user_id])[user_id]
+
+    def get_many(self, user_ids):
+        """Profiles for many farms; cache misses are loaded with one query."""
+        profiles = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            with self._lock:
+                pending = self._dirty.get(user_id)
+            profile = dict(pending) if pending is not None else self._cache.get(user_id)
+            if profile is not None:
+                profiles[user_id] = dict(profile)
+            else:
+                missing.append(user_id)
+
+        if missing:
+            loaded = self._load(missing)
+            for user_id in missing:
+                profile = (loaded or {}).get(user_id, PROFILE_DEFAULTS)
+                if loaded is not None:
+                    self._cache.set(user_id, dict(profile))
+                profiles[user_id] = dict(profile)
+        return profiles
+
+    def _load(self, user_ids):
+        """Returns {user_id: profile} for rows found, or None if the DB is unavailable."""
+        from app.core.database import SessionLocal, FarmPhysicsProfile
+
+        db = SessionLocal()
+        try:
+            rows = db.query(FarmPhysicsProfile).filter(FarmPhysicsProfile.user_id.in_(user_ids)).all()
+            self.loads += 1
+            return {
+                row.user_id: {
+                    field: getattr(row, field) if getattr(row, field) is not None else default
+                    for field, default in PROFILE_DEFAULTS.items()
+                }
+                for row in rows
+            }
+        except Exception as e:
+            print(f"⚠️ Failed to load physics profiles: {e}")
+            return None
+        finally:
+            db.close()
+
+    def model_for(self, user_id, profile=None):
+        """
+        Per-farm physics model: the shared facility defaults overlaid with
+        the farm's learned insulation, ventilation and solar gain. Without a
+        user, the shared model.
+        """
+        if not user_id:
+            return physics_engine
+        profile = profile or self.get(user_id)
+        params = dict(physics_engine.params)
+        for field in ("insulation_score", "ventilation_score", "solar_gain"):
+            params[field] = profile[field]
+        return GreenhousePhysicsModel(params)
+
+    def forget(self, user_ids):
+        """Drops cached profiles (after an out-of-band write, e.g. a calibration run)."""
+        for user_id in user_ids:
+            self._cache.pop(user_id)
+
+    # =========================================
+    # WRITE-BEHIND
+    # =========================================
+
+    def update(self, user_id, **fields):
+        """Applies learned values now; the DB write happens on the next flush."""
+        unknown = set(fields) - set(PROFILE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {sorted(unknown)}")
+
+        profile = self.get(user_id)
+        profile.update(fields)
+        self._cache.set(user_id, dict(profile))
+        with self._lock:
+            self._dirty[user_id] = dict(profile)
+            flush_now = len(self._dirty) >= self.flush_max_dirty
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if flush_now:
+            self.flush()
+        return profile
+
+    def calibrate(self, user_id, actual_internal_temp, external_weather):
+        """Runs calibrate_model on the farm's own model and stores the result."""
+        model = self.model_for(user_id)
+        if model is physics_engine:
+            raise ValueError("Calibration requires a farm id")
+        result = model.calibrate_model(actual_internal_temp, external_weather)
+        self.update(user_id, insulation_score=model.params["insulation_score"])
+        return result
+
+    def flush(self):
+        """Writes all pending profiles in one transaction. Returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not dirty:
+                return 0
+
+            from app.core.database import SessionLocal, FarmPhysicsProfile
+
+            db = SessionLocal()
+            try:
+                now = datetime.utcnow()
+                existing = {
+                    row.user_id: row
+                    for row in db.query(FarmPhysicsProfile).filter(FarmPhysicsProfile.user_id.in_(list(dirty))).all()
+                }
+                for user_id, profile in dirty.items():
+                    row = existing.get(user_id)
+                    if row is None:
+                        row = FarmPhysicsProfile(user_id=user_id)
+                        db.add(row)
+                    for field, value in profile.items():
+                        setattr(row, field, value)
+                    row.last_updated = now
+                db.commit()
+                self.writes += len(dirty)
+                return len(dirty)
+            except Exception as e:
+                db.rollback()
+                self.write_errors += 1
+                print(f"❌ Failed to write physics profiles: {e}")
+                # Keep the updates for the next flush unless newer ones arrived
+                with self._lock:
+                    for user_id, profile in dirty.items():
+                        self._dirty.setdefault(user_id, profile)
+                return 0
+            finally:
+                db.close()
+
+    def stats(self):
+        with self._lock:
+            dirty = len(self._dirty)
+        return {
+            "cache": self._cache.stats(),
+            "dirty": dirty,
+            "loads": self.loads,
+            "writes": self.writes,
+            "write_errors": self.write_errors
+        }
+
+
+# Singleton instance
+physics_profiles = PhysicsProfileStore()
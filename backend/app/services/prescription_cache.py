@@ -0,0 +1,109 @@
+"""
+Quantized Prescription Cache
+Caches raw Gemini prescriptions keyed on the crop and a bucketed copy of the
+validated microclimate. Farms in the same region at the same hour produce
+near-identical prompts, so they can share one response.
+
+The cached text is the model output BEFORE the safety filter; each request
+still runs its own hallucination guard / safety override / disclaimer.
+"""
+import os
+import threading
+
+from .cache import TTLCache
+from .single_flight import SingleFlight
+
+PRESCRIPTION_CACHE_TTL = int(os.getenv("PRESCRIPTION_CACHE_TTL_SECONDS", "1800"))
+PRESCRIPTION_CACHE_SIZE = int(os.getenv("PRESCRIPTION_CACHE_SIZE", "2048"))
+
+# Microclimate quantization steps (metric, as produced by the physics engine)
+PRESCRIPTION_BUCKETS = {
+    "temperature": float(os.getenv("PRESCRIPTION_TEMP_STEP_C", "0.5")),   # C
+    "humidity": float(os.getenv("PRESCRIPTION_HUMIDITY_STEP", "5")),      # %
+    "vpd": float(os.getenv("PRESCRIPTION_VPD_STEP_KPA", "0.1"))           # kPa
+}
+
+
+def quantize_microclimate(microclimate, buckets=PRESCRIPTION_BUCKETS):
+    """
+    Buckets microclimate values. Returns None if any value is missing,
+    in which case the prompt is not cacheable.
+    """
+    quantized = []
+    for field, step in buckets.items():
+        value = microclimate.get(field) if microclimate else None
+        if value is None:
+            return None
+        quantized.append(round(float(value) / step))
+    return tuple(quantized)
+
+
+def is_cacheable_response(text):
+    """Fallback / error texts must never be served to other farms."""
+    return bool(text) and not text.startswith("Error") and "Simulation Mode" not in text
+
+
+class PrescriptionCache:
+    """LRU + TTL cache of prescription texts with hit / miss / bypass counts."""
+
+    def __init__(self, maxsize=PRESCRIPTION_CACHE_SIZE, ttl=PRESCRIPTION_CACHE_TTL, buckets=None):
+        self.buckets = buckets or PRESCRIPTION_BUCKETS
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # Concurrent misses on the same key share one Gemini call
+        self._flight = SingleFlight("prescription")
+        self.bypassed = 0
+
+    def make_key(self, crop_type, microclimate, role=None):
+        bucket = quantize_microclimate(microclimate, self.buckets)
+        if bucket is None:
+            return None
+        return ((crop_type or "").lower(), role, bucket)
+
+    def get(self, key):
+        return self._cache.get(key) if key is not None else None
+
+    def set(self, key, text):
+        if key is not None and is_cacheable_response(text):
+            self._cache.set(key, text)
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def get_or_generate(self, key, generate, bypass=False):
+        """
+        Returns the cached prescription for `key`, or calls generate() and
+        caches a successful result. Concurrent misses on one key are
+        coalesced into a single generate() call. bypass=True (e.g. user
+        feedback in the prompt) always generates and never stores.
+        """
+        if bypass or key is None:
+            self.record_bypass()
+            return generate()
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        def generate_and_store():
+            text = generate()
+            self.set(key, text)
+            return text
+
+        return self._flight.do(key, generate_and_store)
+
+    def stats(self):
+        stats = self._cache.stats()
+        with self._lock:
+            stats["bypassed"] = self.bypassed
+        stats["buckets"] = dict(self.buckets)
+        stats["single_flight"] = self._flight.stats()
+        return stats
+
+    def clear(self):
+        self._cache.clear()
+
+
+# Singleton instance used by ai_engine.analyze_situation
+prescription_cache = PrescriptionCache()
@@ -0,0 +1,119 @@
+"""
+Psychrometrics
+Single home of the saturation vapour pressure / VPD math used by the
+physics engine, dashboard, sensors API, pest forecast and weekly report.
+
+Scalar functions (math, plain floats) and array forms (NumPy, broadcast,
+NaN for missing values) for:
+
+- svp:                saturation vapour pressure, kPa (Tetens)
+- vpd:                vapour pressure deficit, kPa
+- dew_point:          dew point, in the input temperature unit (Magnus)
+- absolute_humidity:  water vapour density, g/m3
+
+Temperatures are Celsius unless unit="F". Pure math / NumPy with no app
+imports, so the Streamlit app (src/) can import it too.
+"""
+import math
+
+import numpy as np
+
+# Tetens / Magnus coefficients (kPa, C)
+SVP_A = 0.61078
+SVP_B = 17.27
+SVP_C = 237.3
+# Specific gas constant of water vapour, J / (kg K)
+WATER_VAPOR_GAS_CONSTANT = 461.5
+KELVIN = 273.15
+
+
+def to_celsius(temp, unit="C"):
+    """Temperature in Celsius from C or F (scalar or array)."""
+    unit = unit.upper()
+    if unit == "C":
+        return temp
+    if unit == "F":
+        return (temp - 32) * 5.0 / 9.0
+    raise ValueError(f"Unknown temperature unit: {unit}")
+
+
+def from_celsius(temp_c, unit="C"):
+    unit = unit.upper()
+    if unit == "C":
+        return temp_c
+    if unit == "F":
+        return temp_c * 9.0 / 5.0 + 32
+    raise ValueError(f"Unknown temperature unit: {unit}")
+
+
+# =========================================
+# SCALAR
+# =========================================
+
+def svp(temp, unit="C"):
+    """Saturation vapour pressure (kPa)."""
+    temp_c = to_celsius(temp, unit)
+    return SVP_A * math.exp((SVP_B * temp_c) / (temp_c + SVP_C))
+
+
+def vpd(temp, humidity, unit="C", decimals=None):
+    """Vapour pressure deficit (kPa) at `humidity` % relative humidity."""
+    saturation = svp(temp, unit)
+    value = saturation - saturation * (humidity / 100.0)
+    return value if decimals is None else round(value, decimals)
+
+
+def dew_point(temp, humidity, unit="C"):
+    """Dew point in the unit of `temp`. humidity must be > 0."""
+    temp_c = to_celsius(temp, unit)
+    gamma = math.log(humidity / 100.0) + (SVP_B * temp_c) / (temp_c + SVP_C)
+    return from_celsius(SVP_C * gamma / (SVP_B - gamma), unit)
+
+
+def absolute_humidity(temp, humidity, unit="C"):
+    """Water vapour density (g/m3)."""
+    temp_c = to_celsius(temp, unit)
+    vapor_pa = svp(temp_c) * 1000.0 * (humidity / 100.0)
+    return vapor_pa / (WATER_VAPOR_GAS_CONSTANT * (temp_c + KELVIN)) * 1000.0
+
+
+# =========================================
+# ARRAY (NumPy)
+# =========================================
+
+def _array(values):
+    # None (missing SQL aggregates) becomes NaN
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    if np.isscalar(values) or values is None:
+        return np.asarray(np.nan if values is None else values, dtype=float)
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def svp_array(temp, unit="C"):
+    temp_c = to_celsius(_array(temp), unit)
+    return SVP_A * np.exp((SVP_B * temp_c) / (temp_c + SVP_C))
+
+
+def vpd_array(temp, humidity, unit="C", decimals=None):
+    saturation = svp_array(temp, unit)
+    value = saturation - saturation * (_array(humidity) / 100.0)
+    return value if decimals is None else np.round(value, decimals)
+
+
+def dew_point_array(temp, humidity, unit="C"):
+    temp_c = to_celsius(_array(temp), unit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = np.log(_array(humidity) / 100.0) + (SVP_B * temp_c) / (temp_c + SVP_C)
+    return from_celsius(SVP_C * gamma / (SVP_B - gamma), unit)
+
+
+def absolute_humidity_array(temp, humidity, unit="C"):
+    temp_c = to_celsius(_array(temp), unit)
+    vapor_pa = svp_array(temp_c) * 1000.0 * (_array(humidity) / 100.0)
+    return vapor_pa / (WATER_VAPOR_GAS_CONSTANT * (temp_c + KELVIN)) * 1000.0
+
+
+def to_json_list(values, decimals):
+    """Array -> list of rounded floats with None for NaN (JSON responses)."""
+    return [None if math.isnan(value) else round(float(value), decimals) for value in np.asarray(values, dtype=float)]
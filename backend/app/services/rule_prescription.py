@@ -0,0 +1,145 @@
+"""
+Rule-Engine Prescription Fast Path
+When the estimated microclimate sits comfortably inside the crop's safety
+limits (physics_engine.get_safety_limits) and the knowledge-base humidity
+band, the LLM answer is nearly always "Normal - maintain current schedule".
+This module writes that standard **Status** / **Prescription** / **Reasoning**
+block locally; borderline or abnormal states (and user-feedback
+re-evaluations) still go to the LLM.
+
+Margins are configurable via environment variables.
+"""
+import json
+import os
+
+from .physics_engine import physics_engine
+
+RULE_PRESCRIPTION_ENABLED = os.getenv("RULE_PRESCRIPTION_ENABLED", "true").lower() == "true"
+# How far inside the limits a value must be to count as "clearly normal"
+RULE_TEMP_MARGIN_C = float(os.getenv("RULE_TEMP_MARGIN_C", "3.0"))
+RULE_VPD_MARGIN_KPA = float(os.getenv("RULE_VPD_MARGIN_KPA", "0.15"))
+RULE_HUMIDITY_MARGIN = float(os.getenv("RULE_HUMIDITY_MARGIN", "5"))
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(__file__), "knowledge_base.json")
+
+_knowledge_base = None
+
+
+def knowledge_base():
+    global _knowledge_base
+    if _knowledge_base is None:
+        try:
+            with open(KNOWLEDGE_BASE_PATH, "r") as f:
+                _knowledge_base = json.load(f)
+        except Exception as e:
+            print(f"Error loading KB: {e}")
+            _knowledge_base = {}
+    return _knowledge_base
+
+
+def _crop_variants(crop_type):
+    """Name plus singular forms: 'Tomatoes' -> ['tomatoes', 'tomato', 'tomatoe']"""
+    name = (crop_type or "").strip().lower()
+    variants = [name]
+    if name.endswith("ies"):
+        variants.append(name[:-3] + "y")
+    if name.endswith("es"):
+        variants.append(name[:-2])
+    if name.endswith("s"):
+        variants.append(name[:-1])
+    return variants
+
+
+def crop_profile(crop_type):
+    """
+    Safety limits (metric) plus the knowledge-base entry (imperial) for a crop,
+    and whether either is crop-specific (False means only the defaults matched).
+    """
+    variants = _crop_variants(crop_type)
+    default = physics_engine.get_safety_limits("default")
+    limits, specific = default, False
+    for name in variants:
+        candidate = physics_engine.get_safety_limits(name)
+        if candidate != default:
+            limits, specific = candidate, True
+            break
+
+    kb_entry = {}
+    for key, entry in knowledge_base().items():
+        if set(_crop_variants(key)) & set(variants):
+            kb_entry = entry
+            break
+    return limits, kb_entry, specific or bool(kb_entry)
+
+
+def _c_to_f(celsius):
+    return celsius * 9 / 5 + 32
+
+
+def evaluate(crop_type, microclimate):
+    """
+    Returns (is_clearly_normal, checks). Each check is
+    (label, value, low, high, margin) in the limit's own units
+    (safety limits are metric, knowledge-base bands are imperial / %).
+    Crops with neither specific limits nor a knowledge-base entry are never
+    clearly normal: the defaults say nothing about them.
+    """
+    limits, kb_entry, known = crop_profile(crop_type)
+    if not known:
+        return False, []
+    temp_c = microclimate.get("temperature")
+    vpd = microclimate.get("vpd")
+    humidity = microclimate.get("humidity")
+    if temp_c is None or vpd is None or humidity is None:
+        return False, []
+
+    checks = [
+        ("temperature", temp_c, limits["temp_min"], limits["temp_max"], RULE_TEMP_MARGIN_C),
+        ("vpd", vpd, limits["vpd_min"], limits["vpd_max"], RULE_VPD_MARGIN_KPA)
+    ]
+    if kb_entry.get("temp_min") is not None and kb_entry.get("temp_max") is not None:
+        # Optimal growing band: being inside it is enough
+        checks.append(("optimal_temperature", _c_to_f(temp_c), kb_entry["temp_min"], kb_entry["temp_max"], 0.0))
+    if kb_entry.get("humidity_min") is not None and kb_entry.get("humidity_max") is not None:
+        checks.append(("humidity", humidity, kb_entry["humidity_min"], kb_entry["humidity_max"], RULE_HUMIDITY_MARGIN))
+
+    normal = all(low + margin <= value <= high - margin for _, value, low, high, margin in checks)
+    return normal, checks
+
+
+def rule_prescription(crop_type, microclimate):
+    """
+    Standard prescription block for a clearly-normal state, or None when
+    the state is borderline / abnormal, the crop is unknown to both the
+    safety limits and the knowledge base, or the fast path is disabled.
+    """
+    if not RULE_PRESCRIPTION_ENABLED:
+        return None
+    normal, checks = evaluate(crop_type, microclimate)
+    if not normal:
+        return None
+
+    reasons = []
+    for label, value, low, high, _ in checks:
+        if label == "temperature":
+            reasons.append(
+                f"Estimated greenhouse temperature {_c_to_f(value):.1f}°F is well within the "
+                f"{_c_to_f(low):.0f}-{_c_to_f(high):.0f}°F safe range"
+            )
+        elif label == "optimal_temperature":
+            reasons.append(f"inside the optimal {low}-{high}°F growing band")
+        elif label == "vpd":
+            reasons.append(f"VPD {value:.2f} kPa is inside the {low}-{high} kPa target")
+        else:
+            reasons.append(f"humidity {value:.0f}% is inside the {low}-{high}% band")
+
+    _, kb_entry, _ = crop_profile(crop_type)
+    note = f" {kb_entry['description']}" if kb_entry.get("description") else ""
+
+    return f"""
+        **Status**: Normal
+        **Prescription**: Maintain current irrigation and ventilation schedule. Continue routine monitoring.
+        **Reasoning**: {"; ".join(reasons)} for {crop_type}.{note}
+
+        [DISCLAIMER]: This is a rule-based suggestion for informational purposes only. Consult a professional before taking action.
+        """
@@ -2,7 +2,8 @@ import json
 import logging
 import math
 from datetime import datetime
-from .physics_engine import physics_engine
+from .physics_engine import physics_engine, day_flag
+from .metrics import metrics, timed, timer
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -17,7 +18,7 @@ class HybridSafetyFilter:
     def __init__(self):
         self.disclaimer_text = "\n\n[MANDATORY DISCLAIMER]: This analysis is generated by AI for informational purposes only. It is NOT a diagnosis. Always consult an expert."
 
-    def run_pipeline(self, weather_data, crop_type, ai_generator_func):
+    def run_pipeline(self, weather_data, crop_type, ai_generator_func, physics=None):
         """
         Executes the 10-step safety pipeline.
         
@@ -25,20 +26,15 @@ class HybridSafetyFilter:
             weather_data (dict): Raw weather input.
             crop_type (str): Target crop.
             ai_generator_func (func): Callback to run the actual AI model.
+            physics (GreenhousePhysicsModel, optional): Farm's own model
+                (physics_profiles.model_for); defaults to the shared one.
             
         Returns:
             str: Safe, filtered response text.
         """
         try:
-            # Step 1: Input Sanity Check
-            clean_input = self.input_sanity_check(weather_data)
-            
-            # Step 2: System Status Check (Simulated)
-            # In a real app, this would check if DB is up, API quota remains, etc.
-            self.system_status_check()
-
-            # Step 3: Physics Bound Check & Estimation
-            microclimate = self.physics_estimation_with_bounds(clean_input)
+            # Steps 1-3: Validate input and estimate the microclimate
+            microclimate = self.prepare(weather_data, physics)
             
             # Step 4: Prompt Injection Guard
             # We construct the prompt safely, so we skip complex injection detection for now
@@ -46,34 +42,63 @@ class HybridSafetyFilter:
             
             # Step 5: Simulated Response Generation (Run AI)
             # We pass the ROBUST prompt constructed from validated physics data
-            ai_response_text = ai_generator_func(microclimate)
+            with timer("pipeline.step5_ai_generate"):
+                ai_response_text = ai_generator_func(microclimate)
             
-            # Step 6: Format Validation
-            # Ensure the AI output contains expected sections
-            if not self.validate_format(ai_response_text):
-                logger.warning("AI output format invalid. Appending default structure.")
-                ai_response_text += "\n\n(Note: Output format was auto-corrected for clarity.)"
-
-            # Step 7: Hallucination Guard (Cross-Reference)
-            valid_response = self.hallucination_guard(ai_response_text, microclimate, crop_type)
-
-            # Step 8: Strict Safety Override
-            final_response = self.safety_override(valid_response, microclimate, crop_type)
-
-            # Step 9: Legal Disclaimer Injection
-            final_response = self.inject_legal_wrapper(final_response)
-
-            return final_response
+            # Steps 6-9: Validate, cross-check and wrap the AI output
+            return self.finalize(ai_response_text, microclimate, crop_type)
 
         except Exception as e:
             # Step 10: Fail-Safe Fallback
             logger.error(f"Safety Filter Pipeline Crash: {e}")
+            metrics.record_error("pipeline.run")
             return self.fail_safe_fallback(e)
 
+    def prepare(self, weather_data, physics=None):
+        """
+        Steps 1-3 of the pipeline (everything before the AI call).
+        Split out so streaming callers can run the AI step themselves.
+        
+        Returns:
+            dict: Validated microclimate estimate.
+        """
+        # Step 1: Input Sanity Check
+        clean_input = self.input_sanity_check(weather_data)
+        
+        # Step 2: System Status Check (Simulated)
+        # In a real app, this would check if DB is up, API quota remains, etc.
+        self.system_status_check()
+
+        # Step 3: Physics Bound Check & Estimation
+        return self.physics_estimation_with_bounds(clean_input, physics)
+
+    def finalize(self, ai_response_text, microclimate, crop_type):
+        """
+        Steps 6-9 of the pipeline (everything after the AI call).
+        
+        Returns:
+            str: Safe, filtered response text.
+        """
+        # Step 6: Format Validation
+        # Ensure the AI output contains expected sections
+        if not self.validate_format(ai_response_text):
+            logger.warning("AI output format invalid. Appending default structure.")
+            ai_response_text += "\n\n(Note: Output format was auto-corrected for clarity.)"
+
+        # Step 7: Hallucination Guard (Cross-Reference)
+        valid_response = self.hallucination_guard(ai_response_text, microclimate, crop_type)
+
+        # Step 8: Strict Safety Override
+        final_response = self.safety_override(valid_response, microclimate, crop_type)
+
+        # Step 9: Legal Disclaimer Injection
+        return self.inject_legal_wrapper(final_response)
+
     # =========================================
     # DETAILED IMPLEMENTATION OF STEPS
     # =========================================
 
+    @timed("pipeline.step1_input_sanity")
     def input_sanity_check(self, weather):
         """Step 1: Verify data is within Earth's possible ranges."""
         safe_weather = weather.copy()
@@ -92,12 +117,14 @@ class HybridSafetyFilter:
             
         return safe_weather
 
+    @timed("pipeline.step2_system_status")
     def system_status_check(self):
         """Step 2: Check critical dependencies."""
         # For now, we assume if code is running, python is okay.
         pass
 
-    def physics_estimation_with_bounds(self, weather):
+    @timed("pipeline.step3_physics_bounds")
+    def physics_estimation_with_bounds(self, weather, physics=None):
         """Step 3: Run Physics Engine and verify outputs."""
         # Convert inputs to metric for engine
         w_metric = {
@@ -105,11 +132,11 @@ class HybridSafetyFilter:
             "humidity": float(weather['humidity']),
             "wind_speed": float(weather.get('wind_speed', 0)) * 0.44704,
             "rain": float(weather.get('rain', 0)) * 25.4,
-            "is_day": True
+            "is_day": day_flag(weather.get('is_day'))
         }
         
         try:
-            micro = physics_engine.estimate_microclimate(w_metric)
+            micro = (physics or physics_engine).estimate_microclimate(w_metric)
             
             # Verify outputs
             if math.isnan(micro['vpd']) or micro['vpd'] < 0:
@@ -123,6 +150,7 @@ class HybridSafetyFilter:
             # Return safe default
             return {"temperature": 25.0, "humidity": 60.0, "vpd": 1.0, "source": "safe_default"}
 
+    @timed("pipeline.step6_format")
     def validate_format(self, text):
         """Step 6: Check for required Markdown sections."""
         required = ["**Status**", "**Prescription**", "**Reasoning**"]
@@ -131,6 +159,7 @@ class HybridSafetyFilter:
                 return False
         return True
 
+    @timed("pipeline.step7_hallucination_guard")
     def hallucination_guard(self, text, microclimate, crop_type):
         """Step 7: Check if AI contradicts hard physics data."""
         # If physics says VPD is LOW (<0.3) but AI says 'Dry/High VPD', it's a hallucination.
@@ -143,6 +172,7 @@ class HybridSafetyFilter:
             
         return text
 
+    @timed("pipeline.step8_safety_override")
     def safety_override(self, text, microclimate, crop_type):
         """Step 8: Force overrides for Critical Danger zones."""
         limits = physics_engine.get_safety_limits(crop_type)
@@ -158,6 +188,7 @@ class HybridSafetyFilter:
             """
         return text
 
+    @timed("pipeline.step9_legal_wrapper")
     def inject_legal_wrapper(self, text):
         """Step 9: Add mandatory legal headers/footers."""
         if "[MANDATORY DISCLAIMER]" in text:
@@ -0,0 +1,91 @@
+"""
+Single-Flight Request Coalescing
+When several threads make the same slow call at once (e.g. a county's farms
+opening the app at 6 am on a cold cache), only the first ("leader") runs it;
+the others ("followers") wait for and share its result or its exception.
+"""
+import copy
+import os
+import threading
+
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", "60"))
+
+
+class SingleFlightTimeout(Exception):
+    """Raised in a follower when the leader's call did not finish in time"""
+    pass
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key (thread-based; callers run
+    in worker threads, so a follower blocks only its own thread).
+
+    Followers receive a deep copy of the leader's result so callers that
+    post-process the result in place do not affect each other.
+    """
+
+    def __init__(self, name, timeout=SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key, func, timeout=None):
+        """
+        Runs func() once per key among concurrent callers.
+        A follower re-raises the leader's exception, or SingleFlightTimeout
+        after `timeout` seconds.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                call.followers += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = func()
+                return call.result
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout(f"{self.name}: timed out waiting for in-flight call")
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts
+            }
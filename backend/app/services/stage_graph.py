@@ -0,0 +1,91 @@
+"""
+Async Stage Graph
+Runs request stages concurrently according to their dependencies, with a
+per-stage timeout. A failed or slow stage yields a partial result instead
+of failing the whole request.
+"""
+import asyncio
+import inspect
+import time
+
+from .metrics import metrics
+
+
+class Stage:
+    def __init__(self, name, func, deps=(), timeout=None, default=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+
+
+class StageGraph:
+    """
+    Minimal DAG executor for request handlers.
+
+    Each stage function receives a dict of its dependencies' results
+    ({dep_name: value}) and may be sync (run in a worker thread) or async.
+    Stages whose dependencies failed still run; they see the dependency's
+    `default` value and decide for themselves how to degrade.
+    """
+
+    def __init__(self, name=None):
+        # When named, each stage's latency is recorded as "<name>.<stage>"
+        self.name = name
+        self._stages = {}
+
+    def add(self, name, func, deps=(), timeout=None, default=None):
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = Stage(name, func, deps, timeout, default)
+        return self
+
+    async def run(self, on_stage=None):
+        """
+        Executes all stages. Returns (results, report) where report maps each
+        stage name to {"status": ok|timeout|error, "ms": float[, "error": str]}.
+
+        on_stage(name, value, report_entry), if given, is called on the event
+        loop as soon as each stage finishes (used for streaming responses).
+        """
+        tasks = {}
+        results = {}
+        report = {}
+
+        async def execute(stage):
+            dep_values = {}
+            for dep in stage.deps:
+                await tasks[dep]
+                dep_values[dep] = results[dep]
+
+            started = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(stage.func):
+                    call = stage.func(dep_values)
+                else:
+                    call = asyncio.to_thread(stage.func, dep_values)
+                results[stage.name] = await asyncio.wait_for(call, stage.timeout)
+                report[stage.name] = {"status": "ok"}
+            except asyncio.TimeoutError:
+                results[stage.name] = stage.default
+                report[stage.name] = {"status": "timeout"}
+            except Exception as e:
+                print(f"⚠️ Stage '{stage.name}' failed: {e}")
+                results[stage.name] = stage.default
+                report[stage.name] = {"status": "error", "error": str(e)[:200]}
+            elapsed = time.perf_counter() - started
+            report[stage.name]["ms"] = round(elapsed * 1000, 1)
+            if self.name:
+                metrics.observe(f"{self.name}.{stage.name}", elapsed, error=report[stage.name]["status"] != "ok")
+            if on_stage is not None:
+                on_stage(stage.name, results[stage.name], report[stage.name])
+
+        # Stages are registered in dependency order, so every dependency's
+        # task exists before a dependent stage starts awaiting it.
+        for name, stage in self._stages.items():
+            tasks[name] = asyncio.create_task(execute(stage))
+
+        await asyncio.gather(*tasks.values())
+        return results, report
@@ -0,0 +1,310 @@
+"""
+Structured LLM Output
+Declared response schemas for the JSON-returning Gemini calls (pest risk,
+market prices), with:
+
+- Gemini JSON mode + response_schema requests
+- JSONArrayStream: an incremental parser that yields array items as soon
+  as each object closes, so items are validated while the response streams
+- salvage: a truncated / partly invalid array keeps its valid items
+- repair: one targeted follow-up prompt asks only for the missing items
+
+Previously any parse failure discarded the whole response.
+"""
+import json
+import re
+import threading
+from datetime import date
+
+from .gemini_pool import gemini_pool, DEFAULT_MODEL
+
+GEMINI_TYPES = {"string": "STRING", "date": "STRING", "integer": "INTEGER", "number": "NUMBER"}
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ResponseSchema:
+    """
+    An array of flat objects.
+
+    fields: {"Date": "date", "Risk Score": "integer", ...}
+    bounds: {"Risk Score": (0, 100)}; None means unbounded on that side
+    key:    field identifying an item (used to find missing items)
+    """
+
+    def __init__(self, name, fields, bounds=None, key=None, items=None):
+        self.name = name
+        self.fields = fields
+        self.bounds = bounds or {}
+        self.key = key
+        self.items = items
+
+    def to_gemini(self):
+        return {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {field: {"type": GEMINI_TYPES[kind]} for field, kind in self.fields.items()},
+                "required": list(self.fields)
+            }
+        }
+
+    def generation_config(self):
+        return {"response_mime_type": "application/json", "response_schema": self.to_gemini()}
+
+    def describe(self):
+        """Schema as shown in prompts (also used by the repair prompt)."""
+        return json.dumps({field: kind for field, kind in self.fields.items()})
+
+    def validate(self, item):
+        """Returns the item coerced to the schema, or None if it does not fit."""
+        if not isinstance(item, dict):
+            return None
+        clean = {}
+        for field, kind in self.fields.items():
+            value = item.get(field)
+            if value is None:
+                return None
+            try:
+                if kind == "integer":
+                    value = int(round(float(value)))
+                elif kind == "number":
+                    value = float(value)
+                elif kind == "date":
+                    value = str(value).strip()[:10]
+                    if not DATE_PATTERN.match(value):
+                        return None
+                else:
+                    value = str(value).strip()
+            except (TypeError, ValueError):
+                return None
+
+            low, high = self.bounds.get(field, (None, None))
+            if (low is not None and value < low) or (high is not None and value > high):
+                return None
+            clean[field] = value
+        return clean
+
+
+PEST_RISK_SCHEMA = ResponseSchema(
+    "pest_risk",
+    {"Date": "date", "Risk Score": "integer", "Condition": "string", "Pest": "string"},
+    bounds={"Risk Score": (0, 100)},
+    key="Date",
+    items=7
+)
+
+MARKET_PRICE_SCHEMA = ResponseSchema(
+    "market_prices",
+    {"Date": "date", "Price ($/lb)": "number"},
+    bounds={"Price ($/lb)": (0, None)},
+    key="Date",
+    items=7
+)
+
+
+class JSONArrayStream:
+    """
+    Incremental parser for a top-level JSON array of objects.
+
+        stream = JSONArrayStream()
+        for chunk in response:
+            for item in stream.feed(chunk.text):
+                ...
+
+    Leading prose / code fences before the '[' are skipped. Each object is
+    yielded as soon as its closing brace arrives; an unterminated trailing
+    object (truncated output) is simply never yielded.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item = None
+        self.invalid = 0
+        self.closed = False
+
+    def feed(self, text):
+        items = []
+        for char in text or "":
+            if self.closed:
+                break
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                continue
+
+            if self._item is not None:
+                self._item.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._item = [char]
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._item is not None:
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except ValueError:
+                        self.invalid += 1
+                    self._item = None
+            elif char == "]" and self._depth == 0:
+                self.closed = True
+        return items
+
+
+class StructuredOutput:
+    """Schema-constrained generation with salvage + targeted repair; per-schema counters."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        # Schemas the API rejected as response_schema; those use plain JSON mode
+        self._plain_json = set()
+
+    def _count(self, schema, outcome):
+        with self._lock:
+            stats = self._stats.setdefault(schema.name, {"calls": 0, "complete": 0, "salvaged": 0, "repaired": 0, "failed": 0})
+            stats[outcome] += 1
+
+    def _stream_items(self, schema, prompt, stage, priority, model_name):
+        """One streaming JSON-mode call; returns the valid items in arrival order."""
+        config = schema.generation_config()
+        if schema.name in self._plain_json:
+            config.pop("response_schema")
+        try:
+            response = gemini_pool.generate(prompt, model_name=model_name, stage=stage, priority=priority, generation_config=config, stream=True)
+        except (TypeError, ValueError) as e:
+            # SDK could not convert the schema: fall back to JSON mode without it
+            print(f"⚠️ response_schema for {schema.name} not accepted ({e}); using plain JSON mode")
+            self._plain_json.add(schema.name)
+            config.pop("response_schema", None)
+            response = gemini_pool.generate(prompt, model_name=model_name, stage=stage, priority=priority, generation_config=config, stream=True)
+
+        parser = JSONArrayStream()
+        valid = []
+        try:
+            for chunk in response:
+                for item in parser.feed(_chunk_text(chunk)):
+                    clean = schema.validate(item)
+                    if clean is not None:
+                        valid.append(clean)
+        except Exception as e:
+            # Stream cut off mid-response: keep the items that already arrived
+            print(f"⚠️ {schema.name} stream interrupted after {len(valid)} items: {e}")
+        return valid
+
+    def generate(self, schema, prompt, expected_keys=None, stage=None, priority="json", model_name=DEFAULT_MODEL):
+        """
+        Returns a list of schema-valid items (ordered by expected_keys when given).
+        If the first response is incomplete, one repair call asks for just the
+        missing keys; whatever is valid after that is returned.
+        """
+        self._count(schema, "calls")
+
+        items = _merge(schema, [], self._stream_items(schema, prompt, stage, priority, model_name), expected_keys)
+        missing = _missing(schema, items, expected_keys)
+        if not missing:
+            self._count(schema, "complete")
+            return _ordered(schema, items, expected_keys)
+
+        if items:
+            try:
+                repaired = self._stream_items(
+                    schema, _repair_prompt(schema, prompt, items, missing), f"{stage}.repair" if stage else None, priority, model_name
+                )
+                items = _merge(schema, items, repaired, expected_keys)
+            except Exception as e:
+                print(f"⚠️ Structured repair for {schema.name} failed: {e}")
+
+        if not _missing(schema, items, expected_keys):
+            self._count(schema, "repaired")
+        elif items:
+            self._count(schema, "salvaged")
+        else:
+            self._count(schema, "failed")
+        return _ordered(schema, items, expected_keys)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+def _chunk_text(chunk):
+    # The SDK raises ValueError for chunks without text parts (e.g. finish reasons)
+    try:
+        return chunk.text or ""
+    except (AttributeError, ValueError):
+        return ""
+
+
+def _merge(schema, items, new_items, expected_keys):
+    """Adds new items, dropping duplicate / unexpected keys."""
+    if not schema.key:
+        return items + new_items
+    seen = {item[schema.key] for item in items}
+    allowed = set(expected_keys) if expected_keys else None
+    merged = list(items)
+    for item in new_items:
+        key = item[schema.key]
+        if key in seen or (allowed is not None and key not in allowed):
+            continue
+        seen.add(key)
+        merged.append(item)
+    return merged
+
+
+def _missing(schema, items, expected_keys):
+    """Expected keys not yet present (or a count, without expected keys)."""
+    if expected_keys and schema.key:
+        present = {item[schema.key] for item in items}
+        return [key for key in expected_keys if key not in present]
+    if schema.items and len(items) < schema.items:
+        return schema.items - len(items)
+    return []
+
+
+def _ordered(schema, items, expected_keys):
+    if not (expected_keys and schema.key):
+        return items[:schema.items] if schema.items else items
+    position = {key: i for i, key in enumerate(expected_keys)}
+    return sorted(items, key=lambda item: position[item[schema.key]])
+
+
+def _repair_prompt(schema, original_prompt, items, missing):
+    if isinstance(missing, list):
+        ask = f"Return ONLY the items for these {schema.key} values: {json.dumps(missing)}."
+    else:
+        ask = f"Return ONLY {missing} additional items not already listed."
+    return f"""
+        {original_prompt}
+
+        A previous answer was incomplete. These items are already known:
+        {json.dumps(items)}
+
+        {ask}
+        Respond with a JSON ARRAY of objects with exactly these fields: {schema.describe()}
+        """
+
+
+def past_days(count, end=None):
+    """ISO dates of the `count` days ending at `end` (default today)."""
+    end = end or date.today()
+    return [date.fromordinal(end.toordinal() - offset).isoformat() for offset in range(count - 1, -1, -1)]
+
+
+# Singleton instance used by ai_engine
+structured_output = StructuredOutput()
@@ -0,0 +1,441 @@
+"""
+Open-Meteo Weather Client
+Shared keep-alive connection pool with a bounded TTL cache, usable from
+both async request handlers and synchronous service code.
+
+Lookups are snapped onto a fixed-degree grid: every farm inside the same
+cell shares one current-conditions record and one 7-day forecast.
+
+Read path: in-memory cache -> local store (ExternalWeatherLog rows written
+by the ingestion scheduler, if attached) -> Open-Meteo.
+"""
+import asyncio
+import math
+import os
+
+import httpx
+
+from .cache import TTLCache
+from .metrics import timer
+
+OPEN_METEO_FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Cache configuration (seconds / entries)
+WEATHER_CURRENT_TTL = int(os.getenv("WEATHER_CURRENT_TTL_SECONDS", "600"))
+WEATHER_FORECAST_TTL = int(os.getenv("WEATHER_FORECAST_TTL_SECONDS", "3600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+
+# Grid cell size in degrees (0.05 deg ~ 5.5 km N-S). Set to 0 to disable snapping.
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.05"))
+
+CURRENT_PARAMS = {
+    "current": "temperature_2m,relative_humidity_2m,precipitation,rain,wind_speed_10m,is_day",
+    "temperature_unit": "fahrenheit",
+    "wind_speed_unit": "mph",
+    "precipitation_unit": "inch"
+}
+
+DAILY_PARAMS = {
+    "daily": "temperature_2m_max,temperature_2m_min,relative_humidity_2m_mean,precipitation_sum",
+    "temperature_unit": "fahrenheit",
+    "precipitation_unit": "inch",
+    "wind_speed_unit": "mph",
+    "timezone": "auto"
+}
+
+# Variables requested by the ingestion scheduler (one request per cell)
+INGEST_CURRENT_VARIABLES = CURRENT_PARAMS["current"] + ",weather_code"
+INGEST_HOURLY_VARIABLES = "temperature_2m,relative_humidity_2m,rain,wind_speed_10m,is_day,weather_code"
+
+
+def grid_cell(lat, lon, cell_deg=WEATHER_GRID_DEG):
+    """
+    Returns the integer (row, col) grid cell containing a coordinate.
+    """
+    if cell_deg <= 0:
+        return (round(float(lat), 4), round(float(lon), 4))
+    return (math.floor(float(lat) / cell_deg), math.floor(float(lon) / cell_deg))
+
+
+def cell_center(cell, cell_deg=WEATHER_GRID_DEG):
+    """
+    Returns the (lat, lon) at the centre of a grid cell, rounded for the API.
+    """
+    if cell_deg <= 0:
+        return cell
+    row, col = cell
+    return (round((row + 0.5) * cell_deg, 4), round((col + 0.5) * cell_deg, 4))
+
+
+def parse_current(data):
+    """Maps an Open-Meteo `current` payload to the dashboard weather dict."""
+    current = data.get('current', {})
+    return {
+        "temperature": current.get('temperature_2m'),
+        "humidity": current.get('relative_humidity_2m'),
+        "rain": current.get('rain', 0.0),
+        "wind_speed": current.get('wind_speed_10m', 0.0),
+        "is_day": None if current.get('is_day') is None else bool(current['is_day'])
+    }
+
+
+def parse_daily(data):
+    """The Open-Meteo `daily` block ({} if missing)."""
+    return data.get('daily', {})
+
+
+# Per-lookup settings shared by the async and sync read paths
+LOOKUPS = {
+    "current": {
+        "cache": "current_cache",
+        "local": "read_current",
+        "params": CURRENT_PARAMS,
+        "timeout": "timeout",
+        "metric": "open_meteo.current",
+        "parse": parse_current,
+        "error": "Error fetching weather",
+        "empty": lambda: None
+    },
+    "daily": {
+        "cache": "forecast_cache",
+        "local": "read_daily",
+        "params": DAILY_PARAMS,
+        "timeout": "forecast_timeout",
+        "metric": "open_meteo.daily_forecast",
+        "parse": parse_daily,
+        "error": "Error forecast",
+        "empty": dict
+    }
+}
+
+
+class WeatherClient:
+    """
+    Fetches current conditions and 7-day forecasts from Open-Meteo.
+
+    - One pooled HTTP client per event loop (async) plus one for threads (sync),
+      so repeated lookups reuse keep-alive connections. Clients of event
+      loops that have since closed are closed when the next one is created.
+    - Successful responses are cached with a TTL; failures are never cached.
+    """
+
+    def __init__(self, timeout=5.0, forecast_timeout=10.0,
+                 current_ttl=WEATHER_CURRENT_TTL, forecast_ttl=WEATHER_FORECAST_TTL,
+                 cache_size=WEATHER_CACHE_SIZE, cell_deg=WEATHER_GRID_DEG, transport=None):
+        self.cell_deg = cell_deg
+        self.timeout = timeout
+        self.forecast_timeout = forecast_timeout
+        self.current_cache = TTLCache(maxsize=cache_size, ttl=current_ttl)
+        self.forecast_cache = TTLCache(maxsize=cache_size, ttl=forecast_ttl)
+        self._limits = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+        self._transport = transport  # Injectable for tests
+        self._async_clients = {}  # event loop -> httpx.AsyncClient
+        self._closing = set()  # close tasks of stale clients
+        self._sync_client = None
+        # Optional second tier with read_current(cell) / read_daily(cell)
+        self.local_store = None
+
+    # =========================================
+    # CONNECTION POOLS
+    # =========================================
+
+    def _client_kwargs(self):
+        kwargs = {"limits": self._limits}
+        if self._transport is not None:
+            kwargs["transport"] = self._transport
+        return kwargs
+
+    def _get_async_client(self):
+        # httpx pools are bound to the loop that created them
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            for stale_loop in [other for other in self._async_clients if other.is_closed()]:
+                stale = self._async_clients.pop(stale_loop)
+                task = loop.create_task(self._close_async_client(stale))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            client = httpx.AsyncClient(**self._client_kwargs())
+            self._async_clients[loop] = client
+        return client
+
+    def _get_sync_client(self):
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(**self._client_kwargs())
+        return self._sync_client
+
+    @staticmethod
+    async def _close_async_client(client):
+        try:
+            await client.aclose()
+        except Exception as e:
+            # Connections of a closed loop cannot be shut down cleanly; drop them
+            print(f"⚠️ Weather client close failed: {e}")
+
+    async def aclose(self):
+        """Closes pooled connections (called on app shutdown)."""
+        current = asyncio.get_running_loop()
+        clients, self._async_clients = self._async_clients, {}
+        for loop, client in clients.items():
+            if loop is not current and loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(self._close_async_client(client), loop)
+                await asyncio.wrap_future(future)
+            else:
+                await self._close_async_client(client)
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    # =========================================
+    # CACHE KEYS
+    # =========================================
+
+    def cache_key(self, lat, lon):
+        """Grid cell shared by every coordinate that snaps onto it."""
+        return grid_cell(lat, lon, self.cell_deg)
+
+    def _query_point(self, key):
+        # Always query the cell centre so a cell's data does not depend on
+        # which farm happened to miss the cache first.
+        return cell_center(key, self.cell_deg)
+
+    def _read_local_sync(self, method, key):
+        if self.local_store is None:
+            return None
+        try:
+            return getattr(self.local_store, method)(key)
+        except Exception as e:
+            print(f"⚠️ Local weather read failed: {e}")
+            return None
+
+    async def _read_local(self, method, key):
+        if self.local_store is None:
+            return None
+        return await asyncio.to_thread(self._read_local_sync, method, key)
+
+    # =========================================
+    # LOOKUPS (cache -> local store -> Open-Meteo)
+    # =========================================
+
+    def _result(self, kind, value):
+        if not value:
+            return LOOKUPS[kind]["empty"]()
+        # Current conditions are mutated by callers; hand out copies
+        return dict(value) if kind == "current" else value
+
+    def _remember(self, kind, key, value):
+        if value:
+            getattr(self, LOOKUPS[kind]["cache"]).set(key, value)
+        return self._result(kind, value)
+
+    def _request(self, kind, key):
+        lookup = LOOKUPS[kind]
+        q_lat, q_lon = self._query_point(key)
+        params = {"latitude": q_lat, "longitude": q_lon, **lookup["params"]}
+        return params, getattr(self, lookup["timeout"])
+
+    async def _lookup(self, kind, lat, lon):
+        lookup = LOOKUPS[kind]
+        key = self.cache_key(lat, lon)
+        cached = getattr(self, lookup["cache"]).get(key)
+        if cached is not None:
+            return self._result(kind, cached)
+
+        local = await self._read_local(lookup["local"], key)
+        if local:
+            return self._remember(kind, key, local)
+
+        params, timeout = self._request(kind, key)
+        try:
+            with timer(lookup["metric"]):
+                response = await self._get_async_client().get(
+                    OPEN_METEO_FORECAST_URL, params=params, timeout=timeout
+                )
+                response.raise_for_status()
+            value = lookup["parse"](response.json())
+        except Exception as e:
+            print(f"{lookup['error']}: {e}")
+            # STRICT REAL DATA POLICY: Return nothing on failure, do not fake data
+            return self._result(kind, None)
+        return self._remember(kind, key, value)
+
+    def _lookup_sync(self, kind, lat, lon):
+        lookup = LOOKUPS[kind]
+        key = self.cache_key(lat, lon)
+        cached = getattr(self, lookup["cache"]).get(key)
+        if cached is not None:
+            return self._result(kind, cached)
+
+        local = self._read_local_sync(lookup["local"], key)
+        if local:
+            return self._remember(kind, key, local)
+
+        params, timeout = self._request(kind, key)
+        try:
+            with timer(lookup["metric"]):
+                response = self._get_sync_client().get(
+                    OPEN_METEO_FORECAST_URL, params=params, timeout=timeout
+                )
+                response.raise_for_status()
+            value = lookup["parse"](response.json())
+        except Exception as e:
+            print(f"{lookup['error']}: {e}")
+            return self._result(kind, None)
+        return self._remember(kind, key, value)
+
+    async def get_current(self, lat, lon):
+        """Returns current weather (imperial units) or None on failure."""
+        return await self._lookup("current", lat, lon)
+
+    def get_current_sync(self, lat, lon):
+        """Blocking variant of get_current for threadpool callers."""
+        return self._lookup_sync("current", lat, lon)
+
+    async def get_daily_forecast(self, lat, lon):
+        """Returns the Open-Meteo `daily` block, or {} on failure."""
+        return await self._lookup("daily", lat, lon)
+
+    def get_daily_forecast_sync(self, lat, lon):
+        """Blocking variant of get_daily_forecast for threadpool callers."""
+        return self._lookup_sync("daily", lat, lon)
+
+    # =========================================
+    # INGESTION
+    # =========================================
+
+    async def fetch_cell(self, key, include_forecast=True, forecast_days=7):
+        """
+        Uncached single request for one grid cell: current conditions plus,
+        optionally, hourly and daily forecasts. Used by the ingestion
+        scheduler; primes the in-memory caches on success.
+
+        Returns the raw Open-Meteo JSON, or None on failure.
+        """
+        q_lat, q_lon = self._query_point(key)
+        params = {
+            "latitude": q_lat,
+            "longitude": q_lon,
+            "current": INGEST_CURRENT_VARIABLES,
+            "temperature_unit": "fahrenheit",
+            "wind_speed_unit": "mph",
+            "precipitation_unit": "inch",
+            "timezone": "auto"
+        }
+        if include_forecast:
+            params["hourly"] = INGEST_HOURLY_VARIABLES
+            params["daily"] = DAILY_PARAMS["daily"]
+            params["forecast_days"] = forecast_days
+
+        try:
+            with timer("open_meteo.ingest"):
+                response = await self._get_async_client().get(
+                    OPEN_METEO_FORECAST_URL, params=params, timeout=self.forecast_timeout
+                )
+                response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            print(f"Error ingesting weather for cell {key}: {e}")
+            return None
+
+        self.current_cache.set(key, parse_current(data))
+        if include_forecast and data.get('daily'):
+            self.forecast_cache.set(key, data['daily'])
+        return data
+
+    # =========================================
+    # PRE-WARMING
+    # =========================================
+
+    async def prewarm(self, coordinates, include_forecast=True, concurrency=8):
+        """
+        Fetches every distinct grid cell covering `coordinates` into the cache.
+
+        Args:
+            coordinates: iterable of (lat, lon) pairs (None values are skipped)
+            include_forecast: also warm the 7-day forecast per cell
+            concurrency: max simultaneous outbound requests
+
+        Returns:
+            dict: farm / cell counts and how many cells failed to load
+        """
+        cells, farms = self.group_by_cell(coordinates)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(lat, lon):
+            async with semaphore:
+                current = await self.get_current(lat, lon)
+                if include_forecast:
+                    await self.get_daily_forecast(lat, lon)
+                return current is not None
+
+        results = await asyncio.gather(*(warm(lat, lon) for lat, lon in cells.values()))
+        return {
+            "farms": farms,
+            "cells": len(cells),
+            "failed_cells": results.count(False),
+            "cell_deg": self.cell_deg
+        }
+
+    def group_by_cell(self, coordinates):
+        """
+        Maps each distinct grid cell to one representative (lat, lon).
+        Returns (cells, point_count); points with a None coordinate are skipped.
+        """
+        cells = {}
+        points = 0
+        for lat, lon in coordinates:
+            if lat is None or lon is None:
+                continue
+            points += 1
+            cells.setdefault(self.cache_key(lat, lon), (lat, lon))
+        return cells, points
+
+    async def get_current_many(self, coordinates, concurrency=8):
+        """
+        Current weather for many points with one lookup per grid cell.
+        Returns {cell_key: weather or None}; map a point with cache_key(lat, lon).
+        """
+        cells, _ = self.group_by_cell(coordinates)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(lat, lon):
+            async with semaphore:
+                return await self.get_current(lat, lon)
+
+        results = await asyncio.gather(*(fetch(lat, lon) for lat, lon in cells.values()))
+        return dict(zip(cells.keys(), results))
+
+    def stats(self):
+        return {
+            "cell_deg": self.cell_deg,
+            "current": self.current_cache.stats(),
+            "forecast": self.forecast_cache.stats()
+        }
+
+
+def farm_coordinates():
+    """Distinct (lat, lon) of every farm with stored coordinates (blocking DB read)."""
+    from app.core.database import SessionLocal, User
+
+    db = SessionLocal()
+    try:
+        rows = db.query(User.latitude, User.longitude).filter(
+            User.latitude.isnot(None),
+            User.longitude.isnot(None)
+        ).distinct().all()
+    finally:
+        db.close()
+    return [(row.latitude, row.longitude) for row in rows]
+
+
+async def prewarm_registered_farms(include_forecast=True):
+    """
+    Pre-warms the weather grid for every farm with stored coordinates.
+    The farm query runs in a worker thread, off the event loop.
+    """
+    coordinates = await asyncio.to_thread(farm_coordinates)
+    return await weather_client.prewarm(coordinates, include_forecast=include_forecast)
+
+
+# Singleton instance shared by the API layer
+weather_client = WeatherClient()
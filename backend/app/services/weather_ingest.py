@@ -0,0 +1,440 @@
+"""
+Scheduled Weather Ingestion
+Polls current conditions (and, less often, hourly + daily forecasts) for
+every distinct farm grid cell and bulk-inserts them into ExternalWeatherLog.
+
+While fresh, the stored rows are also the second cache tier of the weather
+client, so dashboard, pest-forecast and calibration reads stay local. The
+rows accumulate into the weather history used by the learning loop.
+
+Exactly one process should poll. Every app process may start the
+scheduler, but only the holder of an exclusive lock on
+WEATHER_INGEST_LOCK_FILE ingests; the others only serve local reads and
+take over if the leader exits. The lock file only coordinates processes
+on one host: with several instances, set WEATHER_INGEST_ENABLED=true on
+exactly one of them.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, single-process development only
+    fcntl = None
+
+from .weather_client import farm_coordinates, weather_client
+
+WEATHER_INGEST_ENABLED = os.getenv("WEATHER_INGEST_ENABLED", "true").lower() != "false"
+# Leader lock shared by the worker processes of one host
+WEATHER_INGEST_LOCK_FILE = os.getenv(
+    "WEATHER_INGEST_LOCK_FILE", os.path.join(tempfile.gettempdir(), "smartfarm_weather_ingest.lock")
+)
+WEATHER_INGEST_INTERVAL = int(os.getenv("WEATHER_INGEST_INTERVAL_SECONDS", "900"))
+WEATHER_FORECAST_INGEST_INTERVAL = int(os.getenv("WEATHER_FORECAST_INGEST_INTERVAL_SECONDS", "3600"))
+WEATHER_INGEST_CONCURRENCY = int(os.getenv("WEATHER_INGEST_CONCURRENCY", "8"))
+WEATHER_FORECAST_DAYS = int(os.getenv("WEATHER_FORECAST_DAYS", "7"))
+
+# Freshness checks: older rows are ignored and reads fall through to the live API
+WEATHER_LOG_MAX_AGE = int(os.getenv("WEATHER_LOG_MAX_AGE_SECONDS", "1800"))
+WEATHER_FORECAST_LOG_MAX_AGE = int(os.getenv("WEATHER_FORECAST_LOG_MAX_AGE_SECONDS", "10800"))
+
+# WMO weather interpretation codes -> coarse condition
+WMO_CONDITIONS = [
+    ((0, 1), "Clear"),
+    ((2, 3), "Cloudy"),
+    ((45, 48), "Fog"),
+    ((51, 57), "Drizzle"),
+    ((61, 67), "Rain"),
+    ((71, 77), "Snow"),
+    ((80, 82), "Rain"),
+    ((85, 86), "Snow"),
+    ((95, 99), "Thunderstorm")
+]
+
+
+def wmo_condition(code):
+    if code is None:
+        return None
+    for (low, high), condition in WMO_CONDITIONS:
+        if low <= code <= high:
+            return condition
+    return None
+
+
+def cell_id(key):
+    """String id of a weather grid cell, as stored in ExternalWeatherLog.cell."""
+    return f"{key[0]}:{key[1]}"
+
+
+def _to_utc(value, utc_offset_seconds):
+    # Open-Meteo returns local ISO times when timezone=auto
+    return datetime.fromisoformat(value) - timedelta(seconds=utc_offset_seconds or 0)
+
+
+def _bool(value):
+    return None if value is None else bool(value)
+
+
+def build_rows(key, data, fetched_at):
+    """
+    Converts one Open-Meteo response into ExternalWeatherLog row dicts.
+    Daily rows keep the local calendar date as their timestamp.
+    """
+    offset = data.get("utc_offset_seconds", 0)
+    location = f"{data.get('latitude')},{data.get('longitude')}"
+    base = {
+        "location": location,
+        "cell": cell_id(key),
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "fetched_at": fetched_at
+    }
+    rows = []
+
+    current = data.get("current")
+    if current and current.get("time"):
+        rows.append({
+            **base,
+            "kind": "current",
+            "timestamp": _to_utc(current["time"], offset),
+            "temp_out": current.get("temperature_2m"),
+            "humi_out": current.get("relative_humidity_2m"),
+            "rain": current.get("rain"),
+            "wind_speed": current.get("wind_speed_10m"),
+            "is_day": _bool(current.get("is_day")),
+            "condition": wmo_condition(current.get("weather_code"))
+        })
+
+    hourly = data.get("hourly") or {}
+    for i, valid_at in enumerate(hourly.get("time", [])):
+        rows.append({
+            **base,
+            "kind": "hourly",
+            "timestamp": _to_utc(valid_at, offset),
+            "temp_out": hourly["temperature_2m"][i],
+            "humi_out": hourly["relative_humidity_2m"][i],
+            "rain": hourly["rain"][i],
+            "wind_speed": hourly["wind_speed_10m"][i],
+            "is_day": _bool(hourly["is_day"][i]),
+            "condition": wmo_condition(hourly["weather_code"][i])
+        })
+
+    daily = data.get("daily") or {}
+    for i, day in enumerate(daily.get("time", [])):
+        rows.append({
+            **base,
+            "kind": "daily",
+            "timestamp": datetime.fromisoformat(day),
+            "temp_out": daily["temperature_2m_max"][i],
+            "temp_min": daily["temperature_2m_min"][i],
+            "humi_out": daily["relative_humidity_2m_mean"][i],
+            "rain": daily["precipitation_sum"][i]
+        })
+    return rows
+
+
+class WeatherIngestor:
+    """
+    Background poller for farm weather cells.
+
+    - run_once(): one ingestion pass (also callable from the admin API)
+    - start()/stop(): periodic asyncio task, started with the app; it only
+      ingests while this process holds the leader lock
+    - read_current()/read_daily()/read_hourly(): freshness-checked local reads;
+      the first two make this object usable as WeatherClient.local_store
+    """
+
+    def __init__(self, client=weather_client, interval=WEATHER_INGEST_INTERVAL,
+                 forecast_interval=WEATHER_FORECAST_INGEST_INTERVAL,
+                 concurrency=WEATHER_INGEST_CONCURRENCY,
+                 max_age=WEATHER_LOG_MAX_AGE, forecast_max_age=WEATHER_FORECAST_LOG_MAX_AGE,
+                 lock_file=WEATHER_INGEST_LOCK_FILE):
+        self.client = client
+        self.interval = interval
+        self.forecast_interval = forecast_interval
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.forecast_max_age = forecast_max_age
+        self.lock_file = lock_file
+        self._lock_handle = None  # open lock file while this process is the leader
+        self._task = None
+        self._last_forecast = None  # monotonic time of the last forecast pass
+        self.runs = 0
+        self.last_result = None
+
+    # =========================================
+    # INGESTION
+    # =========================================
+
+    def farm_cells(self):
+        """Distinct weather cells covering every farm with stored coordinates."""
+        return self.client.group_by_cell(farm_coordinates())
+
+    def forecast_due(self):
+        return self._last_forecast is None or time.monotonic() - self._last_forecast >= self.forecast_interval
+
+    async def run_once(self, include_forecast=None):
+        """
+        Fetches every farm cell (one request per cell) and stores the rows.
+        Forecasts are included when due unless include_forecast is given.
+        """
+        if include_forecast is None:
+            include_forecast = self.forecast_due()
+
+        started = time.perf_counter()
+        cells, farms = await asyncio.to_thread(self.farm_cells)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(key):
+            async with semaphore:
+                return key, await self.client.fetch_cell(
+                    key, include_forecast=include_forecast, forecast_days=WEATHER_FORECAST_DAYS
+                )
+
+        responses = await asyncio.gather(*(fetch(key) for key in cells))
+
+        fetched_at = datetime.utcnow()
+        rows = []
+        failed = 0
+        for key, data in responses:
+            if data is None:
+                failed += 1
+                continue
+            rows.extend(build_rows(key, data, fetched_at))
+
+        stored = await asyncio.to_thread(self.store, rows)
+        if include_forecast and failed < len(cells):
+            self._last_forecast = time.monotonic()
+
+        self.runs += 1
+        self.last_result = {
+            "farms": farms,
+            "cells": len(cells),
+            "failed_cells": failed,
+            "rows_inserted": stored,
+            "included_forecast": include_forecast,
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": fetched_at.isoformat()
+        }
+        return self.last_result
+
+    def store(self, rows):
+        """
+        Bulk-inserts rows in one transaction. Forecast rows replace the
+        cell's previously stored forecast from the same start time onward;
+        current rows already stored for the same observation time are skipped.
+        """
+        if not rows:
+            return 0
+        from app.core.database import SessionLocal, ExternalWeatherLog
+
+        db = SessionLocal()
+        try:
+            for kind in ("hourly", "daily"):
+                forecast = [row for row in rows if row["kind"] == kind]
+                if forecast:
+                    db.query(ExternalWeatherLog).filter(
+                        ExternalWeatherLog.kind == kind,
+                        ExternalWeatherLog.cell.in_({row["cell"] for row in forecast}),
+                        ExternalWeatherLog.timestamp >= min(row["timestamp"] for row in forecast)
+                    ).delete(synchronize_session=False)
+
+            current = [row for row in rows if row["kind"] == "current"]
+            if current:
+                existing = set(db.query(ExternalWeatherLog.cell, ExternalWeatherLog.timestamp).filter(
+                    ExternalWeatherLog.kind == "current",
+                    ExternalWeatherLog.cell.in_({row["cell"] for row in current}),
+                    ExternalWeatherLog.timestamp.in_({row["timestamp"] for row in current})
+                ).all())
+                rows = [
+                    row for row in rows
+                    if row["kind"] != "current" or (row["cell"], row["timestamp"]) not in existing
+                ]
+
+            db.bulk_insert_mappings(ExternalWeatherLog, rows)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # =========================================
+    # LEADER LOCK
+    # =========================================
+
+    def acquire_leadership(self):
+        """
+        Non-blocking exclusive lock on the lock file. Returns True while this
+        process is the ingestion leader. The OS releases the lock if the
+        process dies, so a follower takes over on its next attempt.
+        """
+        if self._lock_handle is not None:
+            return True
+        if fcntl is None or not self.lock_file:
+            self._lock_handle = True
+            return True
+        handle = open(self.lock_file, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_handle = handle
+        return True
+
+    def release_leadership(self):
+        handle, self._lock_handle = self._lock_handle, None
+        if handle is not None and handle is not True:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    @property
+    def is_leader(self):
+        return self._lock_handle is not None
+
+    # =========================================
+    # SCHEDULER
+    # =========================================
+
+    async def _loop(self):
+        while True:
+            if not self.acquire_leadership():
+                # Another process is ingesting; retry in case it exits
+                await asyncio.sleep(self.interval)
+                continue
+            try:
+                result = await self.run_once()
+                print(f"🌦️ Weather ingest: {result['cells']} cell(s), {result['rows_inserted']} row(s) in {result['seconds']}s")
+            except Exception as e:
+                print(f"⚠️ Weather ingest failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Starts the periodic task and serves client reads from the stored rows."""
+        self.client.local_store = self
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.release_leadership()
+
+    # =========================================
+    # LOCAL READS (freshness-checked)
+    # =========================================
+
+    def read_current(self, key):
+        """Latest stored current conditions for a cell, or None if stale/missing."""
+        from app.core.database import SessionLocal, ExternalWeatherLog
+
+        db = SessionLocal()
+        try:
+            row = db.query(ExternalWeatherLog).filter(
+                ExternalWeatherLog.cell == cell_id(key),
+                ExternalWeatherLog.kind == "current",
+                ExternalWeatherLog.fetched_at >= datetime.utcnow() - timedelta(seconds=self.max_age)
+            ).order_by(ExternalWeatherLog.timestamp.desc()).first()
+        finally:
+            db.close()
+
+        if row is None:
+            return None
+        return {
+            "temperature": row.temp_out,
+            "humidity": row.humi_out,
+            "rain": row.rain if row.rain is not None else 0.0,
+            "wind_speed": row.wind_speed if row.wind_speed is not None else 0.0,
+            "is_day": row.is_day
+        }
+
+    def read_daily(self, key):
+        """
+        Latest stored daily forecast for a cell in Open-Meteo `daily` format
+        (as returned by get_daily_forecast), or None if stale/missing.
+        """
+        from sqlalchemy import func
+        from app.core.database import SessionLocal, ExternalWeatherLog
+
+        db = SessionLocal()
+        try:
+            latest = db.query(func.max(ExternalWeatherLog.fetched_at)).filter(
+                ExternalWeatherLog.cell == cell_id(key),
+                ExternalWeatherLog.kind == "daily"
+            ).scalar()
+            if latest is None or latest < datetime.utcnow() - timedelta(seconds=self.forecast_max_age):
+                return None
+
+            # Only the newest pass, so the days line up with a live API response
+            rows = db.query(ExternalWeatherLog).filter(
+                ExternalWeatherLog.cell == cell_id(key),
+                ExternalWeatherLog.kind == "daily",
+                ExternalWeatherLog.fetched_at == latest
+            ).order_by(ExternalWeatherLog.timestamp).all()
+        finally:
+            db.close()
+
+        if not rows:
+            return None
+        return {
+            "time": [row.timestamp.date().isoformat() for row in rows],
+            "temperature_2m_max": [row.temp_out for row in rows],
+            "temperature_2m_min": [row.temp_min for row in rows],
+            "relative_humidity_2m_mean": [row.humi_out for row in rows],
+            "precipitation_sum": [row.rain for row in rows]
+        }
+
+    def read_hourly(self, key, start=None, hours=48):
+        """Stored hourly forecast rows (dicts) for a cell, starting at `start` (UTC)."""
+        from app.core.database import SessionLocal, ExternalWeatherLog
+
+        start = start or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        db = SessionLocal()
+        try:
+            rows = db.query(ExternalWeatherLog).filter(
+                ExternalWeatherLog.cell == cell_id(key),
+                ExternalWeatherLog.kind == "hourly",
+                ExternalWeatherLog.timestamp >= start,
+                ExternalWeatherLog.timestamp < start + timedelta(hours=hours),
+                ExternalWeatherLog.fetched_at >= datetime.utcnow() - timedelta(seconds=self.forecast_max_age)
+            ).order_by(ExternalWeatherLog.timestamp).all()
+        finally:
+            db.close()
+
+        return [
+            {
+                "timestamp": row.timestamp,
+                "temperature": row.temp_out,
+                "humidity": row.humi_out,
+                "rain": row.rain,
+                "wind_speed": row.wind_speed,
+                "is_day": row.is_day,
+                "condition": row.condition
+            }
+            for row in rows
+        ]
+
+    def stats(self):
+        return {
+            "enabled": WEATHER_INGEST_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "leader": self.is_leader,
+            "interval_seconds": self.interval,
+            "forecast_interval_seconds": self.forecast_interval,
+            "runs": self.runs,
+            "last_result": self.last_result
+        }
+
+
+# Singleton instance started by app.main on startup
+weather_ingestor = WeatherIngestor()
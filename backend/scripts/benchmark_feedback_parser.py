@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: deterministic voice feedback parser
+
+Measures accuracy and throughput of app.services.feedback_parser on the
+labeled corpus (tests/data/feedback_corpus.jsonl). Each row is
+{"text": ..., "label": {"feedback_type", "feedback_value"} | "llm"}, where
+"llm" means the rules must NOT decide the text (it falls through to Gemini).
+
+Usage:
+    python scripts/benchmark_feedback_parser.py [--corpus PATH] [--rounds 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.feedback_parser import parse_feedback
+
+DEFAULT_CORPUS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "data", "feedback_corpus.jsonl"
+)
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def evaluate(corpus):
+    stats = {"decided_ok": 0, "decided_wrong": 0, "missed": 0, "fallthrough_ok": 0, "false_decision": 0}
+    errors = []
+    for row in corpus:
+        result = parse_feedback(row["text"])
+        label = row["label"]
+        if label == "llm":
+            key = "fallthrough_ok" if result is None else "false_decision"
+        elif result is None:
+            key = "missed"
+        elif (result["feedback_type"], result["feedback_value"]) == (label["feedback_type"], label["feedback_value"]):
+            key = "decided_ok"
+        else:
+            key = "decided_wrong"
+        stats[key] += 1
+        if key not in ("decided_ok", "fallthrough_ok"):
+            errors.append((key, row["text"], label, result))
+    return stats, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=200, help="passes over the corpus for the throughput run")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    stats, errors = evaluate(corpus)
+
+    decidable = sum(1 for row in corpus if row["label"] != "llm")
+    decided = stats["decided_ok"] + stats["decided_wrong"] + stats["false_decision"]
+    correct = stats["decided_ok"] + stats["fallthrough_ok"]
+
+    texts = [row["text"] for row in corpus]
+    started = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in texts:
+            parse_feedback(text)
+    elapsed = time.perf_counter() - started
+    calls = args.rounds * len(texts)
+
+    print(f"📋 Corpus: {len(corpus)} texts ({decidable} rule-decidable)")
+    print(f"✅ Accuracy: {correct / len(corpus):.1%}")
+    print(f"   Precision (rule answers correct): {stats['decided_ok'] / decided:.1%}" if decided else "   Precision: n/a")
+    print(f"   Coverage (decidable texts answered): {stats['decided_ok'] / decidable:.1%}" if decidable else "   Coverage: n/a")
+    print(f"   LLM calls avoided: {decided} / {len(corpus)}")
+    print(f"⚡ Throughput: {calls / elapsed:,.0f} texts/s ({elapsed / calls * 1e6:.1f} µs/text)")
+
+    for key, text, label, result in errors:
+        print(f"❌ {key}: {text!r} expected={label} got={result}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark: scalar vs vectorized VPD
+
+Times app.services.psychrometrics.vpd in a per-row Python loop (how the
+reports / sensors endpoints used to compute VPD) against one vpd_array
+call over the same synthetic sensor rows (Fahrenheit, % RH), and checks
+that both agree.
+
+Usage:
+    python scripts/benchmark_psychrometrics.py [--rows 1000000] [--seed 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import psychrometrics
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    temps = rng.uniform(20, 110, args.rows)
+    humidity = rng.uniform(5, 100, args.rows)
+    temp_list, humidity_list = temps.tolist(), humidity.tolist()
+
+    scalar, scalar_elapsed = timed(
+        lambda: [psychrometrics.vpd(t, h, unit="F") for t, h in zip(temp_list, humidity_list)]
+    )
+    vector, vector_elapsed = timed(lambda: psychrometrics.vpd_array(temps, humidity, unit="F"))
+    max_diff = float(np.max(np.abs(np.asarray(scalar) - vector)))
+
+    print(f"📋 Rows: {args.rows:,}")
+    print(f"🐢 Scalar loop:  {scalar_elapsed:.3f}s ({args.rows / scalar_elapsed:,.0f} rows/s)")
+    print(f"⚡ vpd_array:    {vector_elapsed:.3f}s ({args.rows / vector_elapsed:,.0f} rows/s)")
+    print(f"   Speedup: {scalar_elapsed / vector_elapsed:.1f}x")
+    print(f"{'✅' if max_diff < 1e-9 else '❌'} Max |scalar - vector|: {max_diff:.2e} kPa")
+    return 0 if max_diff < 1e-9 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
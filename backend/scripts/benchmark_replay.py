@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end API throughput with replayed LLM calls
+
+Runs the FastAPI app in-process (httpx ASGI transport). The database,
+caches, physics, safety filter, scheduler, job queue and routing all run
+for real; only Gemini is replaced by fixtures from app.services.llm_replay.
+
+1. Record fixtures once (needs GEMINI_API_KEY and network):
+    python scripts/benchmark_replay.py --record --requests 20
+
+2. Replay offline, as often as needed:
+    python scripts/benchmark_replay.py --requests 500 --concurrency 32
+    python scripts/benchmark_replay.py --latency lognormal:1.2:0.5 --endpoints dashboard
+
+Use --synthetic-weather to seed the weather caches with generated
+conditions instead of calling Open-Meteo (fully offline runs).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = ("dashboard", "pest", "market")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="call Gemini live and append fixtures")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--farms", type=int, default=None, help="distinct farm ids (default: one per request)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=f"comma-separated subset of {ENDPOINTS}")
+    parser.add_argument("--crop", default="Tomatoes")
+    parser.add_argument("--latency", default="recorded", help="replay latency: recorded | none | fixed:S | lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--fixtures", default=None, help="fixture store (default: LLM_FIXTURES_PATH)")
+    parser.add_argument("--synthetic-weather", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def configure_environment(args):
+    """Must run before any app module is imported (settings are read at import)."""
+    os.environ["LLM_REPLAY_MODE"] = "record" if args.record else "replay"
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    os.environ["LLM_REPLAY_SEED"] = str(args.seed)
+    # Replayed runs must never reach a live provider through failover / hedging
+    os.environ["LLM_PROVIDERS"] = "gemini"
+    if args.fixtures:
+        os.environ["LLM_FIXTURES_PATH"] = args.fixtures
+    if not args.record:
+        os.environ.setdefault("GEMINI_API_KEY", "replay")
+        # Replayed calls spend no quota; free-tier default budgets would only measure the throttle
+        os.environ.setdefault("LLM_BUDGETS", json.dumps({
+            model: {"rpm": 1000000, "tpm": 1000000000} for model in ("gemini-2.5-flash", "gemini-2.5-pro")
+        }))
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'forhuman_benchmark.db')}")
+    os.environ.setdefault("WEATHER_INGEST_ENABLED", "false")
+
+def farm_coordinates(count, rng):
+    """Farms spread over the US so they land on different weather cells."""
+    return [(round(rng.uniform(30.0, 45.0), 4), round(rng.uniform(-120.0, -80.0), 4)) for _ in range(count)]
+
+def seed_weather(weather_client, coordinates, rng):
+    from datetime import date, timedelta
+
+    for lat, lon in coordinates:
+        key = weather_client.cache_key(lat, lon)
+        weather_client.current_cache.set(key, {
+            "temperature": round(rng.uniform(55, 95), 1),
+            "humidity": round(rng.uniform(30, 90), 1),
+            "rain": round(rng.choice([0.0, 0.0, 0.0, 0.05, 0.2]), 2),
+            "wind_speed": round(rng.uniform(0, 15), 1)
+        })
+        weather_client.forecast_cache.set(key, {
+            "time": [(date.today() + timedelta(days=i)).isoformat() for i in range(7)],
+            "temperature_2m_max": [round(rng.uniform(65, 95), 1) for _ in range(7)],
+            "temperature_2m_min": [round(rng.uniform(45, 65), 1) for _ in range(7)],
+            "relative_humidity_2m_mean": [round(rng.uniform(40, 90), 1) for _ in range(7)],
+            "precipitation_sum": [round(rng.choice([0.0, 0.0, 0.1, 0.4]), 2) for _ in range(7)]
+        })
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+async def run(args):
+    import httpx
+    from app.main import app
+    from app.core.database import init_db
+    from app.services.weather_client import weather_client
+    from app.services.llm_replay import replay_store
+    from app.services.gemini_pool import gemini_pool
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    init_db()
+    rng = random.Random(args.seed)
+    farms = farm_coordinates(args.farms or args.requests, rng)
+    if args.synthetic_weather:
+        seed_weather(weather_client, farms, rng)
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip() in ENDPOINTS]
+    plan = []
+    for i in range(args.requests):
+        endpoint = endpoints[i % len(endpoints)]
+        farm = i % len(farms)
+        lat, lon = farms[farm]
+        if endpoint == "dashboard":
+            plan.append((endpoint, "/api/dashboard", {"lat": lat, "lon": lon, "crop_type": args.crop}, {"X-Farm-ID": f"bench-farm-{farm}"}))
+        elif endpoint == "pest":
+            plan.append((endpoint, "/api/pest/forecast", {"lat": lat, "lon": lon, "crop_type": args.crop}, {}))
+        else:
+            plan.append((endpoint, "/api/market/prices", {"crop_type": args.crop}, {}))
+
+    latencies = {name: [] for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+    sources = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120.0) as client:
+        async def call(endpoint, path, params, headers):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params, headers=headers)
+                    ok = response.status_code == 200
+                    body = response.json() if ok else {}
+                except Exception as e:
+                    print(f"❌ {endpoint}: {e}")
+                    ok, body = False, {}
+                latencies[endpoint].append(time.perf_counter() - started)
+                if not ok:
+                    errors[endpoint] += 1
+                source = (body.get("ai_meta") or {}).get("source")
+                if source:
+                    sources[source] = sources.get(source, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call(*request) for request in plan))
+        elapsed = time.perf_counter() - started
+
+    mode = "RECORD" if args.record else f"REPLAY (latency={args.latency})"
+    print(f"\n📊 {mode}: {args.requests} requests, concurrency {args.concurrency}, {len(farms)} farms")
+    print(f"⚡ Throughput: {args.requests / elapsed:.1f} req/s over {elapsed:.2f}s")
+    for name in endpoints:
+        samples = latencies[name]
+        if samples:
+            print(
+                f"   {name:<10} n={len(samples):<5} errors={errors[name]:<3} "
+                f"p50={percentile(samples, 50) * 1000:7.1f}ms p95={percentile(samples, 95) * 1000:7.1f}ms "
+                f"p99={percentile(samples, 99) * 1000:7.1f}ms"
+            )
+    if sources:
+        print(f"   Prescription sources: {sources}")
+    print(f"🎞️ Fixtures: {replay_store.stats()}")
+    print(f"🤖 Gemini: {gemini_pool.stats()['models']}")
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Build / refresh the local gazetteer index from a GeoNames dump.
+
+Usage:
+    python scripts/build_gazetteer.py cities15000.txt [--admin1 admin1CodesASCII.txt] [--countries countryInfo.txt]
+
+Download the files from https://download.geonames.org/export/dump/
+The index is written to GAZETTEER_PATH (default: backend/gazetteer.db).
+Existing rows are replaced by id, so the script can be re-run safely.
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.gazetteer import gazetteer
+
+csv.field_size_limit(sys.maxsize)
+
+def load_admin1_names(path):
+    """admin1CodesASCII.txt: 'US.CA<TAB>California<TAB>...'"""
+    names = {}
+    if not path:
+        return names
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) >= 2:
+                names[row[0]] = row[1]
+    return names
+
+def load_country_names(path):
+    """countryInfo.txt: ISO code in column 0, country name in column 4"""
+    names = {}
+    if not path:
+        return names
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if not row or row[0].startswith("#") or len(row) < 5:
+                continue
+            names[row[0]] = row[4]
+    return names
+
+def iter_cities(path, admin1_names, country_names):
+    """GeoNames main table: see readme.txt in the dump directory"""
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) < 15:
+                continue
+            country_code = row[8]
+            yield {
+                "id": int(row[0]),
+                "name": row[1],
+                "latitude": float(row[4]),
+                "longitude": float(row[5]),
+                "country_code": country_code,
+                "country": country_names.get(country_code, ""),
+                "admin1": admin1_names.get(f"{country_code}.{row[10]}", ""),
+                "population": int(row[14] or 0)
+            }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the local gazetteer index")
+    parser.add_argument("cities", help="GeoNames cities file (e.g. cities15000.txt)")
+    parser.add_argument("--admin1", help="admin1CodesASCII.txt for state/province names")
+    parser.add_argument("--countries", help="countryInfo.txt for country names")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.time()
+    admin1_names = load_admin1_names(args.admin1)
+    country_names = load_country_names(args.countries)
+
+    print(f"🔄 Importing {args.cities} into {gazetteer.path}")
+    batch = []
+    total = 0
+    for city in iter_cities(args.cities, admin1_names, country_names):
+        batch.append(city)
+        if len(batch) >= args.batch_size:
+            total += gazetteer.add_results(batch)
+            batch = []
+    total += gazetteer.add_results(batch)
+
+    print(f"✅ Imported {total} cities in {time.time() - started:.1f}s ({gazetteer.count()} in index)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Database Migration: Physics Calibration Columns
+Adds the parameters fitted by the least-squares calibration job
+(ventilation_score, solar_gain) and its bookkeeping columns to
+farm_physics_profiles.
+
+Safe to re-run: existing columns are skipped.
+Works on both PostgreSQL and SQLite.
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app.core.database import engine, Base, FarmPhysicsProfile
+
+NEW_COLUMNS = {
+    "ventilation_score": "FLOAT DEFAULT 0.7",
+    "solar_gain": "FLOAT DEFAULT 5.0",
+    "calibration_samples": "INTEGER",
+    "calibration_rmse": "FLOAT",
+    "calibrated_at": "TIMESTAMP"
+}
+
+def migrate_physics_calibration():
+    """Add calibration columns to farm_physics_profiles"""
+    print("🔄 Starting database migration...")
+    print("=" * 60)
+
+    try:
+        inspector = inspect(engine)
+        if not inspector.has_table("farm_physics_profiles"):
+            # Fresh database: create the table with the full schema
+            Base.metadata.create_all(bind=engine, tables=[FarmPhysicsProfile.__table__])
+            print("✅ Created farm_physics_profiles")
+            return True
+
+        columns = {col["name"] for col in inspector.get_columns("farm_physics_profiles")}
+
+        with engine.begin() as conn:
+            for col_name, col_type in NEW_COLUMNS.items():
+                if col_name in columns:
+                    print(f"⏭️  Column already exists: {col_name}")
+                    continue
+                conn.execute(text(f"ALTER TABLE farm_physics_profiles ADD COLUMN {col_name} {col_type}"))
+                print(f"✅ Added column: {col_name} ({col_type})")
+
+        print("\n🎉 Physics calibration schema is ready!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate_physics_calibration()
+    sys.exit(0 if success else 1)
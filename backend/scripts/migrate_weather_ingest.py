@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Database Migration: Weather Ingestion Columns
+Adds the columns the weather ingestion scheduler writes to
+external_weather_logs (grid cell, coordinates, kind, rain, ...) and the
+(cell, kind, timestamp) index used by the local weather reads.
+
+Safe to re-run: existing columns and indexes are skipped.
+Works on both PostgreSQL and SQLite.
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from app.core.database import engine, Base, ExternalWeatherLog
+
+NEW_COLUMNS = {
+    "cell": "VARCHAR",
+    "latitude": "FLOAT",
+    "longitude": "FLOAT",
+    "kind": "VARCHAR DEFAULT 'current'",
+    "rain": "FLOAT",
+    "temp_min": "FLOAT",
+    "is_day": "BOOLEAN",
+    "fetched_at": "TIMESTAMP"
+}
+
+INDEX_NAME = "ix_external_weather_logs_cell_kind_ts"
+
+def migrate_weather_ingest():
+    """Add ingestion columns + index to external_weather_logs"""
+    print("🔄 Starting database migration...")
+    print("=" * 60)
+
+    try:
+        inspector = inspect(engine)
+        if not inspector.has_table("external_weather_logs"):
+            # Fresh database: create the table with the full schema
+            Base.metadata.create_all(bind=engine, tables=[ExternalWeatherLog.__table__])
+            print("✅ Created external_weather_logs")
+            return True
+
+        columns = {col["name"] for col in inspector.get_columns("external_weather_logs")}
+        indexes = {idx["name"] for idx in inspector.get_indexes("external_weather_logs")}
+
+        with engine.begin() as conn:
+            for col_name, col_type in NEW_COLUMNS.items():
+                if col_name in columns:
+                    print(f"⏭️  Column already exists: {col_name}")
+                    continue
+                conn.execute(text(f"ALTER TABLE external_weather_logs ADD COLUMN {col_name} {col_type}"))
+                print(f"✅ Added column: {col_name} ({col_type})")
+
+            if INDEX_NAME in indexes:
+                print(f"⏭️  Index already exists: {INDEX_NAME}")
+            else:
+                conn.execute(text(f"CREATE INDEX {INDEX_NAME} ON external_weather_logs (cell, kind, timestamp)"))
+                print(f"✅ Created index: {INDEX_NAME}")
+
+            # Rows written before this migration are current observations
+            conn.execute(text("UPDATE external_weather_logs SET kind = 'current' WHERE kind IS NULL"))
+
+        print("\n🎉 Weather ingestion schema is ready!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate_weather_ingest()
+    sys.exit(0 if success else 1)
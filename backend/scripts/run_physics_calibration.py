@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Least-squares physics calibration (for cron / manual runs)
+
+Refits insulation, ventilation and solar gain for every farm with new
+EXACT feedback since its last calibration and writes them to
+farm_physics_profiles. Run scripts/migrate_physics_calibration.py first.
+
+Usage:
+    python scripts/run_physics_calibration.py
+    python scripts/run_physics_calibration.py --workers 8
+    python scripts/run_physics_calibration.py --farm farm-123 --farm farm-456
+"""
+
+import argparse
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.physics_calibration import physics_calibration
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--farm", action="append", help="calibrate only these farm ids (repeatable)")
+    args = parser.parse_args()
+
+    print("🔧 Running physics calibration...")
+    result = physics_calibration.run(user_ids=args.farm, workers=args.workers)
+    print(json.dumps(result, indent=2))
+    print(f"✅ Fitted {result['farms_fitted']} of {result['farms_due']} farm(s)")
+
+if __name__ == "__main__":
+    main()
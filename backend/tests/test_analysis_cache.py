@@ -0,0 +1,38 @@
+"""
+Unit tests for the stale-while-revalidate dashboard analysis cache.
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.analysis_cache import AnalysisCache
+
+WEATHER = {"temperature": 72.0, "humidity": 60, "rain": 0.0, "wind_speed": 3.0}
+
+
+def test_analysis_is_cached():
+    cache = AnalysisCache(max_workers=1)
+    key = cache.make_key("farm-1", "Tomato", WEATHER)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"analysis_text": "Conditions are optimal."}
+
+    assert cache.get(key, compute)[1]["cache"] == "miss"
+    assert cache.get(key, compute)[1]["cache"] == "hit"
+    assert len(calls) == 1
+
+
+def test_fallback_analysis_is_not_cached():
+    cache = AnalysisCache(max_workers=1)
+    key = cache.make_key("farm-1", "Tomato", WEATHER)
+    fallback = {"analysis_text": "⚠️ Simulation Mode: AI service unavailable."}
+
+    assert cache.get(key, lambda: fallback)[0] == fallback
+    assert cache.get(key, lambda: {"analysis_text": "Error: quota exceeded"})[1]["cache"] == "miss"
+    cache.store(key, fallback)
+    assert cache.lookup(key, lambda: fallback) is None
+    assert cache.stats()["skipped_uncacheable"] == 3
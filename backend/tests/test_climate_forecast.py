@@ -0,0 +1,124 @@
+"""
+Unit tests for the hourly lagged internal-climate forecaster.
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.climate_forecast import (
+    lagged_series, forecast_internal_climate, ClimateForecaster, latest_indoor, daily_outlook
+)
+from app.services.physics_engine import GreenhousePhysicsModel
+from app.services.pest_forecast import forecast_pest_risk
+
+
+def loop_lag(target, tau, initial):
+    alpha = 1 - np.exp(-1.0 / tau)
+    state, out = initial, []
+    for value in target:
+        state = state + alpha * (value - state)
+        out.append(state)
+    return np.array(out)
+
+
+def test_vectorized_lag_matches_recurrence():
+    rng = np.random.default_rng(0)
+    target = rng.uniform(5, 35, 168)
+    for tau in (0.3, 1.0, 6.0):
+        assert np.allclose(lagged_series(target, tau, initial=12.0), loop_lag(target, tau, 12.0))
+    # One row per series
+    batch = lagged_series(np.vstack([target, target[::-1]]), 2.0)
+    assert np.allclose(batch[1], loop_lag(target[::-1], 2.0, target[-1]))
+    # No lag: follows the target exactly
+    assert np.allclose(lagged_series(target, 0), target)
+
+
+def test_forecast_lags_behind_a_step_and_uses_day_night():
+    hours = 24
+    hourly = {
+        "temperature": np.where(np.arange(hours) < 12, 10.0, 20.0),
+        "humidity": np.full(hours, 60.0),
+        "wind_speed": np.zeros(hours),
+        "rain": np.zeros(hours),
+        "is_day": np.arange(hours) % 24 < 12
+    }
+    physics = GreenhousePhysicsModel()
+    slow = forecast_internal_climate(hourly, physics, {"thermal_lag": 3.0, "moisture_retention": 0.5})
+    fast = forecast_internal_climate(hourly, physics, {"thermal_lag": 0.0, "moisture_retention": 0.0})
+
+    assert np.allclose(fast["temperature"], fast["equilibrium_temperature"])
+    # After the step the slow farm is still catching up
+    assert fast["temperature"][12] - slow["temperature"][12] > 1.0
+    assert abs(slow["temperature"][-1] - fast["temperature"][-1]) < 0.25
+    # Night equilibrium: external + insulation offset
+    assert fast["equilibrium_temperature"][12] == 20.0 + 3.0 * physics.params["insulation_score"]
+    assert len(slow["vpd"]) == hours
+
+
+def hourly_rows(hours=48):
+    start = datetime(2026, 6, 1)
+    return [
+        {"timestamp": start + timedelta(hours=i), "temperature": 60 + i, "humidity": 70, "rain": 0.01,
+         "wind_speed": 2, "is_day": 6 <= i < 20}
+        for i in range(hours)
+    ]
+
+
+def test_forecaster_returns_imperial_series_and_caches():
+    rows = hourly_rows()
+    forecaster = ClimateForecaster()
+    result = forecaster.forecast(None, (1, 2), rows)
+    assert len(result["temperature"]) == 48 and result["hours"][0] == "2026-06-01T00:00:00"
+    assert result["is_day"][6] is True and result["is_day"][0] is False
+    assert forecaster.forecast(None, (1, 2), rows) is result
+    assert forecaster.forecast(None, (1, 2), []) is None
+
+
+def test_sensor_seed_sets_the_starting_state_and_the_cache_key():
+    rows = hourly_rows()
+    forecaster = ClimateForecaster()
+    settled = forecaster.forecast("farm", (1, 2), rows)
+    seeded = forecaster.forecast("farm", (1, 2), rows, {"temperature": 35.0, "humidity": 40.0})
+
+    assert settled["initial"] is None and seeded["initial"] == {"temperature": 95.0, "humidity": 40.0}
+    # A hot, dry greenhouse starts above the settled forecast and converges later
+    assert seeded["temperature"][0] > settled["temperature"][0] + 5
+    assert seeded["humidity"][0] < settled["humidity"][0]
+    assert abs(seeded["temperature"][-1] - settled["temperature"][-1]) < 0.5
+    assert forecaster.forecast("farm", (1, 2), rows, {"temperature": 35.0, "humidity": 40.0}) is seeded
+
+
+def test_latest_indoor_reading_is_converted_to_metric():
+    from app.core.database import init_db, SessionLocal, SensorReading
+
+    init_db()
+    db = SessionLocal()
+    try:
+        db.query(SensorReading).filter(SensorReading.user_id == "climate-seed").delete()
+        db.add(SensorReading(user_id="climate-seed", timestamp=datetime.utcnow() - timedelta(days=2), temperature=50.0, humidity=90.0))
+        db.commit()
+        assert latest_indoor("climate-seed") is None
+        db.add(SensorReading(user_id="climate-seed", timestamp=datetime.utcnow(), temperature=77.0, humidity=55.0))
+        db.commit()
+    finally:
+        db.close()
+
+    seed = latest_indoor("climate-seed")
+    assert np.isclose(seed["temperature"], 25.0) and seed["humidity"] == 55.0
+
+
+def test_daily_outlook_feeds_pest_risk():
+    forecast = ClimateForecaster().forecast(None, (1, 2), hourly_rows(72))
+    days = daily_outlook(forecast)
+
+    assert [day["date"] for day in days] == ["2026-06-01", "2026-06-02", "2026-06-03"]
+    assert days[0]["max_temp"] == max(forecast["temperature"][:24])
+    assert np.isclose(days[0]["rain"], 0.24)
+    risks = forecast_pest_risk("Strawberries", days)
+    assert [risk["Date"] for risk in risks] == [day["date"] for day in days]
+    assert risks[0]["Temp (F)"] == days[0]["max_temp"]
@@ -0,0 +1,44 @@
+"""
+Access control of the multi-farm batch dashboard.
+"""
+import sys
+import os
+
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.core.database import init_db, SessionLocal, User, FarmAccess
+
+client = TestClient(app)
+
+
+def setup_farms():
+    init_db()
+    db = SessionLocal()
+    try:
+        db.query(FarmAccess).filter(FarmAccess.operator_id == "batch-operator").delete()
+        for user_id in ("batch-operator", "batch-farm"):
+            if db.query(User).filter(User.id == user_id).first() is None:
+                db.add(User(id=user_id, email=f"{user_id}@example.com"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_batch_requires_caller_and_grants():
+    setup_farms()
+    body = {"farm_ids": ["batch-operator", "batch-farm"], "ai": "defer"}
+
+    assert client.post("/api/dashboard/batch", json=body).status_code == 422
+    denied = client.post("/api/dashboard/batch", json=body, headers={"X-Farm-ID": "batch-operator"})
+    assert denied.status_code == 403
+    assert "batch-farm" in denied.json()["detail"]
+
+    granted = client.post("/api/admin/farm-access", params={"operator_id": "batch-operator", "farm_id": "batch-farm"})
+    assert granted.status_code == 200
+    response = client.post("/api/dashboard/batch", json=body, headers={"X-Farm-ID": "batch-operator"})
+    assert response.status_code == 200
+    assert [farm["farm_id"] for farm in response.json()["farms"]] == ["batch-operator", "batch-farm"]
@@ -0,0 +1,45 @@
+"""
+Accuracy tests for the deterministic voice feedback parser against the
+labeled corpus in tests/data/feedback_corpus.jsonl.
+"""
+import sys
+import os
+import json
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.feedback_parser import parse_feedback
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "feedback_corpus.jsonl")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def matches(result, label):
+    if label == "llm":
+        return result is None
+    return (
+        result is not None
+        and result["feedback_type"] == label["feedback_type"]
+        and result["feedback_value"] == label["feedback_value"]
+    )
+
+
+def test_corpus_accuracy():
+    corpus = load_corpus()
+    misses = [row["text"] for row in corpus if not matches(parse_feedback(row["text"]), row["label"])]
+    assert not misses, misses
+
+
+def test_confident_results_clear_storage_threshold():
+    # job_queue stores feedback with confidence > 0.7
+    for text in ("It's 24 degrees right now", "Humidity is 60%", "so muggy"):
+        assert parse_feedback(text)["confidence"] > 0.7
+
+
+def test_fahrenheit_is_converted_to_celsius():
+    assert parse_feedback("Thermometer says 75F")["feedback_value"] == "23.9C"
@@ -0,0 +1,42 @@
+"""
+Unit tests for the local gazetteer index and its use by geocoding.
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import data_handler
+from app.services.gazetteer import Gazetteer
+
+SPRINGFIELD = {"id": 1, "name": "Springfield", "latitude": 39.8, "longitude": -89.6, "country_code": "US", "population": 114000}
+SPRING = {"id": 2, "name": "Spring", "latitude": 30.08, "longitude": -95.42, "country_code": "US", "population": 62000}
+
+
+def test_prefix_match_is_for_autocomplete_only(tmp_path):
+    index = Gazetteer(str(tmp_path / "gazetteer.db"))
+    index.add_results([SPRINGFIELD])
+
+    assert index.search("spring") == []
+    assert [row["name"] for row in index.search("spring", prefix=True)] == ["Springfield"]
+    assert [row["name"] for row in index.search("Spring-field")] == ["Springfield"]
+    index.close()
+
+
+def test_prefix_only_hit_goes_remote_and_writes_back(tmp_path, monkeypatch):
+    index = Gazetteer(str(tmp_path / "gazetteer.db"))
+    index.add_results([SPRINGFIELD])
+    remote_calls = []
+
+    def fake_remote(name):
+        remote_calls.append(name)
+        return [SPRING]
+
+    monkeypatch.setattr(data_handler, "gazetteer", index)
+    monkeypatch.setattr(data_handler, "search_city_remote", fake_remote)
+
+    assert data_handler.search_city("Spring")[0]["name"] == "Spring"
+    assert data_handler.search_city("Spring")[0]["name"] == "Spring"
+    assert remote_calls == ["Spring"]
+    index.close()
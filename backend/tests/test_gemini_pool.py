@@ -0,0 +1,81 @@
+"""
+Unit tests for the process-wide Gemini model pool (SDK calls faked).
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.api_core.exceptions import ResourceExhausted
+
+from app.services import gemini_pool as pool_module
+from app.services.gemini_pool import GeminiPool
+
+
+class FakeModel:
+    built = []
+
+    def __init__(self, name):
+        FakeModel.built.append(name)
+
+    def generate_content(self, contents, **kwargs):
+        if contents == "boom":
+            raise RuntimeError("quota exceeded")
+        if contents == "exhausted":
+            raise ResourceExhausted("Quota exceeded for generate_content")
+        if contents == "port":
+            raise RuntimeError("connection refused on port 4290")
+        return f"ok:{contents}"
+
+
+def test_configures_once_and_reuses_model_handles(monkeypatch):
+    configured = []
+    FakeModel.built = []
+    monkeypatch.setenv("GEMINI_API_KEY", "key-1")
+    monkeypatch.setattr(pool_module.genai, "configure", lambda **kwargs: configured.append(kwargs))
+    monkeypatch.setattr(pool_module.genai, "GenerativeModel", FakeModel)
+
+    pool = GeminiPool()
+    for _ in range(3):
+        assert pool.generate("hi", model_name="gemini-2.5-flash") == "ok:hi"
+    pool.generate("hi", model_name="gemini-2.5-pro")
+
+    assert configured == [{"api_key": "key-1"}]
+    assert FakeModel.built == ["gemini-2.5-flash", "gemini-2.5-pro"]
+    assert pool.stats()["models"]["gemini-2.5-flash"]["calls"] == 3
+
+    # A rotated key reconfigures and rebuilds handles
+    monkeypatch.setenv("GEMINI_API_KEY", "key-2")
+    pool.generate("hi", model_name="gemini-2.5-flash")
+    assert len(configured) == 2
+    assert FakeModel.built[-1] == "gemini-2.5-flash"
+
+
+def test_errors_are_counted(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "key-1")
+    monkeypatch.setattr(pool_module.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(pool_module.genai, "GenerativeModel", FakeModel)
+
+    pool = GeminiPool()
+    try:
+        pool.generate("boom")
+    except RuntimeError:
+        pass
+    assert pool.stats()["models"]["gemini-2.5-flash"]["errors"] == 1
+
+
+def test_only_quota_errors_back_off_the_model(monkeypatch):
+    backoffs = []
+    monkeypatch.setenv("GEMINI_API_KEY", "key-1")
+    monkeypatch.setattr(pool_module.genai, "configure", lambda **kwargs: None)
+    monkeypatch.setattr(pool_module.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(pool_module.llm_scheduler, "backoff", lambda model, **kwargs: backoffs.append(model))
+
+    pool = GeminiPool()
+    for contents in ("exhausted", "port", "boom"):
+        try:
+            pool.generate(contents)
+        except Exception:
+            pass
+    assert backoffs == ["gemini-2.5-flash"]
@@ -0,0 +1,59 @@
+"""
+Unit tests for the LLM record / replay fixture store.
+"""
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_replay import ReplayStore, LatencyModel, ReplayMissError, fixture_key
+
+
+def make_store(path, mode, strict=False):
+    return ReplayStore(path=str(path), mode=mode, latency=LatencyModel("none"), strict=strict)
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / "fixtures.jsonl"
+    recorder = make_store(path, "record")
+    recorder.record("gemini-flash", ["prompt A"], "gemini.prescription", "**Status**: Normal", 1.25)
+
+    chunks = [SimpleNamespace(text="[{"), SimpleNamespace(text='"a": 1}]')]
+    streamed = list(recorder.wrap_stream(iter(chunks), "gemini-flash", "prompt B", "gemini.pest_risk", 0.0))
+    assert [c.text for c in streamed] == ["[{", '"a": 1}]']
+
+    player = make_store(path, "replay")
+    assert player.replay("gemini-flash", ["prompt A"], "gemini.prescription").text == "**Status**: Normal"
+    assert "".join(c.text for c in player.replay("gemini-flash", "prompt B", "gemini.pest_risk", stream=True)) == '[{"a": 1}]'
+    assert player.stats()["hits"] == 2
+    assert fixture_key("gemini-flash", "prompt B") == fixture_key("gemini-flash", ["prompt B"])
+
+
+def test_unknown_prompt_falls_back_to_same_stage(tmp_path):
+    path = tmp_path / "fixtures.jsonl"
+    recorder = make_store(path, "record")
+    recorder.record("gemini-flash", "weather 20C", "gemini.prescription", "first", 0.5)
+    recorder.record("gemini-flash", "weather 25C", "gemini.prescription", "second", 0.5)
+
+    player = make_store(path, "replay")
+    text = player.replay("gemini-flash", "weather 31C", "gemini.prescription").text
+    assert text in ("first", "second")
+    # Deterministic for the same prompt
+    assert player.replay("gemini-flash", "weather 31C", "gemini.prescription").text == text
+    assert player.stats()["fallbacks"] == 2
+
+    with pytest.raises(ReplayMissError):
+        player.replay("gemini-flash", "anything", "gemini.market_prices")
+    with pytest.raises(ReplayMissError):
+        make_store(path, "replay", strict=True).replay("gemini-flash", "weather 31C", "gemini.prescription")
+
+
+def test_latency_models():
+    assert LatencyModel("recorded").seconds(1.5) == 1.5
+    assert LatencyModel("fixed:0.3").seconds(1.5) == 0.3
+    samples = [LatencyModel("lognormal:1.0:0.5", seed=7).seconds(None) for _ in range(2)]
+    assert samples[0] == samples[1] > 0
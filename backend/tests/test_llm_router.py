@@ -0,0 +1,68 @@
+"""
+Unit tests for the LLM provider router (failover + hedged requests) using
+offline stub providers.
+"""
+import sys
+import os
+import time
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_router import LLMRouter, StubProvider, AllProvidersFailed
+
+
+def test_failover_on_primary_error():
+    primary = StubProvider("primary", error=RuntimeError("429 quota"))
+    secondary = StubProvider("secondary", text="ok")
+    router = LLMRouter(providers=[primary, secondary], hedge=False)
+
+    result = router.generate("prompt")
+
+    assert result == {"text": "ok", "provider": "secondary", "hedged": False}
+    assert router.stats()["providers"]["secondary"]["failovers"] == 1
+
+
+def test_hedge_fires_when_primary_is_slow():
+    primary = StubProvider("primary", text="slow", latency=1.0)
+    secondary = StubProvider("secondary", text="fast")
+    router = LLMRouter(providers=[primary, secondary], hedge=True)
+    router.hedge_delay = lambda name: 0.05
+
+    started = time.perf_counter()
+    result = router.generate("prompt")
+
+    assert result["provider"] == "secondary"
+    assert result["hedged"] is True
+    assert time.perf_counter() - started < 0.5
+    assert router.stats()["providers"]["secondary"]["hedges"] == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    primary = StubProvider("primary", text="fast")
+    secondary = StubProvider("secondary", text="unused")
+    router = LLMRouter(providers=[primary, secondary], hedge=True)
+
+    assert router.generate("prompt")["provider"] == "primary"
+    assert secondary.calls == 0
+
+
+def test_all_providers_failing_raises():
+    router = LLMRouter(providers=[
+        StubProvider("a", error=RuntimeError("down")),
+        StubProvider("b", error=RuntimeError("down"))
+    ], hedge=True)
+
+    with pytest.raises(AllProvidersFailed):
+        router.generate("prompt")
+
+
+def test_vision_requests_skip_text_only_providers():
+    text_only = StubProvider("text", supports_vision=False)
+    vision = StubProvider("vision", text="diagnosis")
+    router = LLMRouter(providers=[text_only, vision], hedge=False)
+
+    assert router.generate("prompt", image=b"jpeg")["provider"] == "vision"
+    assert text_only.calls == 0
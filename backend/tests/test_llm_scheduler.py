@@ -0,0 +1,64 @@
+"""
+Unit tests for the LLM quota scheduler (token buckets + priority classes).
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.llm_scheduler import LLMScheduler, QuotaExceededError, estimate_tokens
+
+
+def make_scheduler(rpm=600, tpm=1000000):
+    return LLMScheduler(budgets={"m": {"rpm": rpm, "tpm": tpm}})
+
+
+def test_higher_priority_is_admitted_first():
+    scheduler = make_scheduler(rpm=600)  # one request every 0.1s once drained
+    scheduler._budget("m").requests = 0
+    order = []
+
+    def call(priority):
+        scheduler.acquire("m", priority, tokens=10)
+        order.append(priority)
+
+    feedback = threading.Thread(target=call, args=("feedback",))
+    feedback.start()
+    time.sleep(0.02)
+    diagnosis = threading.Thread(target=call, args=("diagnosis",))
+    diagnosis.start()
+    feedback.join()
+    diagnosis.join()
+
+    assert order == ["diagnosis", "feedback"]
+    stats = scheduler.stats()["classes"]
+    assert stats["diagnosis"]["admitted"] == 1
+    assert stats["feedback"]["admitted"] == 1
+
+
+def test_token_budget_sheds_after_max_wait():
+    scheduler = make_scheduler(rpm=600, tpm=600)  # 10 tokens/s
+    scheduler.acquire("m", "json", tokens=600)
+
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("m", "feedback", tokens=500, timeout=0.1)
+    assert scheduler.stats()["classes"]["feedback"]["shed"] == 1
+    assert scheduler.stats()["models"]["m"]["queued"] == 0
+
+
+def test_backoff_blocks_model():
+    scheduler = make_scheduler()
+    scheduler.backoff("m", seconds=5)
+    with pytest.raises(QuotaExceededError):
+        scheduler.acquire("m", "prescription", timeout=0.05)
+
+
+def test_estimate_counts_images():
+    text_only = estimate_tokens("x" * 400)
+    with_image = estimate_tokens(["x" * 400, object()])
+    assert with_image - text_only == 258
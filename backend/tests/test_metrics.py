@@ -0,0 +1,63 @@
+"""
+Unit tests for the in-process latency metrics registry.
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from app.services.metrics import MetricsRegistry, instrument_engine
+
+
+def test_quantiles_and_error_counts():
+    registry = MetricsRegistry(window_size=100)
+    for ms in range(1, 101):
+        registry.observe("open_meteo.current", ms / 1000.0)
+
+    try:
+        with registry.timer("open_meteo.current"):
+            raise RuntimeError("timeout")
+    except RuntimeError:
+        pass
+
+    stage = registry.snapshot()["open_meteo.current"]
+    assert stage["count"] == 101
+    assert stage["errors"] == 1
+    # Window keeps the last 100 observations (2ms..100ms + the failed call)
+    assert 0.045 <= stage["p50"] <= 0.055
+    assert stage["p99"] >= 0.095
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+
+    @registry.timed("geocoding.resolve")
+    def resolve():
+        return 1
+
+    resolve()
+    body = registry.render_prometheus()
+    assert '# TYPE forhuman_stage_latency_seconds summary' in body
+    assert 'forhuman_stage_latency_seconds{stage="geocoding.resolve",quantile="0.95"}' in body
+    assert 'forhuman_stage_latency_seconds_count{stage="geocoding.resolve"} 1' in body
+    assert 'forhuman_stage_errors_total{stage="geocoding.resolve"} 0' in body
+
+
+def test_sqlalchemy_statements_are_timed():
+    registry = MetricsRegistry()
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, registry)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        try:
+            conn.execute(text("SELECT * FROM missing_table"))
+        except Exception:
+            pass
+
+    stage = registry.snapshot()["db.select"]
+    assert stage["count"] == 2
+    assert stage["errors"] == 1
@@ -0,0 +1,78 @@
+"""
+Equivalence tests: vectorized estimate_microclimate_batch vs the scalar
+estimate_microclimate / calculate_vpd.
+"""
+import sys
+import os
+import itertools
+
+import numpy as np
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.physics_engine import GreenhousePhysicsModel
+
+
+def grid():
+    return [
+        {"temperature": t, "humidity": h, "wind_speed": w, "rain": r, "is_day": d}
+        for t, h, w, r, d in itertools.product(
+            [-12.5, 0.0, 17.3, 24.0, 38.9], [0, 35.5, 88, 100], [0, 3.2, 11.0], [0, 0.4], [True, False]
+        )
+    ]
+
+
+def columns(rows):
+    return [[row[name] for row in rows] for name in ("temperature", "humidity", "wind_speed", "rain", "is_day")]
+
+
+def assert_matches_scalar(model, rows, batch):
+    for i, row in enumerate(rows):
+        scalar = model.estimate_microclimate(row)
+        assert round(float(batch["temperature"][i]), 1) == scalar["temperature"]
+        assert round(float(batch["humidity"][i]), 1) == scalar["humidity"]
+        assert round(float(batch["vpd"][i]), 2) == scalar["vpd"]
+
+
+def test_batch_matches_scalar_for_default_and_glass_facilities():
+    rows = grid()
+    for params in (None, {"type": "glass", "area_m2": 500, "insulation_score": 0.8, "ventilation_score": 0.3}):
+        model = GreenhousePhysicsModel(params)
+        assert_matches_scalar(model, rows, model.estimate_microclimate_batch(*columns(rows)))
+
+
+def test_zero_solar_gain_matches_on_both_paths():
+    # A calibrated solar_gain of 0.0 must not fall back to the facility default
+    rows = grid()
+    model = GreenhousePhysicsModel({"type": "vinyl", "area_m2": 330, "insulation_score": 0.5,
+                                    "ventilation_score": 0.7, "solar_gain": 0.0})
+    assert_matches_scalar(model, rows, model.estimate_microclimate_batch(*columns(rows)))
+    day = {"temperature": 20.0, "humidity": 50, "wind_speed": 0, "rain": 0, "is_day": True}
+    assert model.estimate_microclimate(day)["temperature"] == 20.0
+
+def test_per_row_facility_parameters():
+    rows = grid()
+    rng = np.random.default_rng(1)
+    facility = {
+        "type": rng.choice(["vinyl", "glass"], len(rows)),
+        "insulation_score": rng.uniform(0.1, 0.9, len(rows)),
+        "ventilation_score": rng.uniform(0.0, 1.0, len(rows))
+    }
+    batch = GreenhousePhysicsModel().estimate_microclimate_batch(*columns(rows), facility=facility)
+    for i, row in enumerate(rows):
+        model = GreenhousePhysicsModel({
+            "type": str(facility["type"][i]),
+            "area_m2": 330,
+            "insulation_score": float(facility["insulation_score"][i]),
+            "ventilation_score": float(facility["ventilation_score"][i])
+        })
+        assert_matches_scalar(model, [row], {key: values[i:i + 1] for key, values in batch.items()})
+
+
+def test_scalar_inputs_broadcast_and_vpd_batch():
+    model = GreenhousePhysicsModel()
+    batch = model.estimate_microclimate_batch([10.0, 20.0, 30.0], 60.0)
+    assert batch["humidity"].shape == (3,)
+    vpd = model.calculate_vpd_batch([5.0, 25.0], [40.0, 90.0])
+    assert np.allclose(vpd, [model.calculate_vpd(5.0, 40.0), model.calculate_vpd(25.0, 90.0)])
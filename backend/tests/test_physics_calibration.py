@@ -0,0 +1,98 @@
+"""
+Unit tests for the least-squares physics calibration job.
+"""
+import sys
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import init_db, SessionLocal, User, RealityFeedbackLog, ExternalWeatherLog, FarmPhysicsProfile
+from app.services.physics_calibration import fit_farm, parse_exact_temperature, PhysicsCalibrationJob
+from app.services.physics_engine import GreenhousePhysicsModel
+from app.services.physics_profiles import PROFILE_DEFAULTS
+from app.services.weather_client import weather_client
+from app.services.weather_ingest import cell_id
+
+TRUE_PARAMS = {"insulation_score": 0.8, "ventilation_score": 0.4, "solar_gain": 8.0}
+
+
+def synthetic_samples(count, seed=0):
+    rng = np.random.default_rng(seed)
+    samples = {
+        "temperature": rng.uniform(0, 30, count),
+        "humidity": rng.uniform(30, 90, count),
+        "wind_speed": rng.uniform(0, 6, count),
+        "rain": rng.choice([0.0, 0.0, 0.0, 1.0], count),
+        "is_day": rng.random(count) < 0.6
+    }
+    truth = GreenhousePhysicsModel({"type": "vinyl", "area_m2": 330, **TRUE_PARAMS})
+    samples["actual"] = truth.estimate_microclimate_batch(
+        samples["temperature"], samples["humidity"], samples["wind_speed"], samples["rain"], samples["is_day"]
+    )["temperature"] + rng.normal(0, 0.2, count)
+    return samples
+
+
+def test_parse_exact_temperature():
+    assert parse_exact_temperature("24C") == 24.0
+    assert parse_exact_temperature("24.5") == 24.5
+    assert round(parse_exact_temperature("77F"), 1) == 25.0
+    assert parse_exact_temperature("60%") is None
+
+
+def test_fit_recovers_parameters():
+    fit = fit_farm(synthetic_samples(400), PROFILE_DEFAULTS, prior_weight=0.01)
+    for field, value in TRUE_PARAMS.items():
+        assert abs(fit[field] - value) < 0.1 * max(1.0, value)
+    assert fit["rmse_after"] < 0.3 < fit["rmse_before"]
+
+
+def test_job_fits_farms_with_new_feedback_only():
+    init_db()
+    user_id = f"farm-{uuid.uuid4()}"
+    lat, lon = 36.1 + np.random.default_rng().uniform(0, 1), -119.7
+    cell = cell_id(weather_client.cache_key(lat, lon))
+    samples = synthetic_samples(40, seed=1)
+    start = datetime(2026, 5, 1)
+
+    db = SessionLocal()
+    try:
+        db.add(User(id=user_id, email=f"{user_id}@example.com", latitude=lat, longitude=lon))
+        for i in range(40):
+            at = start + timedelta(hours=i)
+            db.add(ExternalWeatherLog(
+                location=f"{lat},{lon}", cell=cell, kind="current", timestamp=at,
+                temp_out=samples["temperature"][i] * 9 / 5 + 32, humi_out=samples["humidity"][i],
+                wind_speed=samples["wind_speed"][i] / 0.44704, rain=samples["rain"][i] / 25.4,
+                is_day=bool(samples["is_day"][i])
+            ))
+            db.add(RealityFeedbackLog(
+                user_id=user_id, timestamp=at + timedelta(minutes=5),
+                feedback_type="EXACT", feedback_value=f"{samples['actual'][i]:.1f}C"
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+    job = PhysicsCalibrationJob(workers=1)
+    result = job.run()
+    assert result["farms_fitted"] >= 1
+
+    db = SessionLocal()
+    try:
+        profile = db.query(FarmPhysicsProfile).filter(FarmPhysicsProfile.user_id == user_id).one()
+        assert profile.calibration_samples == 40
+        # Few samples: ventilation / solar gain trade off, but both the fit
+        # error and the night-time insulation are recovered
+        assert profile.solar_gain > PROFILE_DEFAULTS["solar_gain"]
+        assert abs(profile.insulation_score - TRUE_PARAMS["insulation_score"]) < 0.1
+        assert profile.calibration_rmse < 0.5
+    finally:
+        db.close()
+
+    # Nothing new since the last run
+    assert user_id not in job.farms_due(SessionLocal())
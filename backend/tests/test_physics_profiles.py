@@ -0,0 +1,47 @@
+"""
+Unit tests for per-farm physics profiles: isolation between farms and
+write-behind persistence to FarmPhysicsProfile.
+"""
+import sys
+import os
+import uuid
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import init_db
+from app.services.physics_engine import physics_engine
+from app.services.physics_profiles import PhysicsProfileStore
+
+WEATHER = {"temperature": 10.0, "humidity": 60, "wind_speed": 0, "rain": 0, "is_day": False}
+
+
+def test_calibration_is_isolated_per_farm_and_written_behind():
+    init_db()
+    store = PhysicsProfileStore(flush_seconds=60)
+    farm_a, farm_b = f"farm-{uuid.uuid4()}", f"farm-{uuid.uuid4()}"
+    shared_before = dict(physics_engine.params)
+
+    # Actual temperature well above the estimate -> farm A's insulation goes up
+    store.calibrate(farm_a, 25.0, WEATHER)
+    assert store.get(farm_a)["insulation_score"] == 0.55
+    assert store.get(farm_b)["insulation_score"] == 0.5
+    assert physics_engine.params == shared_before
+    assert store.model_for(farm_a).estimate_microclimate(WEATHER)["temperature"] > \
+        store.model_for(farm_b).estimate_microclimate(WEATHER)["temperature"]
+
+    # Nothing written until the flush; a fresh store then reads it back
+    assert store.stats()["dirty"] == 1
+    assert store.flush() == 1
+    assert PhysicsProfileStore().get(farm_a)["insulation_score"] == 0.55
+
+
+def test_cached_reads_skip_the_database():
+    init_db()
+    store = PhysicsProfileStore()
+    farms = [f"farm-{uuid.uuid4()}" for _ in range(3)]
+    store.get_many(farms)
+    store.get_many(farms)
+    store.get(farms[0])
+    assert store.loads == 1
+    assert store.model_for(None) is physics_engine
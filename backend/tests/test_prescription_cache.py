@@ -0,0 +1,45 @@
+"""
+Unit tests for the quantized prescription cache.
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.prescription_cache import PrescriptionCache
+
+
+def test_nearby_microclimates_share_a_prescription():
+    cache = PrescriptionCache(maxsize=16, ttl=60)
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "**Status**: Normal"
+
+    a = {"temperature": 24.1, "humidity": 61.0, "vpd": 1.18}
+    b = {"temperature": 24.2, "humidity": 62.0, "vpd": 1.21}
+    c = {"temperature": 27.0, "humidity": 61.0, "vpd": 1.18}
+
+    cache.get_or_generate(cache.make_key("Tomato", a), generate)
+    cache.get_or_generate(cache.make_key("tomato", b), generate)
+    assert len(calls) == 1
+    cache.get_or_generate(cache.make_key("tomato", c), generate)
+    assert len(calls) == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_feedback_bypasses_and_errors_are_not_cached():
+    cache = PrescriptionCache(maxsize=16, ttl=60)
+    key = cache.make_key("tomato", {"temperature": 20.0, "humidity": 50.0, "vpd": 1.0})
+
+    cache.get_or_generate(key, lambda: "fresh", bypass=True)
+    assert cache.get(key) is None
+    assert cache.stats()["bypassed"] == 1
+
+    cache.get_or_generate(key, lambda: "**Status**: Normal (Simulation Mode)")
+    assert cache.get(key) is None
+    assert cache.make_key("tomato", {"temperature": None, "humidity": 50.0, "vpd": 1.0}) is None
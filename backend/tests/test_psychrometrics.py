@@ -0,0 +1,81 @@
+"""
+Equivalence tests: shared psychrometrics module vs the per-module VPD
+formulas it replaced, and scalar vs array forms.
+"""
+import sys
+import os
+import math
+import itertools
+
+import numpy as np
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import psychrometrics
+from app.services.physics_engine import physics_engine
+from app.services.data_handler import calculate_vpd
+from app.services.pest_forecast import calculate_vpd as pest_calculate_vpd
+
+
+TEMPS_F = [-4.0, 14.5, 41.0, 59.9, 77.0, 86.3, 104.0]
+HUMIDITY = [0, 12.5, 35, 60.2, 88, 100]
+
+
+def legacy_vpd_f(temp_f, humidity):
+    # data_handler / pest_forecast / src before unification
+    temp_c = (temp_f - 32) * 5.0 / 9.0
+    svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
+    return round(svp * (1 - (humidity / 100)), 2)
+
+
+def legacy_vpd_c(temp_c, humidity):
+    # physics_engine before unification
+    svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
+    return svp - svp * (humidity / 100.0)
+
+
+def test_fahrenheit_callers_match_legacy_formula():
+    for temp, humidity in itertools.product(TEMPS_F, HUMIDITY):
+        expected = legacy_vpd_f(temp, humidity)
+        assert calculate_vpd(temp, humidity) == expected
+        assert pest_calculate_vpd(temp, humidity) == expected
+
+
+def test_physics_engine_matches_legacy_formula_exactly():
+    for temp, humidity in itertools.product([-12.5, 0.0, 17.3, 24.0, 38.9], HUMIDITY):
+        assert physics_engine.calculate_vpd(temp, humidity) == legacy_vpd_c(temp, humidity)
+
+
+def test_weekly_report_formula_within_tolerance():
+    # reports.py used 0.6108 and 2.71828 ** x; the drift stays well below display precision
+    for temp, humidity in itertools.product(TEMPS_F, HUMIDITY):
+        temp_c = (temp - 32) * 5 / 9
+        svp = 0.6108 * (2.71828 ** (17.27 * temp_c / (temp_c + 237.3)))
+        old = (1 - humidity / 100) * svp
+        assert abs(psychrometrics.vpd(temp, humidity, unit="F") - old) < 1e-3
+
+
+def test_array_matches_scalar():
+    temps, hums = zip(*itertools.product(TEMPS_F, HUMIDITY))
+    array = psychrometrics.vpd_array(temps, hums, unit="F", decimals=2)
+    assert array.tolist() == [psychrometrics.vpd(t, h, unit="F", decimals=2) for t, h in zip(temps, hums)]
+
+    dew = psychrometrics.dew_point_array(temps, [max(h, 1) for h in hums], unit="F")
+    for value, t, h in zip(dew, temps, hums):
+        assert math.isclose(value, psychrometrics.dew_point(t, max(h, 1), unit="F"), rel_tol=1e-12, abs_tol=1e-12)
+
+
+def test_units_and_reference_values():
+    assert math.isclose(psychrometrics.vpd(77, 50, unit="F"), psychrometrics.vpd(25, 50))
+    assert math.isclose(psychrometrics.svp(0), psychrometrics.SVP_A)
+    assert math.isclose(psychrometrics.dew_point(20, 100), 20)
+    assert math.isclose(psychrometrics.dew_point(68, 100, unit="F"), 68)
+    assert abs(psychrometrics.absolute_humidity(20, 100) - 17.3) < 0.1
+    assert psychrometrics.dew_point(20, 50) < 20
+
+
+def test_missing_values_become_nan():
+    values = psychrometrics.vpd_array([77, None, 68], [50, 40, None], unit="F")
+    assert not np.isnan(values[0]) and np.isnan(values[1]) and np.isnan(values[2])
+    assert psychrometrics.to_json_list(values, 2) == [round(float(values[0]), 2), None, None]
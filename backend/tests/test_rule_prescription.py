@@ -0,0 +1,52 @@
+"""
+Unit tests for the rule-engine prescription fast path.
+"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import rule_prescription as rules
+from app.services.ai_engine import analyze_situation
+from app.services.safety_filter import safety_filter
+
+NORMAL_TOMATO = {"temperature": 22.0, "humidity": 70.0, "vpd": 0.8}
+
+
+def test_clearly_normal_state_gets_standard_block():
+    text = rules.rule_prescription("Tomatoes", NORMAL_TOMATO)
+    assert "**Status**: Normal" in text
+    assert safety_filter.validate_format(text)
+
+
+def test_borderline_states_fall_through_to_llm():
+    # Within limits but inside the margin / outside the knowledge-base bands
+    assert rules.rule_prescription("Tomatoes", {**NORMAL_TOMATO, "temperature": 33.5}) is None
+    assert rules.rule_prescription("Tomatoes", {**NORMAL_TOMATO, "vpd": 1.45}) is None
+    assert rules.rule_prescription("Tomatoes", {**NORMAL_TOMATO, "humidity": 84.0}) is None
+    assert rules.rule_prescription("Tomatoes", {**NORMAL_TOMATO, "vpd": None}) is None
+
+
+def test_unknown_crops_fall_through_to_llm():
+    # No crop-specific limits or knowledge-base band: the defaults alone are not enough
+    limits, kb_entry, known = rules.crop_profile("Lettuce")
+    assert not known and kb_entry == {}
+    assert rules.rule_prescription("Lettuce", {"temperature": 31.0, "humidity": 60.0, "vpd": 1.2}) is None
+
+
+def test_thresholds_are_configurable(monkeypatch):
+    monkeypatch.setattr(rules, "RULE_TEMP_MARGIN_C", 0.0)
+    monkeypatch.setattr(rules, "RULE_HUMIDITY_MARGIN", 0.0)
+    assert rules.rule_prescription("Tomatoes", {**NORMAL_TOMATO, "humidity": 84.0}) is not None
+    monkeypatch.setattr(rules, "RULE_PRESCRIPTION_ENABLED", False)
+    assert rules.rule_prescription("Tomatoes", NORMAL_TOMATO) is None
+
+
+def test_analysis_reports_its_source(monkeypatch):
+    monkeypatch.setattr(safety_filter, "prepare", lambda weather, physics=None: dict(NORMAL_TOMATO))
+    weather = {"temperature": 72, "humidity": 60, "rain": 0, "wind_speed": 3}
+
+    assert analyze_situation(weather, "Tomatoes")["source"] == "rules"
+    # Feedback re-evaluations always go to the LLM path
+    assert analyze_situation(weather, "Tomatoes", user_feedback="Leaves are wilting")["source"] == "llm"
@@ -0,0 +1,82 @@
+"""
+Unit tests for single-flight coalescing of duplicate in-flight calls.
+"""
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return [{"Risk Score": 40}]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: flight.do(("tomato", "forecast"), slow), range(8)))
+
+    assert len(calls) == 1
+    assert all(result == [{"Risk Score": 40}] for result in results)
+    # Followers get copies, so in-place post-processing stays local
+    results[1][0]["Rain (in)"] = 0.1
+    assert "Rain (in)" not in results[2][0]
+    assert flight.stats()["coalesced"] == 7
+
+
+def test_errors_propagate_to_followers():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("quota exceeded")
+
+    errors = []
+
+    def follower():
+        started.wait()
+        try:
+            flight.do("key", lambda: "unused")
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    thread = threading.Thread(target=follower)
+    thread.start()
+    try:
+        flight.do("key", failing)
+    except RuntimeError:
+        pass
+    thread.join()
+    assert errors == ["quota exceeded"]
+
+
+def test_follower_timeout():
+    flight = SingleFlight("test", timeout=0.05)
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return "late"
+
+    leader = threading.Thread(target=lambda: flight.do("key", slow))
+    leader.start()
+    started.wait()
+    try:
+        flight.do("key", lambda: "unused")
+        assert False, "expected a timeout"
+    except SingleFlightTimeout:
+        pass
+    leader.join()
+    assert flight.stats()["timeouts"] == 1
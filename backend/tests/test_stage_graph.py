@@ -0,0 +1,81 @@
+"""
+Unit tests for the async stage graph used by the dashboard.
+"""
+import sys
+import os
+import asyncio
+import time
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.stage_graph import StageGraph
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph()
+    graph.add("a", lambda _: (time.sleep(0.2), "A")[1])
+
+    async def b(_):
+        await asyncio.sleep(0.2)
+        return "B"
+
+    graph.add("b", b)
+    graph.add("c", lambda deps: deps["a"] + deps["b"], deps=("a", "b"))
+
+    started = time.perf_counter()
+    results, report = asyncio.run(graph.run())
+    elapsed = time.perf_counter() - started
+
+    assert results["c"] == "AB"
+    assert elapsed < 0.35  # ~max(a, b), not a + b
+    assert all(stage["status"] == "ok" for stage in report.values())
+
+
+def test_timeout_yields_default_and_partial_results():
+    graph = StageGraph()
+
+    async def slow(_):
+        await asyncio.sleep(1)
+        return "late"
+
+    graph.add("fast", lambda _: 42)
+    graph.add("slow", slow, timeout=0.05, default="fallback")
+    graph.add("after", lambda deps: deps["slow"], deps=("slow",))
+
+    results, report = asyncio.run(graph.run())
+    assert results["fast"] == 42
+    assert results["slow"] == "fallback"
+    assert results["after"] == "fallback"
+    assert report["slow"]["status"] == "timeout"
+
+
+def test_errors_are_reported_not_raised():
+    graph = StageGraph()
+
+    def boom(_):
+        raise RuntimeError("geocoder down")
+
+    graph.add("boom", boom)
+    graph.add("ok", lambda _: "fine")
+
+    results, report = asyncio.run(graph.run())
+    assert results["boom"] is None
+    assert results["ok"] == "fine"
+    assert report["boom"]["status"] == "error"
+    assert "geocoder down" in report["boom"]["error"]
+
+
+def test_on_stage_reports_each_stage_as_it_finishes():
+    graph = StageGraph()
+
+    async def slow(_):
+        await asyncio.sleep(0.1)
+        return "slow"
+
+    graph.add("slow", slow)
+    graph.add("fast", lambda _: "fast")
+
+    seen = []
+    asyncio.run(graph.run(on_stage=lambda name, value, entry: seen.append((name, value, entry["status"]))))
+    assert seen == [("fast", "fast", "ok"), ("slow", "slow", "ok")]
@@ -0,0 +1,98 @@
+"""
+Unit tests for schema-constrained JSON output: incremental parsing,
+salvage of partial arrays and targeted repair.
+"""
+import sys
+import os
+import json
+from types import SimpleNamespace
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import structured_output as so
+from app.services.structured_output import JSONArrayStream, StructuredOutput, MARKET_PRICE_SCHEMA, PEST_RISK_SCHEMA
+
+DATES = ["2026-05-01", "2026-05-02", "2026-05-03"]
+
+
+def chunks(text, size=7):
+    return [SimpleNamespace(text=text[i:i + size]) for i in range(0, len(text), size)]
+
+
+def test_stream_parser_yields_items_across_chunks():
+    text = '```json\n[{"Date": "2026-05-01", "Condition": "Low {brace} \\"quoted\\""}, {"Date": "2026-05-02"}]```'
+    parser = JSONArrayStream()
+    items = []
+    for chunk in chunks(text):
+        items.extend(parser.feed(chunk.text))
+    assert [item["Date"] for item in items] == ["2026-05-01", "2026-05-02"]
+    assert items[0]["Condition"] == 'Low {brace} "quoted"'
+
+
+def test_validate_coerces_and_rejects():
+    assert PEST_RISK_SCHEMA.validate({"Date": "2026-05-01", "Risk Score": "45.0", "Condition": "Low", "Pest": "None"})["Risk Score"] == 45
+    assert PEST_RISK_SCHEMA.validate({"Date": "2026-05-01", "Risk Score": 150, "Condition": "Low", "Pest": "None"}) is None
+    assert MARKET_PRICE_SCHEMA.validate({"Date": "May 1", "Price ($/lb)": 1.2}) is None
+
+
+def test_truncated_array_is_salvaged_then_repaired(monkeypatch):
+    prompts = []
+    first = '[{"Date": "2026-05-01", "Price ($/lb)": 1.1}, {"Date": "2026-05-02", "Price ($/lb)": 1.2}, {"Date": "2026-05-0'
+    repair = json.dumps([{"Date": "2026-05-03", "Price ($/lb)": 1.3}])
+
+    def fake_generate(prompt, **kwargs):
+        prompts.append(prompt)
+        assert kwargs["generation_config"]["response_mime_type"] == "application/json"
+        return chunks(first if len(prompts) == 1 else repair)
+
+    monkeypatch.setattr(so.gemini_pool, "generate", fake_generate)
+    output = StructuredOutput()
+
+    items = output.generate(MARKET_PRICE_SCHEMA, "prices", expected_keys=DATES, stage="gemini.market_prices")
+
+    assert [item["Price ($/lb)"] for item in items] == [1.1, 1.2, 1.3]
+    assert len(prompts) == 2
+    assert '["2026-05-03"]' in prompts[1]
+    assert output.stats()["market_prices"]["repaired"] == 1
+
+
+def test_failed_repair_keeps_salvaged_items(monkeypatch):
+    calls = []
+
+    def fake_generate(prompt, **kwargs):
+        calls.append(prompt)
+        if len(calls) == 1:
+            return chunks('[{"Date": "2026-05-02", "Price ($/lb)": 1.2}, not json')
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(so.gemini_pool, "generate", fake_generate)
+    output = StructuredOutput()
+
+    items = output.generate(MARKET_PRICE_SCHEMA, "prices", expected_keys=DATES)
+
+    assert items == [{"Date": "2026-05-02", "Price ($/lb)": 1.2}]
+    assert output.stats()["market_prices"]["salvaged"] == 1
+
+
+def test_salvaged_pest_rows_get_rain_by_date(monkeypatch):
+    from app.services import data_handler, pest_forecast
+
+    daily = {
+        "time": ["2026-05-01", "2026-05-02", "2026-05-03", "2026-05-04", "2026-05-05"],
+        "temperature_2m_max": [70, 71, 72, 73, 74],
+        "temperature_2m_min": [50, 51, 52, 53, 54],
+        "relative_humidity_2m_mean": [60, 61, 62, 63, 64],
+        "precipitation_sum": [0.1, 0.2, 0.3, 0.4, 0.5]
+    }
+    salvaged = [
+        {"Date": "2026-05-01", "Risk Score": 10, "Condition": "Low", "Pest": "None"},
+        {"Date": "2026-05-02", "Risk Score": 20, "Condition": "Low", "Pest": "None"},
+        {"Date": "2026-05-05", "Risk Score": 80, "Condition": "High", "Pest": "Aphids"}
+    ]
+    monkeypatch.setattr(data_handler, "fetch_7day_weather", lambda lat, lon: daily)
+    monkeypatch.setattr(pest_forecast, "forecast_pest_risk", lambda crop, weather: [])
+    monkeypatch.setattr(data_handler, "analyze_pest_risk_with_ai", lambda weather, crop: salvaged)
+
+    df = data_handler.calculate_weekly_pest_risk(37.0, -122.0, "Tomatoes")
+    assert dict(zip(df["Date"], df["Rain (in)"])) == {"2026-05-01": 0.1, "2026-05-02": 0.2, "2026-05-05": 0.5}
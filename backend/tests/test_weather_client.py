@@ -0,0 +1,140 @@
+"""
+Unit tests for the pooled, TTL-cached weather client.
+Uses an in-process mock transport, so no network access is required.
+"""
+import sys
+import os
+import asyncio
+import time
+
+import httpx
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.cache import TTLCache
+from app.services.weather_client import WeatherClient
+
+
+def make_transport(calls):
+    def handler(request):
+        calls.append(str(request.url))
+        if "daily" in request.url.params:
+            return httpx.Response(200, json={"daily": {"time": ["2026-01-01"], "temperature_2m_max": [70]}})
+        return httpx.Response(200, json={"current": {
+            "temperature_2m": 68.0,
+            "relative_humidity_2m": 55,
+            "rain": 0.0,
+            "wind_speed_10m": 4.2
+        }})
+    return httpx.MockTransport(handler)
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=4, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_ttl_cache_is_bounded():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # 'a' becomes most recently used
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_async_client_caches_current_weather():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls))
+
+    async def run():
+        first = await client.get_current(37.7749, -122.4194)
+        second = await client.get_current(37.7749, -122.4194)
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert first["temperature"] == 68.0
+    assert len(calls) == 1
+
+
+def test_sync_and_async_share_cache():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls))
+    daily = client.get_daily_forecast_sync(37.7749, -122.4194)
+    assert daily["temperature_2m_max"] == [70]
+
+    async def run():
+        return await client.get_daily_forecast(37.7749, -122.4194)
+
+    assert asyncio.run(run()) == daily
+    assert len(calls) == 1
+
+
+def test_client_of_a_closed_loop_is_closed():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls), current_ttl=0)
+
+    async def fetch(lat):
+        await client.get_current(lat, 10.0)
+        return client._get_async_client()
+
+    first = asyncio.run(fetch(10.0))
+    second = asyncio.run(fetch(20.0))
+    assert first is not second
+    assert first.is_closed and not second.is_closed
+    assert list(client._async_clients.values()) == [second]
+
+
+def test_failures_are_not_cached():
+    calls = []
+
+    def handler(request):
+        calls.append(1)
+        return httpx.Response(503)
+
+    client = WeatherClient(transport=httpx.MockTransport(handler))
+    assert client.get_current_sync(10.0, 10.0) is None
+    assert client.get_current_sync(10.0, 10.0) is None
+    assert len(calls) == 2
+
+
+def test_nearby_farms_share_one_grid_cell():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls), cell_deg=0.05)
+    # ~200 m apart, same 0.05 deg cell
+    client.get_current_sync(37.7749, -122.4194)
+    client.get_current_sync(37.7760, -122.4180)
+    assert len(calls) == 1
+    # Queries go to the cell centre, not the raw coordinate
+    assert "latitude=37.775" in calls[0]
+
+
+def test_prewarm_dedupes_cells():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls), cell_deg=0.05)
+    coords = [(37.7749, -122.4194), (37.7760, -122.4180), (40.7128, -74.0060), (None, None)]
+
+    result = asyncio.run(client.prewarm(coords, include_forecast=True))
+    assert result["farms"] == 3
+    assert result["cells"] == 2
+    assert result["failed_cells"] == 0
+    assert len(calls) == 4  # current + forecast per cell
+
+
+def test_get_current_many_fetches_once_per_cell():
+    calls = []
+    client = WeatherClient(transport=make_transport(calls), cell_deg=0.05)
+    coords = [(37.7749, -122.4194), (37.7760, -122.4180), (40.7128, -74.0060)]
+
+    by_cell = asyncio.run(client.get_current_many(coords))
+    assert len(calls) == 2
+    assert by_cell[client.cache_key(37.7760, -122.4180)] is not None
+    assert by_cell[client.cache_key(40.7128, -74.0060)] is not None
@@ -0,0 +1,81 @@
+"""
+Unit tests for converting ingested Open-Meteo responses into ExternalWeatherLog rows.
+"""
+import sys
+import os
+from datetime import datetime
+
+# Add backend directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.weather_ingest import WeatherIngestor, build_rows, wmo_condition
+
+
+SAMPLE = {
+    "latitude": 37.775,
+    "longitude": -122.425,
+    "utc_offset_seconds": -25200,
+    "current": {
+        "time": "2024-06-01T13:15",
+        "temperature_2m": 68.0,
+        "relative_humidity_2m": 60,
+        "rain": 0.0,
+        "wind_speed_10m": 9.1,
+        "is_day": 1,
+        "weather_code": 3
+    },
+    "hourly": {
+        "time": ["2024-06-01T13:00", "2024-06-01T14:00"],
+        "temperature_2m": [67.5, 68.2],
+        "relative_humidity_2m": [61, 59],
+        "rain": [0.0, 0.01],
+        "wind_speed_10m": [8.0, 9.5],
+        "is_day": [1, 1],
+        "weather_code": [3, 61]
+    },
+    "daily": {
+        "time": ["2024-06-01"],
+        "temperature_2m_max": [72.0],
+        "temperature_2m_min": [55.0],
+        "relative_humidity_2m_mean": [65],
+        "precipitation_sum": [0.02]
+    }
+}
+
+
+def test_build_rows_converts_all_kinds():
+    fetched_at = datetime(2024, 6, 1, 20, 20)
+    rows = build_rows((755, -2449), SAMPLE, fetched_at)
+
+    kinds = [row["kind"] for row in rows]
+    assert kinds == ["current", "hourly", "hourly", "daily"]
+    assert all(row["cell"] == "755:-2449" for row in rows)
+
+    current = rows[0]
+    # Local 13:15 at UTC-7 -> 20:15 UTC
+    assert current["timestamp"] == datetime(2024, 6, 1, 20, 15)
+    assert current["is_day"] is True
+    assert current["condition"] == "Cloudy"
+
+    assert rows[2]["condition"] == "Rain"
+    assert rows[3]["temp_out"] == 72.0 and rows[3]["temp_min"] == 55.0
+
+
+def test_wmo_condition_unknown_codes():
+    assert wmo_condition(None) is None
+    assert wmo_condition(0) == "Clear"
+    assert wmo_condition(42) is None
+
+
+def test_only_one_ingestor_holds_the_leader_lock(tmp_path):
+    lock_file = str(tmp_path / "ingest.lock")
+    first = WeatherIngestor(lock_file=lock_file)
+    second = WeatherIngestor(lock_file=lock_file)
+
+    assert first.acquire_leadership()
+    assert not second.acquire_leadership()
+    assert first.is_leader and not second.is_leader
+
+    first.release_leadership()
+    assert second.acquire_leadership()
+    second.release_leadership()
@@ -1,9 +1,10 @@
 import requests
 import pandas as pd
 import random
-import math
 from datetime import datetime, timedelta
 
+from backend.app.services import psychrometrics
+
 
 import streamlit as st
 
@@ -54,11 +55,8 @@ def calculate_vpd(temp_f, humidity):
     Formula: VPD = SVP * (1 - RH/100)
     SVP (Saturation Vapor Pressure) depends on Temp in Celsius.
     """
-    temp_c = (temp_f - 32) * 5.0/9.0
-    # SVP in kPa (Tetens equation)
-    svp = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3))
-    vpd = svp * (1 - (humidity / 100))
-    return round(vpd, 2)
+    # Shared Tetens implementation (backend/app/services/psychrometrics.py)
+    return psychrometrics.vpd(temp_f, humidity, unit="F", decimals=2)
 
 def calculate_pest_risk(weather_data, crop_type):
     """